@@ -0,0 +1,147 @@
+# benchmarks/bench_activity_transform.py
+"""
+Compares the vectorized Activity.process_activity_data against the previous transform
+(Series.apply lambdas, four strftime passes and per-row lat/lng string joins).
+
+Usage:
+    python -m benchmarks.bench_activity_transform
+    python -m benchmarks.bench_activity_transform --sizes 10000 100000 --repeat 5
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.constants import DEFAULT_COORDINATES
+from src.models.activity import Activity
+
+
+def make_raw_activities_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Builds a synthetic frame shaped like a listing of Strava summary activities."""
+    rng = np.random.default_rng(seed)
+    starts = pd.Timestamp("2015-01-01") + pd.to_timedelta(
+        rng.integers(0, 10 * 365 * 24 * 60 * 60, n_rows), unit="s"
+    )
+    has_gps = rng.random(n_rows) < 0.8
+    latlng = [
+        [round(lat, 6), round(lng, 6)] if gps else []
+        for lat, lng, gps in zip(rng.uniform(58, 70, n_rows), rng.uniform(5, 30, n_rows), has_gps)
+    ]
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, n_rows + 1),
+            "name": rng.choice(["Morning Run", "Evening Ride", "Lunch Run"], n_rows),
+            "start_date_local": starts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "sport_type": rng.choice(["Run", "Ride", "VirtualRide"], n_rows),
+            "trainer": rng.random(n_rows) < 0.1,
+            "distance": rng.uniform(1000, 150_000, n_rows),
+            "moving_time": rng.integers(600, 6 * 60 * 60, n_rows),
+            "total_elevation_gain": rng.uniform(0, 2000, n_rows),
+            "gear_id": rng.choice(["g1", "b2", None], n_rows),
+            "average_heartrate": rng.uniform(110, 180, n_rows),
+            "average_speed": rng.uniform(2, 12, n_rows),
+            "average_cadence": rng.uniform(70, 95, n_rows),
+            "average_temp": rng.uniform(-10, 30, n_rows),
+            "average_watts": rng.uniform(100, 300, n_rows),
+            "suffer_score": rng.integers(0, 300, n_rows),
+            "start_latlng": latlng,
+        }
+    )
+
+
+def legacy_process_activity_data(df: pd.DataFrame) -> pd.DataFrame:
+    """The original transform, kept here as the baseline."""
+    df = df.rename(
+        columns={
+            "moving_time": "duration",
+            "total_elevation_gain": "elevation_gain",
+            "start_date_local": "date",
+            "trainer": "indoor",
+            "suffer_score": "intensity",
+            "start_latlng": "lat_lng",
+        }
+    )
+    unit_conversions = {
+        "distance": lambda m: m / 1000,
+        "duration": lambda sec: sec / 60,
+        "average_speed": lambda mps: mps * 3.6,
+    }
+    for col, conversion in unit_conversions.items():
+        df[col] = df[col].apply(conversion)
+
+    df["start_time"] = pd.to_datetime(df["date"])
+    df["date"] = df["start_time"].dt.strftime("%Y-%m-%d")
+    df["month"] = df["start_time"].dt.strftime("%m")
+    df["day_of_week"] = df["start_time"].dt.strftime("%A").str.title()
+    df["end_time"] = df["start_time"] + pd.to_timedelta(df["duration"], unit="m")
+    df["start_time"] = df["start_time"].dt.strftime("%H:%M")
+    df["end_time"] = df["end_time"].dt.strftime("%H:%M")
+
+    df["lat_lng"] = df["lat_lng"].apply(
+        lambda x: (
+            DEFAULT_COORDINATES
+            if (isinstance(x, list) and len(x) == 0) or x == "0, 0"
+            else ", ".join(map(str, x)) if isinstance(x, list) else x
+        )
+    )
+
+    is_virtual_ride = df["sport_type"] == "VirtualRide"
+    df.loc[is_virtual_ride, "sport_type"] = "Ride"
+    df.loc[is_virtual_ride, "indoor"] = True
+    return df
+
+
+def check_equivalent(raw_df: pd.DataFrame, legacy_df: pd.DataFrame, vectorized_df: pd.DataFrame) -> None:
+    """
+    Asserts both transforms produce the same values. The legacy end time adds a float number of
+    minutes, which can land a nanosecond short of a whole minute; those rows are skipped.
+    """
+    for column in ["date", "month", "day_of_week", "start_time", "sport_type", "indoor"]:
+        assert (legacy_df[column].to_numpy() == vectorized_df[column].to_numpy()).all(), column
+
+    start_seconds = pd.to_datetime(raw_df["start_date_local"]).dt.second
+    on_minute = ((start_seconds + raw_df["moving_time"]) % 60 == 0).to_numpy()
+    same_end = legacy_df["end_time"].to_numpy() == vectorized_df["end_time"].to_numpy()
+    assert (same_end | on_minute).all(), "end_time"
+    for column in ["distance", "duration", "average_speed"]:
+        assert np.allclose(legacy_df[column], vectorized_df[column]), column
+
+    has_gps = legacy_df["lat_lng"] != DEFAULT_COORDINATES
+    expected_lat = legacy_df.loc[has_gps, "lat_lng"].str.split(",").str[0].astype(float)
+    assert np.allclose(expected_lat, vectorized_df.loc[has_gps, "start_lat"])
+    assert vectorized_df.loc[~has_gps, "start_lat"].isna().all()
+
+
+def best_of(function, df: pd.DataFrame, repeat: int):
+    """Runs `function` on a fresh copy of `df` `repeat` times; returns the fastest time and last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        result = function(frame)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(sizes: list, repeat: int) -> None:
+    logger.remove()  # Keep the per-call logging out of the timings
+    print(f"{'rows':>10} {'legacy (s)':>11} {'vectorized (s)':>15} {'speedup':>9}")
+    for n_rows in sizes:
+        df = make_raw_activities_frame(n_rows)
+        legacy_seconds, legacy_df = best_of(legacy_process_activity_data, df, repeat)
+        vectorized_seconds, vectorized_df = best_of(Activity.process_activity_data, df, repeat)
+        check_equivalent(df, legacy_df, vectorized_df)
+        print(
+            f"{n_rows:>10} {legacy_seconds:>11.3f} {vectorized_seconds:>15.3f} "
+            f"{legacy_seconds / vectorized_seconds:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size; the fastest is reported.")
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
@@ -0,0 +1,126 @@
+# benchmarks/bench_insert.py
+"""
+Compares the bulk executemany path of DatabaseManager.insert_dataframe_to_db against the
+previous per-row loop (one connection and one commit per row).
+
+The per-row loop costs the same for every row, so sizes above --legacy-max run the bulk path
+only and report the per-row time extrapolated from the largest size it did run for (marked ~).
+
+Usage:
+    python -m benchmarks.bench_insert
+    python -m benchmarks.bench_insert --sizes 10000 100000 --legacy-max 100000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.db import DatabaseManager
+from src.queries import CREATE_ALL_TABLES, INSERT_OR_IGNORE_QUERY
+
+
+def make_activities_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Builds a synthetic frame shaped like the output of Activity.process_activity_data."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2015-01-01") + pd.to_timedelta(
+        rng.integers(0, 10 * 365 * 24 * 60, n_rows), unit="m"
+    )
+    duration = rng.uniform(10, 240, n_rows)
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, n_rows + 1),
+            "name": rng.choice(["Morning Run", "Evening Ride", "Lunch Run"], n_rows),
+            "date": dates.strftime("%Y-%m-%d"),
+            "month": dates.strftime("%m"),
+            "day_of_week": dates.strftime("%A"),
+            "start_time": dates.strftime("%H:%M"),
+            "end_time": (dates + pd.to_timedelta(duration, unit="m")).strftime("%H:%M"),
+            "sport_type": rng.choice(["Run", "Ride"], n_rows),
+            "indoor": rng.integers(0, 2, n_rows).astype(bool),
+            "distance": rng.uniform(1, 150, n_rows),
+            "duration": duration,
+            "elevation_gain": rng.uniform(0, 2000, n_rows),
+            "gear_id": rng.choice(["g1", "b2", None], n_rows),
+            "average_heartrate": rng.uniform(110, 180, n_rows),
+            "average_speed": rng.uniform(8, 40, n_rows),
+            "average_cadence": rng.uniform(70, 95, n_rows),
+            "average_temp": rng.uniform(-10, 30, n_rows),
+            "average_watts": rng.uniform(100, 300, n_rows),
+            "intensity": rng.integers(0, 300, n_rows),
+            "start_lat": rng.uniform(58, 70, n_rows),
+            "start_lng": rng.uniform(5, 30, n_rows),
+        }
+    )
+
+
+def legacy_insert(db_path: str, df: pd.DataFrame, table_name: str) -> None:
+    """The original per-row loop: to_dict records, new connection and commit for every row."""
+    columns = ", ".join(df.columns)
+    placeholders = ", ".join(["?" for _ in df.columns])
+    query = INSERT_OR_IGNORE_QUERY.format(
+        table_name=table_name, columns=columns, placeholders=placeholders
+    )
+    for row in df.to_dict(orient="records"):
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(query, tuple(row.values()))
+            conn.commit()
+
+
+def fresh_database(directory: str, name: str) -> str:
+    db_path = os.path.join(directory, name)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(CREATE_ALL_TABLES["activities"])
+    return db_path
+
+
+def run(sizes: list, legacy_max: int) -> None:
+    logger.remove()  # Keep trace logging out of the timings
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'rows':>10} {'per-row (s)':>12} {'bulk (s)':>10} {'speedup':>9}")
+        legacy_rate = None
+        for n_rows in sorted(sizes):
+            df = make_activities_frame(n_rows)
+
+            bulk_db = DatabaseManager(fresh_database(tmp, f"bulk_{n_rows}.db"))
+            start = time.perf_counter()
+            inserted = bulk_db.insert_dataframe_to_db(df=df, table_name="activities")
+            bulk_seconds = time.perf_counter() - start
+            bulk_db.close()
+            assert inserted == n_rows, f"Expected {n_rows} rows, inserted {inserted}"
+
+            if n_rows <= legacy_max:
+                legacy_path = fresh_database(tmp, f"legacy_{n_rows}.db")
+                start = time.perf_counter()
+                legacy_insert(legacy_path, df, "activities")
+                legacy_seconds = time.perf_counter() - start
+                legacy_rate = legacy_seconds / n_rows
+                print(
+                    f"{n_rows:>10} {legacy_seconds:>12.2f} {bulk_seconds:>10.2f} "
+                    f"{legacy_seconds / bulk_seconds:>8.1f}x"
+                )
+            elif legacy_rate is not None:
+                estimate = legacy_rate * n_rows
+                print(
+                    f"{n_rows:>10} {'~' + format(estimate, '.0f'):>12} {bulk_seconds:>10.2f} "
+                    f"{'~' + format(estimate / bulk_seconds, '.0f'):>8}x"
+                )
+            else:
+                print(f"{n_rows:>10} {'skipped':>12} {bulk_seconds:>10.2f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=10_000,
+        help="Largest size to run the per-row loop for; larger sizes are extrapolated (it takes hours at 1M rows).",
+    )
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_max)
@@ -0,0 +1,231 @@
+# benchmarks/bench_sync.py
+"""
+Times full offline syncs against the fake Strava/Open-Meteo server and tracks regressions.
+
+Each size runs main.main() on an empty database: listing, every sync job (detail, zones,
+gear, weather and streams), then the post-sync stages of main.py. The total, each phase and
+each instrumented stage (see src/metrics.py) are appended to a results file, and compared
+with the median of earlier runs of the same size and settings. The fake server runs in its
+own process, so generating payloads does not compete with the sync for the GIL.
+
+Usage:
+    python -m benchmarks.bench_sync
+    python -m benchmarks.bench_sync --sizes 1000 10000 --latency 0.005 --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import requests
+from loguru import logger
+
+import main
+from src.api.rate_limiter import RateLimiter
+from src.api.response_cache import ResponseCache
+from src.api.strava_api import StravaClient
+from src.api.weather_api import WeatherClient
+from src.db import DatabaseManager
+from src.metrics import metrics
+from src.models.best_efforts import BestEfforts
+from src.models.power_curve import PowerCurve
+from src.models.route import Route
+from src.models.stream_store import StreamStore
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results", "bench_sync.json")
+
+# Earlier runs a new one is compared with; their median is the baseline
+BASELINE_RUNS = 5
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@contextmanager
+def fake_server_process(n_activities: int, settings: dict):
+    """Starts benchmarks.fake_server in a subprocess on a free port and yields its base URL."""
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_server",
+            "--port", "0",
+            "--activities", str(n_activities),
+            "--seed", str(settings["seed"]),
+            "--stream-points", str(settings["stream_points"]),
+            "--latency", str(settings["latency"]),
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        line = process.stdout.readline()
+        if " on " not in line:
+            raise RuntimeError(f"Fake server failed to start: {line!r}")
+        yield line.rsplit(" on ", 1)[1].split()[0]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run_sync(n_activities: int, settings: dict) -> dict:
+    """Runs one full offline sync of `n_activities` activities. Returns its timings in seconds."""
+    metrics.reset()
+    phases = {}
+
+    with tempfile.TemporaryDirectory() as temp_dir, fake_server_process(n_activities, settings) as server_url:
+        db_manager = DatabaseManager(os.path.join(temp_dir, "bench.db"))
+        db_manager.create_all_tables()
+        response_cache = ResponseCache(os.path.join(temp_dir, "response_cache.db"), "off")
+        main.db_manager = db_manager
+        main.strava_client = StravaClient(
+            client_id="bench",
+            client_secret="bench",
+            refresh_token="bench",
+            athlete_id=1,
+            rate_limiter=RateLimiter(short_limit=10**9, daily_limit=10**9),
+            response_cache=response_cache,
+            api_url=f"{server_url}/api/v3",
+            oauth_url=f"{server_url}/oauth/token",
+        )
+        main.weather_client = WeatherClient(
+            forecast_url=f"{server_url}/v1/forecast", archive_url=f"{server_url}/v1/archive"
+        )
+
+        start = time.perf_counter()
+        phase_start = start
+        main.main(full_sync=True)
+        phases["sync"] = time.perf_counter() - phase_start
+
+        phase_start = time.perf_counter()
+        stream_store = StreamStore(os.path.join(temp_dir, "streams"))
+        stream_store.sync_from_db(db_manager)
+        stream_store.close()
+        PowerCurve.process_new_curves(db_manager)
+        Route.process_new_fingerprints(db_manager)
+        BestEfforts.process_new_stream_best_efforts(db_manager)
+        phases["post_sync"] = time.perf_counter() - phase_start
+
+        # A second run finds nothing new: the cost of an incremental sync with no activities
+        phase_start = time.perf_counter()
+        main.main()
+        phases["incremental_noop"] = time.perf_counter() - phase_start
+        phases["total"] = time.perf_counter() - start
+
+        stored = db_manager.get_row_count("activities")
+        pending = db_manager.get_sync_job_counts()
+        db_manager.close()
+        requests_served = requests.get(f"{server_url}/stats", timeout=10).json()
+
+    if stored != n_activities:
+        raise RuntimeError(f"Synced {stored} of {n_activities} activities.")
+    failed = {stage: counts["failed"] for stage, counts in pending.items() if counts.get("failed")}
+    if failed:
+        logger.warning(f"Failed sync jobs by stage: {failed}")
+
+    stages = {}
+    for series in metrics.to_dict()["histograms"]:
+        if series["name"] == "stage_seconds":
+            stages[series["labels"]["stage"]] = series["sum"]
+    return {"phases": phases, "stages": stages, "requests": requests_served}
+
+
+def load_results(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def find_regressions(result: dict, history: list, threshold: float) -> list:
+    """
+    Compares each phase and stage of `result` with the median of the last BASELINE_RUNS runs
+    with the same size and settings. Returns (name, seconds, baseline) for those slower than
+    the baseline by more than `threshold`.
+    """
+    previous = [
+        run
+        for run in history
+        if run["activities"] == result["activities"] and run["settings"] == result["settings"]
+    ][-BASELINE_RUNS:]
+    if not previous:
+        return []
+
+    regressions = []
+    for group in ("phases", "stages"):
+        for name, seconds in result[group].items():
+            baseline_values = [run[group][name] for run in previous if name in run[group]]
+            if not baseline_values:
+                continue
+            baseline = statistics.median(baseline_values)
+            # Ignore stages too short to time reliably
+            if seconds > 0.05 and seconds > baseline * (1 + threshold):
+                regressions.append((f"{group}.{name}", seconds, baseline))
+    return regressions
+
+
+def run(sizes: list, settings: dict, results_path: str, threshold: float, record: bool) -> int:
+    """Runs every size, prints the timings and regressions. Returns the number of regressions."""
+    logger.remove()  # Keep the per-activity logging out of the timings
+    history = load_results(results_path)
+    regression_count = 0
+
+    for n_activities in sizes:
+        timings = run_sync(n_activities, settings)
+        result = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "activities": n_activities,
+            "settings": settings,
+            **timings,
+        }
+
+        phases = result["phases"]
+        print(
+            f"{n_activities:>8} activities: total {phases['total']:.2f}s "
+            f"(sync {phases['sync']:.2f}s, post-sync {phases['post_sync']:.2f}s, "
+            f"incremental no-op {phases['incremental_noop']:.2f}s), "
+            f"{n_activities / phases['sync']:.0f} activities/s"
+        )
+        for stage, seconds in sorted(result["stages"].items(), key=lambda item: -item[1])[:10]:
+            print(f"{'':>10}{stage:<45} {seconds:>8.2f}s")
+
+        for name, seconds, baseline in find_regressions(result, history, threshold):
+            regression_count += 1
+            print(f"{'':>10}REGRESSION {name}: {seconds:.2f}s vs {baseline:.2f}s baseline")
+
+        history.append(result)
+
+    if record:
+        os.makedirs(os.path.dirname(results_path), exist_ok=True)
+        with open(results_path, "w") as f:
+            json.dump(history, f, indent=2)
+    return regression_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stream-points", type=int, default=900, help="Samples per activity stream at most.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the fake server sleeps per request.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown over the baseline reported as a regression.")
+    parser.add_argument("--results", default=RESULTS_PATH, help="JSON file the runs are appended to.")
+    parser.add_argument("--no-record", action="store_true", help="Compare without appending this run to the results.")
+    args = parser.parse_args()
+
+    bench_settings = {"seed": args.seed, "stream_points": args.stream_points, "latency": args.latency}
+    regressions = run(args.sizes, bench_settings, args.results, args.threshold, record=not args.no_record)
+    raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,270 @@
+# benchmarks/fake_server.py
+"""
+Local stand-in for the Strava and Open-Meteo APIs, serving a SyntheticAthlete.
+
+Strava endpoints live under /api/v3 (token refresh under /oauth/token) and answer with
+X-RateLimit-Limit / X-RateLimit-Usage headers over clock-aligned 15-minute and daily windows,
+with a 429 once either is spent. Open-Meteo is served under /v1/forecast and /v1/archive.
+GET /stats returns the number of requests served by route.
+
+Usage:
+    python -m benchmarks.fake_server --activities 10000 --port 8000
+    STRAVA_API_URL=http://127.0.0.1:8000/api/v3 STRAVA_OAUTH_URL=http://127.0.0.1:8000/oauth/token \\
+    WEATHER_FORECAST_URL=http://127.0.0.1:8000/v1/forecast \\
+    WEATHER_ARCHIVE_URL=http://127.0.0.1:8000/v1/archive python main.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import SyntheticAthlete
+
+SHORT_WINDOW = 15 * 60
+DAILY_WINDOW = 24 * 60 * 60
+
+# Strava routes: pattern of the path below /api/v3, and the name requests are counted under
+STRAVA_ROUTES = [
+    (re.compile(r"^athlete/activities$"), "activities"),
+    (re.compile(r"^activities/(\d+)$"), "detail"),
+    (re.compile(r"^activities/(\d+)/zones$"), "zones"),
+    (re.compile(r"^activities/(\d+)/streams$"), "streams"),
+    (re.compile(r"^gear/(\w+)$"), "gear"),
+]
+
+
+class RateLimitWindows:
+    """Request counts over Strava's clock-aligned 15-minute and daily windows."""
+
+    def __init__(self, short_limit: int, daily_limit: int):
+        self.short_limit = short_limit
+        self.daily_limit = daily_limit
+        self.short_usage = 0
+        self.daily_usage = 0
+        self.short_start = 0.0
+        self.daily_start = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (
+            f"RateLimitWindows(short={self.short_usage}/{self.short_limit}, "
+            f"daily={self.daily_usage}/{self.daily_limit})"
+        )
+
+    def admit(self) -> tuple:
+        """Counts one request. Returns whether it is within both limits, and the response headers."""
+        with self._lock:
+            now = time.time()
+            if now // SHORT_WINDOW * SHORT_WINDOW != self.short_start:
+                self.short_start, self.short_usage = now // SHORT_WINDOW * SHORT_WINDOW, 0
+            if now // DAILY_WINDOW * DAILY_WINDOW != self.daily_start:
+                self.daily_start, self.daily_usage = now // DAILY_WINDOW * DAILY_WINDOW, 0
+
+            # Like Strava, requests over the limit still count towards the usage
+            self.short_usage += 1
+            self.daily_usage += 1
+            allowed = self.short_usage <= self.short_limit and self.daily_usage <= self.daily_limit
+            headers = {
+                "X-RateLimit-Limit": f"{self.short_limit},{self.daily_limit}",
+                "X-RateLimit-Usage": f"{self.short_usage},{self.daily_usage}",
+            }
+        return allowed, headers
+
+
+class FakeApiServer:
+    """
+    Threaded HTTP server answering Strava and Open-Meteo requests from `athlete`.
+
+    `latency` seconds are slept before every response to stand in for the network.
+    `request_counts` counts the requests served by route.
+
+        with FakeApiServer(SyntheticAthlete(1000)) as server:
+            client = StravaClient(..., api_url=server.strava_api_url, oauth_url=server.strava_oauth_url)
+    """
+
+    def __init__(
+        self,
+        athlete: SyntheticAthlete,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        short_limit: int = 10**9,
+        daily_limit: int = 10**9,
+        latency: float = 0.0,
+    ):
+        self.athlete = athlete
+        self.latency = latency
+        self.rate_limits = RateLimitWindows(short_limit, daily_limit)
+        self.request_counts = Counter()
+        self._counts_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    def __repr__(self):
+        return f"FakeApiServer(url={self.url}, athlete={self.athlete})"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def strava_api_url(self) -> str:
+        return f"{self.url}/api/v3"
+
+    @property
+    def strava_oauth_url(self) -> str:
+        return f"{self.url}/oauth/token"
+
+    @property
+    def forecast_url(self) -> str:
+        return f"{self.url}/v1/forecast"
+
+    @property
+    def archive_url(self) -> str:
+        return f"{self.url}/v1/archive"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def count(self, route: str) -> None:
+        with self._counts_lock:
+            self.request_counts[route] += 1
+
+    def strava_response(self, path: str, query: dict):
+        """Returns (status, payload) for a GET below /api/v3."""
+        for pattern, route in STRAVA_ROUTES:
+            match = pattern.match(path)
+            if match is None:
+                continue
+            self.count(route)
+            if route == "activities":
+                after = int(query["after"]) if "after" in query else None
+                return 200, self.athlete.list_activities(
+                    after=after, page=int(query.get("page", 1)), per_page=int(query.get("per_page", 30))
+                )
+            if route == "detail":
+                payload = self.athlete.detail(int(match.group(1)))
+            elif route == "zones":
+                payload = self.athlete.zones(int(match.group(1)))
+            elif route == "streams":
+                keys = query["keys"].split(",") if query.get("keys") else None
+                payload = self.athlete.streams(int(match.group(1)), keys)
+            else:
+                payload = self.athlete.gear(match.group(1))
+            return (404, {"message": "Record Not Found"}) if payload is None else (200, payload)
+
+        return 404, {"message": "Resource Not Found"}
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, delayed ACKs add ~40 ms per response
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status: int, payload, headers: dict = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if urlparse(self.path).path != "/oauth/token":
+                    return self.send_json(404, {"message": "Resource Not Found"})
+                server.count("oauth")
+                self.send_json(
+                    200,
+                    {
+                        "access_token": "fake-access-token",
+                        "refresh_token": "fake-refresh-token",
+                        "expires_at": int(time.time()) + 6 * 60 * 60,
+                    },
+                )
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if url.path.startswith("/api/v3/"):
+                    allowed, headers = server.rate_limits.admit()
+                    if not allowed:
+                        server.count("rate_limited")
+                        return self.send_json(429, {"message": "Rate Limit Exceeded"}, headers)
+                    status, payload = server.strava_response(url.path[len("/api/v3/"):], query)
+                    return self.send_json(status, payload, headers)
+
+                if url.path in ("/v1/forecast", "/v1/archive"):
+                    server.count(url.path.rsplit("/", 1)[-1])
+                    return self.send_json(
+                        200,
+                        server.athlete.weather(
+                            float(query["latitude"]), float(query["longitude"]),
+                            query["start_date"], query["end_date"],
+                        ),
+                    )
+
+                if url.path == "/stats":
+                    with server._counts_lock:
+                        return self.send_json(200, dict(server.request_counts))
+
+                self.send_json(404, {"message": "Resource Not Found"})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--activities", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port.")
+    parser.add_argument("--stream-points", type=int, default=900, help="Samples per activity stream at most.")
+    parser.add_argument("--short-limit", type=int, default=10**9, help="Requests per 15 minutes.")
+    parser.add_argument("--daily-limit", type=int, default=10**9, help="Requests per day.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds slept before each response.")
+    args = parser.parse_args()
+
+    fake_server = FakeApiServer(
+        SyntheticAthlete(args.activities, seed=args.seed, stream_points=args.stream_points),
+        host=args.host,
+        port=args.port,
+        short_limit=args.short_limit,
+        daily_limit=args.daily_limit,
+        latency=args.latency,
+    )
+    # benchmarks/bench_sync.py reads the URL from this line
+    print(f"Serving {fake_server.athlete} on {fake_server.url} (Ctrl+C to stop)", flush=True)
+    try:
+        fake_server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        fake_server.httpd.server_close()
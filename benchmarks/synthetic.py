@@ -0,0 +1,354 @@
+# benchmarks/synthetic.py
+"""
+Deterministic synthetic Strava athlete for offline benchmarks.
+
+Activity summaries are generated up front as arrays. Detail, zone, stream, gear and weather
+payloads are built on request from a per-activity seed, so the same ID always returns the same
+payload and 100k activities do not have to be held in memory.
+"""
+import numpy as np
+import pandas as pd
+
+# Share of each sport type, with (min, max) distance in meters and (min, max) speed in m/s
+SPORTS = {
+    "Run": (0.55, (3_000, 25_000), (2.5, 4.2)),
+    "Ride": (0.3, (15_000, 120_000), (6.0, 10.0)),
+    "VirtualRide": (0.1, (15_000, 60_000), (7.0, 10.0)),
+    "Walk": (0.05, (2_000, 8_000), (1.2, 1.6)),
+}
+GEAR = {
+    "g1": ("Pegasus 40", "Nike"),
+    "g2": ("Clifton 9", "Hoka"),
+    "g3": ("Speedgoat 5", "Hoka"),
+    "g4": ("Endorphin Pro", "Saucony"),
+    "b1": ("Tarmac SL7", "Specialized"),
+    "b2": ("Kickr Bike", "Wahoo"),
+}
+SPORT_GEAR = {"Run": ["g1", "g2", "g3", "g4"], "Ride": ["b1"], "VirtualRide": ["b2"], "Walk": [None]}
+HOMES = [(63.43, 10.39), (59.91, 10.75), (60.39, 5.32), (69.65, 18.96), (58.97, 5.73)]
+ROUTES_PER_HOME = 8
+BEST_EFFORTS = [
+    ("400m", 400),
+    ("1/2 mile", 804.67),
+    ("1K", 1000),
+    ("1 mile", 1609.34),
+    ("2 mile", 3218.69),
+    ("5K", 5000),
+    ("10K", 10000),
+    ("15K", 15000),
+    ("Half-Marathon", 21097.5),
+]
+METERS_PER_DEGREE = 111_320.0
+
+
+class SyntheticAthlete:
+    """
+    A history of `n_activities` activities between `start` and `end`, oldest first.
+
+    Outdoor activities start from one of a few home locations and follow one of a few fixed
+    loops per home and sport, so weather cells and similar routes repeat like real data.
+    Streams have `stream_points` samples at most.
+    """
+
+    def __init__(
+        self,
+        n_activities: int,
+        seed: int = 0,
+        stream_points: int = 900,
+        start: str = "2015-01-01",
+        end: str = "2024-12-31",
+    ):
+        self.n_activities = n_activities
+        self.seed = seed
+        self.stream_points = stream_points
+        rng = np.random.default_rng(seed)
+
+        first, last = pd.Timestamp(start, tz="UTC").timestamp(), pd.Timestamp(end, tz="UTC").timestamp()
+        self.ids = np.arange(1_000_000, 1_000_000 + n_activities, dtype=np.int64)
+        self.start_epochs = np.sort(rng.uniform(first, last, n_activities)).astype(np.int64)
+
+        sports = list(SPORTS)
+        shares = np.array([SPORTS[sport][0] for sport in sports])
+        self.sport_index = rng.choice(len(sports), n_activities, p=shares / shares.sum())
+        self.sport_types = np.array(sports)[self.sport_index]
+        self.home = rng.integers(0, len(HOMES), n_activities)
+        self.route = rng.integers(0, ROUTES_PER_HOME, n_activities)
+        self.indoor = self.sport_types == "VirtualRide"
+        self.has_gps = ~self.indoor & (rng.random(n_activities) < 0.95)
+
+        # Every run of a route covers about the same distance
+        self.route_lengths = {
+            sport: rng.uniform(*SPORTS[sport][1], size=(len(HOMES), ROUTES_PER_HOME)) for sport in sports
+        }
+        base_length = np.array(
+            [
+                self.route_lengths[sport][home, route]
+                for sport, home, route in zip(self.sport_types, self.home, self.route)
+            ]
+        )
+        self.distances = base_length * rng.normal(1.0, 0.01, n_activities)
+        speed_ranges = np.array([SPORTS[sport][2] for sport in sports])[self.sport_index]
+        self.speeds = rng.uniform(speed_ranges[:, 0], speed_ranges[:, 1])
+        self.moving_times = np.maximum((self.distances / self.speeds).astype(np.int64), 60)
+        self.heartrates = rng.uniform(120, 170, n_activities)
+        self.suffer_scores = np.where(rng.random(n_activities) < 0.8, rng.integers(5, 300, n_activities), -1)
+        self.gear_ids = [
+            SPORT_GEAR[sport][choice % len(SPORT_GEAR[sport])]
+            for sport, choice in zip(self.sport_types, rng.integers(0, 4, n_activities))
+        ]
+
+    def __repr__(self):
+        return f"SyntheticAthlete(n_activities={self.n_activities}, seed={self.seed})"
+
+    def index_of(self, activity_id: int):
+        """Position of an activity ID, or None if the athlete has no such activity."""
+        index = int(activity_id) - int(self.ids[0]) if self.n_activities else -1
+        return index if 0 <= index < self.n_activities else None
+
+    def rng_for(self, index: int, salt: int) -> np.random.Generator:
+        return np.random.default_rng((self.seed, index, salt))
+
+    def route_points(self, index: int, n_points: int) -> np.ndarray:
+        """Lat/lng points along the activity's loop: a wobbly circle starting at its home."""
+        sport = self.sport_types[index]
+        home_lat, home_lng = HOMES[self.home[index]]
+        shape = np.random.default_rng((self.seed, int(self.home[index]), int(self.route[index]), len(sport)))
+        wobble, phase, heading = shape.integers(2, 6), shape.uniform(0, 2 * np.pi), shape.uniform(0, 2 * np.pi)
+
+        radius = self.route_lengths[sport][self.home[index], self.route[index]] / (2 * np.pi)
+        theta = np.linspace(0, 2 * np.pi, n_points)
+        r = radius * (1 + 0.25 * np.sin(wobble * theta + phase))
+        # Shift the loop so it starts and ends at home
+        x = r * np.cos(theta + heading) - r[0] * np.cos(heading)
+        y = r * np.sin(theta + heading) - r[0] * np.sin(heading)
+        noise = self.rng_for(index, 1).normal(0, 3, (2, n_points))
+        lat = home_lat + (y + noise[0]) / METERS_PER_DEGREE
+        lng = home_lng + (x + noise[1]) / (METERS_PER_DEGREE * np.cos(np.radians(home_lat)))
+        return np.column_stack([lat, lng])
+
+    def summaries(self, indexes) -> list:
+        """SummaryActivity objects as listed by /athlete/activities."""
+        activities = []
+        for index in indexes:
+            start = pd.Timestamp(int(self.start_epochs[index]), unit="s")
+            home_lat, home_lng = HOMES[self.home[index]]
+            sport = str(self.sport_types[index])
+            distance = float(self.distances[index])
+            moving_time = int(self.moving_times[index])
+            activities.append(
+                {
+                    "id": int(self.ids[index]),
+                    "name": f"{'Morning' if start.hour < 12 else 'Evening'} {sport}",
+                    "type": "Ride" if sport == "VirtualRide" else sport,
+                    "sport_type": sport,
+                    "start_date": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    # Local time is one hour ahead of UTC for every home
+                    "start_date_local": (start + pd.Timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "timezone": "(GMT+01:00) Europe/Oslo",
+                    "distance": round(distance, 1),
+                    "moving_time": moving_time,
+                    "elapsed_time": moving_time + int(index % 7) * 30,
+                    "total_elevation_gain": round(distance / 1000 * (index % 13 + 2), 1),
+                    "trainer": bool(self.indoor[index]),
+                    "start_latlng": (
+                        [round(home_lat, 6), round(home_lng, 6)] if self.has_gps[index] else []
+                    ),
+                    "gear_id": self.gear_ids[index],
+                    "average_speed": round(distance / moving_time, 3),
+                    "average_heartrate": round(float(self.heartrates[index]), 1),
+                    "average_cadence": 85.0 if sport == "Run" else 88.0,
+                    "average_temp": None if self.indoor[index] else int(index % 25),
+                    "average_watts": round(self.speeds[index] * 25, 1) if "Ride" in sport else None,
+                    "suffer_score": None if self.suffer_scores[index] < 0 else int(self.suffer_scores[index]),
+                }
+            )
+        return activities
+
+    def list_activities(self, after: int = None, page: int = 1, per_page: int = 30) -> list:
+        """
+        One page of /athlete/activities. Like Strava, activities come newest first, or oldest
+        first when only those starting after `after` (epoch seconds) are listed.
+        """
+        if after is None:
+            order = np.arange(self.n_activities - 1, -1, -1)
+        else:
+            order = np.arange(np.searchsorted(self.start_epochs, after, side="right"), self.n_activities)
+        return self.summaries(order[(page - 1) * per_page : page * per_page])
+
+    def detail(self, activity_id: int):
+        """DetailedActivity with splits_metric, laps, best_efforts and available_zones."""
+        index = self.index_of(activity_id)
+        if index is None:
+            return None
+        activity = self.summaries([index])[0]
+        rng = self.rng_for(index, 2)
+        distance, moving_time = activity["distance"], activity["moving_time"]
+        speed = distance / moving_time
+        start = pd.Timestamp(activity["start_date"])
+
+        split_distances = [1000.0] * int(distance // 1000)
+        if distance % 1000 >= 1:
+            split_distances.append(round(distance % 1000, 1))
+        split_speeds = speed * rng.normal(1.0, 0.05, len(split_distances))
+        activity["splits_metric"] = [
+            {
+                "distance": split_distance,
+                "elapsed_time": int(split_distance / split_speed) + 2,
+                "elevation_difference": round(float(rng.normal(0, 8)), 1),
+                "moving_time": int(split_distance / split_speed),
+                "split": number,
+                "average_speed": round(float(split_speed), 3),
+                "average_grade_adjusted_speed": round(float(split_speed * 1.01), 3),
+                "average_heartrate": round(float(self.heartrates[index] + rng.normal(0, 4)), 1),
+                "pace_zone": int(rng.integers(1, 6)),
+            }
+            for number, (split_distance, split_speed) in enumerate(zip(split_distances, split_speeds), start=1)
+        ]
+
+        lap_count = max(int(distance // 5000), 1)
+        lap_distance = distance / lap_count
+        lap_time = moving_time / lap_count
+        activity["laps"] = [
+            {
+                "id": int(activity_id) * 100 + lap,
+                "name": f"Lap {lap}",
+                "lap_index": lap,
+                "start_date": (start + pd.Timedelta(seconds=lap_time * (lap - 1))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "distance": round(lap_distance, 1),
+                "elapsed_time": int(lap_time) + 5,
+                "moving_time": int(lap_time),
+                "start_index": int((lap - 1) * lap_time),
+                "end_index": int(lap * lap_time),
+                "total_elevation_gain": round(float(rng.uniform(0, 50)), 1),
+                "average_speed": round(speed, 3),
+                "max_speed": round(speed * 1.3, 3),
+                "average_cadence": activity["average_cadence"],
+                "average_watts": activity["average_watts"],
+                "average_heartrate": activity["average_heartrate"],
+                "max_heartrate": round(activity["average_heartrate"] + 15, 1),
+                "pace_zone": int(rng.integers(1, 6)),
+            }
+            for lap in range(1, lap_count + 1)
+        ]
+
+        efforts = BEST_EFFORTS if activity["sport_type"] == "Run" else []
+        activity["best_efforts"] = [
+            {
+                "id": int(activity_id) * 100 + number,
+                "activity": {"id": int(activity_id)},
+                "name": name,
+                "start_date_local": activity["start_date_local"],
+                "distance": effort_distance,
+                "moving_time": int(effort_distance / (speed * rng.uniform(1.0, 1.1))),
+                "elapsed_time": int(effort_distance / speed),
+                "pr_rank": int(rng.integers(1, 4)) if rng.random() < 0.02 else None,
+            }
+            for number, (name, effort_distance) in enumerate(efforts, start=1)
+            if effort_distance <= distance
+        ]
+        activity["available_zones"] = ["heartrate", "power"] if activity["average_watts"] else ["heartrate"]
+        return activity
+
+    def zones(self, activity_id: int):
+        """ActivityZone list with heart rate (and power for rides) distribution buckets."""
+        index = self.index_of(activity_id)
+        if index is None:
+            return None
+        rng = self.rng_for(index, 3)
+        moving_time = int(self.moving_times[index])
+
+        def buckets(bounds):
+            shares = rng.dirichlet(np.ones(len(bounds)))
+            return [
+                {"min": low, "max": high, "time": int(share * moving_time)}
+                for (low, high), share in zip(bounds, shares)
+            ]
+
+        zones = [
+            {
+                "type": "heartrate",
+                "sensor_based": True,
+                "distribution_buckets": buckets([(0, 125), (125, 145), (145, 160), (160, 175), (175, -1)]),
+            }
+        ]
+        if "Ride" in self.sport_types[index]:
+            zones.append(
+                {
+                    "type": "power",
+                    "sensor_based": True,
+                    "distribution_buckets": buckets([(0, 150), (150, 200), (200, 250), (250, 300), (300, -1)]),
+                }
+            )
+        return zones
+
+    def streams(self, activity_id: int, keys: list = None):
+        """Streams keyed by type, as returned with key_by_type=true."""
+        index = self.index_of(activity_id)
+        if index is None:
+            return None
+        rng = self.rng_for(index, 4)
+        moving_time = int(self.moving_times[index])
+        n_points = max(min(self.stream_points, moving_time), 2)
+
+        time = np.linspace(0, moving_time, n_points).astype(int)
+        step = np.diff(time, prepend=0)
+        speed = np.clip(self.speeds[index] * rng.normal(1.0, 0.08, n_points), 0.5, None)
+        distance = np.cumsum(speed * step)
+        distance *= self.distances[index] / max(distance[-1], 1.0)
+        data = {
+            "time": time.tolist(),
+            "distance": np.round(distance, 1).tolist(),
+            "altitude": np.round(50 + 20 * np.sin(np.linspace(0, 6, n_points)), 1).tolist(),
+            "velocity_smooth": np.round(speed, 3).tolist(),
+            "heartrate": np.round(self.heartrates[index] + rng.normal(0, 5, n_points)).astype(int).tolist(),
+            "cadence": np.round(rng.normal(85, 3, n_points)).astype(int).tolist(),
+        }
+        if self.has_gps[index]:
+            data["latlng"] = np.round(self.route_points(index, n_points), 6).tolist()
+        if "Ride" in self.sport_types[index]:
+            watts = np.clip(rng.normal(self.speeds[index] * 25, 40, n_points), 0, None)
+            data["watts"] = np.round(watts).astype(int).tolist()
+
+        return {
+            key: {"data": values, "series_type": "distance", "original_size": n_points, "resolution": "high"}
+            for key, values in data.items()
+            if keys is None or key in keys
+        }
+
+    def gear(self, gear_id: str):
+        """DetailedGear for one of the athlete's shoes or bikes."""
+        if gear_id not in GEAR:
+            return None
+        model_name, brand_name = GEAR[gear_id]
+        return {
+            "id": gear_id,
+            "primary": gear_id in ("g1", "b1"),
+            "name": f"{brand_name} {model_name}",
+            "distance": float(self.distances[np.array(self.gear_ids, dtype=object) == gear_id].sum()),
+            "brand_name": brand_name,
+            "model_name": model_name,
+            "retired": gear_id == "g3",
+            "weight": 8.2 if gear_id.startswith("b") else None,
+        }
+
+    def weather(self, lat: float, lng: float, start_date: str, end_date: str) -> dict:
+        """Open-Meteo hourly response for a location and an inclusive range of dates."""
+        hours = pd.date_range(start_date, pd.Timestamp(end_date) + pd.Timedelta(hours=23), freq="h")
+        rng = np.random.default_rng((self.seed, int(abs(lat) * 100), int(abs(lng) * 100), len(hours)))
+        day_of_year = hours.dayofyear.to_numpy()
+        temperature = 5 - 10 * np.cos(2 * np.pi * day_of_year / 365) + rng.normal(0, 3, len(hours))
+        precipitation = np.clip(rng.normal(-0.5, 1.0, len(hours)), 0, None)
+        return {
+            "latitude": lat,
+            "longitude": lng,
+            "timezone": "Europe/Oslo",
+            "hourly": {
+                "time": hours.strftime("%Y-%m-%dT%H:%M").tolist(),
+                "temperature_2m": np.round(temperature, 1).tolist(),
+                "precipitation": np.round(precipitation, 1).tolist(),
+                "rain": np.round(precipitation * (temperature > 0), 1).tolist(),
+                "snowfall": np.round(precipitation * (temperature <= 0), 1).tolist(),
+                "weather_code": np.where(precipitation > 0, 61, 3).tolist(),
+                "wind_speed_10m": np.round(rng.uniform(0, 12, len(hours)), 1).tolist(),
+            },
+        }
@@ -1,47 +1,121 @@
 # main.py
+import argparse
+import os
 import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import pandas as pd
 from loguru import logger
 from src.api.strava_api import StravaClient
+from src.api.rate_limiter import RateLimitExhausted
+from src.api.response_cache import CACHE_MODES, ResponseCache
 from src.api.weather_api import WeatherClient
 from src.db import DatabaseManager
+from src.metrics import metrics
+from src.profiling import PROFILE_MODES, PROFILE_STAGES, memory_tracker, profiler
 from src.models.weather import Weather
 from src.models.gear import Gear
 from src.models.splits import Splits
 from src.models.zones import Zones
 from src.models.activity import Activity
 from src.models.best_efforts import BestEfforts
-from src.config import get_strava_config
+from src.models.streams import Streams
+from src.models.stream_store import StreamStore
+from src.models.power_curve import PowerCurve
+from src.models.route import Route
+from src.models.training_load import TrainingLoad
+from src.queries import INSERT_OR_REPLACE_QUERY
+from src.config import (
+    get_strava_config,
+    FETCH_CONCURRENCY,
+    WRITE_BATCH_SIZE,
+    FULL_SYNC_INTERVAL_DAYS,
+    ACTIVITY_PAGE_SIZE,
+    RESPONSE_CACHE_MODE,
+    RESPONSE_CACHE_MAX_MB,
+    RESPONSE_CACHE_PATH,
+    STREAM_STORE_PATH,
+    METRICS_JSON_PATH,
+    METRICS_TEXTFILE_PATH,
+    PROFILE_PATH,
+)
 
 
-def main():
-    activities_data = strava_client.get_activities()
-    if not activities_data:
-        logger.warning("No activities data fetched from Strava.")
-        db_manager.check_discrepancies()
-        return
+def main(full_sync=False, repair=False):
+    watermark = db_manager.get_sync_watermark()
+    full_sync = full_sync or watermark is None or is_full_sync_due()
 
-    activities_df = pd.DataFrame(activities_data)
-    if activities_df.empty:
-        logger.warning("No new activities to process.")
-        db_manager.check_discrepancies()
-        return
+    if full_sync:
+        logger.info("Running full sync of the activity history.")
+        pages = strava_client.iter_activity_pages(per_page=ACTIVITY_PAGE_SIZE)
+    else:
+        logger.info(f"Running incremental sync of activities after {pd.Timestamp(watermark, unit='s')} UTC.")
+        pages = strava_client.iter_activity_pages(per_page=ACTIVITY_PAGE_SIZE, after=watermark)
+
+    latest_start = watermark or 0
+    listed_ids = set()
+    oldest_listed_date = None
+    earliest_new_date = None
+    last_page_size = 0
 
     try:
-        # Process and filter activities
-        activities_df = Activity.process_activity_data(activities_df)
-        cached_ids = db_manager.get_ids_from_cache()
-        new_activities_df = activities_df[~activities_df["id"].isin(cached_ids)]
-        new_activity_ids = new_activities_df["id"].tolist()
-
-        if new_activity_ids:
-            # Insert new activities into the database
-            db_manager.insert_dataframe_to_db(df=new_activities_df, table_name="activities")
-            
-            # Process each new activity in detail
-            process_new_activities(new_activity_ids)
+        known_ids = set(db_manager.get_ids_from_sync_jobs())
+        page_count = 0
+
+        # Each page is processed, filtered and inserted before the next one is requested
+        with profiler.stage("listing"):
+            for page in pages:
+                page_count += 1
+                last_page_size = len(page)
+                activities_df = pd.DataFrame(page)
+                latest_start = max(
+                    latest_start, pd.to_datetime(activities_df["start_date"], utc=True).max().timestamp()
+                )
+                activities_df, new_activities_df = process_activity_page(activities_df, known_ids, full_sync)
+
+                if not new_activities_df.empty:
+                    page_earliest_date = new_activities_df["date"].min()
+                    if earliest_new_date is None or page_earliest_date < earliest_new_date:
+                        earliest_new_date = page_earliest_date
+
+                if full_sync:
+                    listed_ids.update(activities_df["id"].tolist())
+                    page_oldest_date = activities_df["date"].min()
+                    if oldest_listed_date is None or page_oldest_date < oldest_listed_date:
+                        oldest_listed_date = page_oldest_date
+
+        if page_count == 0:
+            logger.info("No new activities listed on Strava.")
         else:
-            logger.info("No new activities.")
+            if full_sync:
+                # A listing that ends on a full page may have stopped early (a failed request or a
+                # replay cache miss), with more activities of its oldest day on the next page
+                listing_complete = last_page_size < ACTIVITY_PAGE_SIZE
+                delete_unlisted_activities(listed_ids, oldest_listed_date, listing_complete)
+                # Edits and deletions can change the load of any listed day
+                earliest_new_date = oldest_listed_date
+
+            # Listed activities are stored with their pending jobs, so the watermark can advance
+            # before the jobs have run
+            db_manager.set_sync_state("activities_watermark", int(latest_start))
+            if full_sync:
+                db_manager.set_sync_state("last_full_sync", int(time.time()))
+
+        TrainingLoad.update_training_load(db_manager, since_date=earliest_new_date)
+
+        if repair:
+            db_manager.check_discrepancies(repair=True)
+
+        # Runs the jobs of the new activities along with any left over from earlier runs
+        with profiler.stage("sync_jobs"):
+            run_sync_jobs()
+        with profiler.stage("gear"):
+            Gear.sync_gear(db_manager, strava_client)
+        with profiler.stage("weather"):
+            Weather.process_weather_jobs(db_manager, weather_client)
+
+    except RateLimitExhausted as e:
+        logger.critical(f"{e}. Progress is saved, run again after the reset to resume.")
 
     except Exception as e:
         logger.error(f"Error during main processing: {e}")
@@ -50,48 +124,329 @@ def main():
         db_manager.check_discrepancies()
 
 
-def process_new_activities(new_activity_ids):
-    for activity_id in new_activity_ids:
-        try:
-            logger.debug(f"Processing activity {activity_id}")
-            db_manager.update_cache(activity_id)
-            detailed_activity = strava_client.get_detailed_activity(activity_id)
+@metrics.timed()
+def process_activity_page(activities_df, known_ids, full_sync=False):
+    """
+    Processes one page of listed activities, inserts the ones without sync jobs and queues their jobs.
 
-            if not detailed_activity:
-                logger.warning(f"Activity {activity_id} has no detailed data.")
-                continue
+    Returns the processed page and its new activities. `known_ids` is updated with the
+    activities queued.
+    """
+    # Process and filter activities
+    activities_df = Activity.process_activity_data(activities_df)
+    new_activities_df = activities_df[~activities_df["id"].isin(known_ids)]
+    new_activity_ids = new_activities_df["id"].tolist()
 
-            # Process detailed data
-            process_individual_activity(activity_id, detailed_activity)
+    if full_sync:
+        # Apply edits made on Strava to the activities already stored
+        db_manager.insert_dataframe_to_db(
+            df=activities_df, table_name="activities", query=INSERT_OR_REPLACE_QUERY
+        )
 
-        except Exception as e:
-            logger.error(f"Error processing activity {activity_id}: {e}")
+    if new_activity_ids:
+        # Insert new activities and their jobs together, so neither exists without the other
+        with db_manager.transaction():
+            db_manager.insert_dataframe_to_db(df=new_activities_df, table_name="activities")
+            db_manager.enqueue_sync_jobs(new_activity_ids)
+        known_ids.update(new_activity_ids)
+    else:
+        logger.info("No new activities.")
 
+    return activities_df, new_activities_df
 
-def process_individual_activity(activity_id, detailed_activity):
-    try:
-        detailed_activity_df = pd.DataFrame([detailed_activity])
-        splits_df = Splits.process_splits(strava_client, detailed_activity_df)
-        zones_data = strava_client.get_activity_zones(activity_id)
-        zones_df = Zones.process_zones(zones_data, activity_id)
-        best_efforts_data = detailed_activity.get("best_efforts", [])
-        best_efforts_df = BestEfforts.process_best_efforts(activity_id, best_efforts_data)
-        # Insert processed data into the database
-        db_manager.insert_dataframe_to_db(df=splits_df, table_name="splits")
-        db_manager.insert_dataframe_to_db(df=zones_df, table_name="zones")
-        db_manager.insert_dataframe_to_db(df=best_efforts_df, table_name="best_efforts")
 
+def is_full_sync_due():
+    """Checks whether the last full sync is older than FULL_SYNC_INTERVAL_DAYS."""
+    last_full_sync = db_manager.get_sync_state("last_full_sync")
+    if last_full_sync is None:
+        return True
+    return time.time() - float(last_full_sync) > FULL_SYNC_INTERVAL_DAYS * 24 * 60 * 60
+
+
+def delete_unlisted_activities(listed_ids, oldest_listed_date, listing_complete=True):
+    """
+    Deletes stored activities that a full listing no longer contains. Only dates covered
+    by the listing are considered, so an interrupted listing never deletes older history.
+    Unless the listing is known to be complete, its oldest day is left alone too, as it may
+    continue on a page that was never fetched.
+    """
+    if listing_complete:
+        known_ids = db_manager.get_ids_from_activities_since(oldest_listed_date)
+    else:
+        known_ids = db_manager.get_ids_from_activities_after(oldest_listed_date)
+    deleted_ids = sorted(set(known_ids) - listed_ids)
+    if deleted_ids:
+        db_manager.delete_activities(deleted_ids)
+
+
+@metrics.timed()
+def fetch_detail_stage(activity_id):
+    """Fetches the detailed activity and builds its splits, split and lap rows and best efforts."""
+    detailed_activity = strava_client.get_detailed_activity(activity_id)
+    if not detailed_activity:
+        return None
+
+    detailed_activity_df = pd.DataFrame([detailed_activity])
+    splits_df = Splits.process_splits(strava_client, detailed_activity_df)
+    best_efforts_data = detailed_activity.get("best_efforts", [])
+    best_efforts_df = BestEfforts.process_best_efforts(activity_id, best_efforts_data)
+    return {
+        "splits": splits_df,
+        "split_rows": Splits.process_split_rows(detailed_activity_df),
+        "lap_rows": Splits.process_lap_rows(detailed_activity_df),
+        "best_efforts": best_efforts_df,
+    }
+
+
+@metrics.timed()
+def fetch_zones_stage(activity_id):
+    """Fetches the heart rate and power zones of an activity."""
+    zones_data = strava_client.get_activity_zones(activity_id)
+    if zones_data is None:
+        return None
+    return {"zones": Zones.process_zones(zones_data, activity_id)}
+
+
+@metrics.timed()
+def fetch_streams_stage(activity_id):
+    """Fetches the full-resolution streams of an activity."""
+    streams_df = Streams(strava_client).get_streams(activity_id, resolution="high")
+    if streams_df.empty:
+        return None
+    return {"streams": streams_df}
+
+
+# Fetch function of each sync stage; it runs in a worker thread and returns the frames to
+# insert by table, or None if the stage failed. Gear and weather jobs are batched instead
+# (see Gear.sync_gear and Weather.process_weather_jobs).
+STAGE_FETCHERS = {
+    "detail": fetch_detail_stage,
+    "zones": fetch_zones_stage,
+    "streams": fetch_streams_stage,
+}
+
+
+@metrics.timed()
+def run_sync_jobs(concurrency=FETCH_CONCURRENCY, batch_size=WRITE_BATCH_SIZE):
+    """
+    Runs every pending sync job in priority order with `concurrency` requests in flight.
+
+    This thread is the single writer: each job's frames and its completion are persisted in the
+    same transaction, every `batch_size` jobs, so an interrupted run resumes with exactly the
+    jobs that were not stored. Failed jobs are retried on later runs, up to SYNC_MAX_ATTEMPTS.
+    """
+    jobs = [job for job in db_manager.get_pending_sync_jobs() if job[1] in STAGE_FETCHERS]
+    if not jobs:
+        return
+    logger.info(f"Running {len(jobs)} pending sync jobs.")
+
+    results = []
+    failed = []
+    exhausted = None
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fetch") as executor:
+        job_iter = iter(jobs)
+        in_flight = {}
+
+        def submit_next():
+            job = next(job_iter, None)
+            if job is not None:
+                # Worker threads are outside a cProfile enabled in this one, so they get their own
+                fetch = profiler.wrap("sync_jobs", STAGE_FETCHERS[job[1]])
+                in_flight[executor.submit(fetch, job[0])] = job
+
+        # Submit lazily so the executor queue stays in priority order and short
+        for _ in range(concurrency * 2):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                activity_id, stage = in_flight.pop(future)
+                error = future.exception()
+                if isinstance(error, RateLimitExhausted):
+                    # Leave the job pending so the next run picks it up again
+                    exhausted = exhausted or error
+                    continue
+
+                if error is None and future.result() is None:
+                    error = "No data received"
+                if error is not None:
+                    logger.error(f"Error running {stage} for activity {activity_id}: {error}")
+                    failed.append((activity_id, stage, str(error)))
+                else:
+                    logger.debug(f"Finished {stage} for activity {activity_id}")
+                    results.append((activity_id, stage, future.result()))
+
+                if exhausted is None:
+                    submit_next()
+
+            if len(results) + len(failed) >= batch_size:
+                write_sync_batch(results, failed)
+
+    write_sync_batch(results, failed)
+    if exhausted:
+        raise exhausted
+
+
+@metrics.timed()
+def write_sync_batch(results, failed):
+    """
+    Inserts the frames of the finished jobs in `results` ((activity_id, stage, frames by table))
+    and records the finished and failed jobs in one transaction, then empties the buffers.
+
+    If the batch cannot be written, every job is written in its own transaction, and the jobs
+    whose frames cannot be inserted are recorded as failed rather than done.
+    """
+    try:
+        write_job_results(results, failed)
     except Exception as e:
-        logger.error(f"Error in processing individual activity {activity_id}: {e}")
+        logger.error(f"Error writing a batch of {len(results)} sync jobs, writing them one by one: {e}")
+        for activity_id, stage, frames in results:
+            try:
+                write_job_results([(activity_id, stage, frames)], [])
+            except Exception as job_error:
+                failed.append((activity_id, stage, f"Error storing data: {job_error}"))
+        db_manager.fail_sync_jobs(failed)
+
+    results.clear()
+    failed.clear()
+
+
+def write_job_results(results, failed):
+    """Inserts the frames of `results` by table and records their jobs as done, all or nothing."""
+    pending_frames = defaultdict(list)
+    for _, _, frames in results:
+        for table_name, df in frames.items():
+            if df is not None and not df.empty:
+                pending_frames[table_name].append(df)
 
+    with db_manager.transaction():
+        for table_name, frames in pending_frames.items():
+            db_manager.insert_dataframe_to_db(
+                df=pd.concat(frames, ignore_index=True), table_name=table_name
+            )
+        db_manager.complete_sync_jobs([(activity_id, stage) for activity_id, stage, _ in results])
+        db_manager.fail_sync_jobs(failed)
 
 
 if __name__ == "__main__":
-    strava_client = StravaClient(**get_strava_config())
-    # weather_client = WeatherClient()
+    parser = argparse.ArgumentParser(description="Sync Strava activities into the local database.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-list the whole activity history to pick up edits and deletions.",
+    )
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="Re-queue the sync stages of activities that are missing splits, zones, best efforts, streams or weather.",
+    )
+    parser.add_argument(
+        "--rebuild-rollups",
+        action="store_true",
+        help="Recompute the weekly/monthly/yearly activity rollups, gear mileage and power curve envelope from scratch and exit.",
+    )
+    parser.add_argument(
+        "--cache-mode",
+        choices=CACHE_MODES,
+        default=RESPONSE_CACHE_MODE,
+        help="Response cache mode. 'replay' serves every request from the cache without using the network.",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        help="Profile the run with cProfile or a sampling profiler that sees every thread.",
+    )
+    parser.add_argument(
+        "--profile-stages",
+        nargs="+",
+        choices=PROFILE_STAGES,
+        default=["sync"],
+        help="Stages profiled separately; 'sync' is the whole run (default).",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help=f"Directory of the profile files and report (default: a timestamped directory in {PROFILE_PATH}).",
+    )
+    parser.add_argument("--profile-top", type=int, default=30, help="Hot functions listed per stage.")
+    parser.add_argument(
+        "--profile-interval", type=float, default=0.005, help="Seconds between samples of the sampling profiler."
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Track tracemalloc peaks and snapshots of activity processing and DataFrame inserts (slow).",
+    )
+    args = parser.parse_args()
+
+    if args.profile or args.trace_memory:
+        profile_dir = args.profile_dir or os.path.join(PROFILE_PATH, time.strftime("%Y%m%d-%H%M%S"))
+        try:
+            profiler.configure(
+                args.profile,
+                args.profile_stages if args.profile else [],
+                profile_dir,
+                top=args.profile_top,
+                interval=args.profile_interval,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        if args.trace_memory:
+            memory_tracker.start()
 
     db_manager = DatabaseManager()
     db_manager.create_all_tables()
-    main()
+    db_manager.migrate_lat_lng()
+    # Activities stored before the location triggers existed are not in the R*Tree yet
+    if db_manager.get_unindexed_location_count() > 0:
+        db_manager.rebuild_activity_locations()
+    Streams.migrate_json_streams(db_manager)
+    db_manager.seed_sync_jobs()
+    Splits.backfill_rows(db_manager)
+    # Databases created before the gear triggers existed have no gear mileage yet
+    if args.rebuild_rollups or db_manager.is_gear_mileage_missing():
+        db_manager.rebuild_gear_mileage()
+    # Databases created before the rollup triggers existed start with empty rollups
+    if args.rebuild_rollups or (
+        db_manager.get_row_count("activity_rollups") == 0
+        and db_manager.get_row_count("activities") > 0
+    ):
+        db_manager.rebuild_rollups()
+        if args.rebuild_rollups:
+            PowerCurve.rebuild_envelope(db_manager)
+            db_manager.close()
+            raise SystemExit(0)
+
+    response_cache = ResponseCache(
+        RESPONSE_CACHE_PATH, args.cache_mode, RESPONSE_CACHE_MAX_MB * 1024 * 1024
+    )
+    strava_client = StravaClient(**get_strava_config(), response_cache=response_cache)
+    weather_client = WeatherClient()
+
+    try:
+        with profiler.stage("sync"):
+            main(full_sync=args.full, repair=args.repair)
+
+            with profiler.stage("stream_store"):
+                stream_store = StreamStore(STREAM_STORE_PATH)
+                stream_store.sync_from_db(db_manager)
+                stream_store.close()
+            with profiler.stage("power_curves"):
+                PowerCurve.process_new_curves(db_manager)
+            with profiler.stage("routes"):
+                Route.process_new_fingerprints(db_manager)
+            with profiler.stage("stream_best_efforts"):
+                BestEfforts.process_new_stream_best_efforts(db_manager)
+    except RateLimitExhausted as e:
+        logger.critical(f"{e}. Run again after the reset to resume.")
+    finally:
+        strava_client.rate_limiter.save_state()
+        response_cache.close()
+        db_manager.close()
+        logger.info(metrics.summary())
+        metrics.write_json(METRICS_JSON_PATH)
+        metrics.write_prometheus(METRICS_TEXTFILE_PATH)
+        profiler.write_reports(memory_tracker.report(profiler.output_dir))
 
     
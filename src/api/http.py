@@ -0,0 +1,34 @@
+# src/api/http.py
+import random
+import requests
+from requests.adapters import HTTPAdapter
+from src.config import HTTP_POOL_SIZE
+
+# Responses worth retrying with backoff; 429 is handled separately through Retry-After
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+# Errors raised before a response arrives that are worth retrying
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+def create_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """Creates a requests Session whose connection pool keeps `pool_size` connections per host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter: a random delay up to base * 2^(attempt - 1), capped."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def retry_after_seconds(response) -> float | None:
+    """Parses a Retry-After header given in seconds. HTTP-date values are ignored."""
+    value = response.headers.get("Retry-After")
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,183 @@
+# src/api/rate_limiter.py
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from loguru import logger
+
+
+class RateLimitExhausted(Exception):
+    """Raised when the daily request budget is spent. `reset_at` is the epoch time it refills."""
+
+    def __init__(self, reset_at: float):
+        self.reset_at = reset_at
+        reset_time = datetime.fromtimestamp(reset_at, tz=timezone.utc)
+        super().__init__(f"Daily rate limit exhausted until {reset_time:%Y-%m-%d %H:%M} UTC")
+
+
+class TokenBucket:
+    """
+    Request budget for one Strava rate-limit window.
+
+    Strava windows are fixed and aligned to the clock (every 15 minutes, and midnight UTC),
+    so the bucket refills to `limit` at each boundary. A paced bucket spreads its remaining
+    tokens evenly over the time left in the window instead of letting them go in one burst.
+    """
+
+    def __init__(self, name: str, limit: int, window_seconds: int, paced: bool):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.paced = paced
+        self.tokens = float(limit)
+        self.reset_at = self.next_reset(time.time())
+        self.next_slot = 0.0
+
+    def next_reset(self, now: float) -> float:
+        """Returns the epoch time of the next window boundary after `now`."""
+        return (now // self.window_seconds + 1) * self.window_seconds
+
+    def refill(self, now: float) -> None:
+        """Starts a new window if `now` is past the current one."""
+        if now >= self.reset_at:
+            self.tokens = float(self.limit)
+            self.reset_at = self.next_reset(now)
+
+    def reserve(self, now: float) -> float:
+        """Takes one token and returns the epoch time at which the request may be sent."""
+        slot = max(now, self.next_slot)
+        self.refill(slot)
+        if self.tokens < 1:
+            slot = self.reset_at
+            self.refill(slot)
+
+        self.tokens -= 1
+        if self.paced:
+            time_left = self.reset_at - slot
+            self.next_slot = slot + (time_left / self.tokens if self.tokens >= 1 else time_left)
+        return slot
+
+    def sync(self, limit: int, usage: int, in_flight: int) -> None:
+        """Seeds the bucket from the limit and usage Strava reported for this window."""
+        self.refill(time.time())
+        self.limit = limit
+        self.tokens = float(max(limit - usage - in_flight, 0))
+
+    def to_dict(self) -> dict:
+        return {"limit": self.limit, "tokens": self.tokens, "reset_at": self.reset_at}
+
+
+class RateLimiter:
+    """
+    Thread-safe admission control for the Strava 15-minute and daily limits.
+
+    Every request calls `acquire()` before it is sent and `update()` with the response headers.
+    Callers sleep outside the lock, so concurrent workers are admitted one paced slot at a time.
+    """
+
+    SHORT_WINDOW = 15 * 60
+    DAILY_WINDOW = 24 * 60 * 60
+
+    def __init__(self, short_limit: int = 100, daily_limit: int = 1000, state_path: str = None):
+        self.short = TokenBucket("15-min", short_limit, self.SHORT_WINDOW, paced=True)
+        self.daily = TokenBucket("daily", daily_limit, self.DAILY_WINDOW, paced=False)
+        self.state_path = state_path
+        self.in_flight = 0
+        self.total_wait = 0.0
+        self._lock = threading.Lock()
+
+        if state_path:
+            self.load_state()
+
+    def acquire(self) -> float:
+        """
+        Blocks until a request may be sent and returns the seconds waited.
+
+        Raises RateLimitExhausted (after saving state) instead of waiting for the daily window.
+        """
+        with self._lock:
+            now = time.time()
+            self.daily.refill(now)
+            if self.daily.tokens < 1:
+                self.save_state()
+                raise RateLimitExhausted(self.daily.reset_at)
+
+            slot = self.short.reserve(now)
+            self.daily.tokens -= 1
+            self.in_flight += 1
+
+        wait = max(slot - now, 0.0)
+        if wait > 0:
+            if wait > 60:
+                logger.warning(f"15-minute rate limit spent. Waiting {wait / 60:.1f} minutes.")
+            time.sleep(wait)
+            with self._lock:
+                self.total_wait += wait
+        return wait
+
+    def release(self) -> None:
+        """Marks an admitted request as finished when no response headers are available."""
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+    def update(self, headers) -> None:
+        """Releases an admitted request and re-seeds both buckets from its X-RateLimit-* headers."""
+        limit = headers.get("X-RateLimit-Limit")
+        usage = headers.get("X-RateLimit-Usage")
+
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            if not usage:
+                return
+
+            short_usage, daily_usage = map(int, usage.split(","))
+            if limit:
+                short_limit, daily_limit = map(int, limit.split(","))
+            else:
+                short_limit, daily_limit = self.short.limit, self.daily.limit
+
+            self.short.sync(short_limit, short_usage, self.in_flight)
+            self.daily.sync(daily_limit, daily_usage, self.in_flight)
+
+        logger.debug(
+            f"Rate limit: {short_usage}/{short_limit} (15-min), {daily_usage}/{daily_limit} (daily)"
+        )
+
+    def throttled(self) -> None:
+        """Empties the 15-minute bucket after a 429 so every worker waits for the next window."""
+        with self._lock:
+            self.short.tokens = 0.0
+            self.short.next_slot = self.short.reset_at
+
+    def save_state(self) -> None:
+        """Writes both buckets to `state_path` so the next run resumes with the same budget."""
+        if not self.state_path:
+            return
+        state = {"short": self.short.to_dict(), "daily": self.daily.to_dict()}
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            with open(self.state_path, "w") as f:
+                json.dump(state, f)
+        except OSError as e:
+            logger.error(f"Failed to save rate limit state: {e}")
+
+    def load_state(self) -> None:
+        """Restores buckets saved by a previous run, if their windows have not reset yet."""
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load rate limit state: {e}")
+            return
+
+        now = time.time()
+        for key, bucket in (("short", self.short), ("daily", self.daily)):
+            saved = state.get(key)
+            if saved and saved["reset_at"] > now:
+                bucket.limit = saved["limit"]
+                bucket.tokens = saved["tokens"]
+                bucket.reset_at = saved["reset_at"]
+                logger.info(f"Resuming {bucket.name} rate limit with {int(bucket.tokens)} requests left.")
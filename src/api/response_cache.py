@@ -0,0 +1,157 @@
+# src/api/response_cache.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from loguru import logger
+
+CACHE_MODES = ("off", "record", "replay")
+
+# How long a cached response may be served in record mode, by endpoint. Anything that does not
+# match (such as the athlete/activities listing) is always re-fetched, but still stored for replay.
+CACHE_TTLS = [
+    (re.compile(r"^activities/\d+(/zones|/laps|/streams)?$"), 30 * 24 * 60 * 60),
+    (re.compile(r"^gear/"), 24 * 60 * 60),
+]
+
+CREATE_RESPONSES_TABLE = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        endpoint TEXT,
+        params TEXT,
+        body BLOB,
+        size INTEGER,
+        created_at REAL,
+        accessed_at REAL
+    )
+"""
+CREATE_ACCESSED_INDEX = "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of JSON API responses, stored zlib-compressed in SQLite.
+
+    Modes:
+        off:    the cache is bypassed.
+        record: fresh entries (see CACHE_TTLS) are served from disk, every response is stored.
+        replay: every request is served from disk regardless of age; misses never reach the network.
+
+    Entries are evicted least-recently-used once the cache grows beyond `max_bytes`.
+    """
+
+    def __init__(self, path: str, mode: str = "record", max_bytes: int = 512 * 1024 * 1024):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Invalid cache mode: {mode}. Expected one of {CACHE_MODES}.")
+
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total_bytes = 0
+
+        if mode != "off":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute(CREATE_RESPONSES_TABLE)
+            self._conn.execute(CREATE_ACCESSED_INDEX)
+            self._total_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def replay(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def make_key(endpoint: str, params: dict = None) -> str:
+        """Hashes an endpoint and its parameters into a stable cache key."""
+        payload = json.dumps({"endpoint": endpoint, "params": params or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def ttl_for(endpoint: str) -> int:
+        """Returns how many seconds a response from `endpoint` may be served in record mode."""
+        for pattern, ttl in CACHE_TTLS:
+            if pattern.match(endpoint):
+                return ttl
+        return 0
+
+    def get(self, endpoint: str, params: dict = None):
+        """Returns the cached JSON response, or None on a miss or an expired entry."""
+        if not self.enabled:
+            return None
+
+        key = self.make_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (not self.replay and now - row[1] >= self.ttl_for(endpoint)):
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, endpoint: str, params: dict, data) -> None:
+        """Stores a JSON response, evicting the least recently used entries if the cache is full."""
+        if not self.enabled or self.replay:
+            return
+
+        key = self.make_key(endpoint, params)
+        body = zlib.compress(json.dumps(data).encode())
+        now = time.time()
+        with self._lock:
+            try:
+                previous = self._conn.execute(
+                    "SELECT size FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, endpoint, json.dumps(params or {}, sort_keys=True), body, len(body), now, now),
+                )
+                self._total_bytes += len(body) - (previous[0] if previous else 0)
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing response cache: {e}")
+
+    def _evict(self) -> None:
+        """Deletes least recently used entries until the cache is below 90% of `max_bytes`."""
+        target = self.max_bytes * 0.9
+        evicted = 0
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+
+        self._conn.execute("BEGIN")
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        self._conn.execute("COMMIT")
+        logger.debug(f"Evicted {evicted} responses from the cache.")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -1,8 +1,29 @@
 # src/clients/strava_client.py
-import requests
-import sys
+import threading
 import time
+import requests
 from loguru import logger
+from src.api.http import (
+    RETRY_EXCEPTIONS,
+    RETRY_STATUS_CODES,
+    backoff_delay,
+    create_session,
+    retry_after_seconds,
+)
+from src.api.rate_limiter import RateLimiter
+from src.api.response_cache import ResponseCache
+from src.config import (
+    HTTP_MAX_ATTEMPTS,
+    HTTP_POOL_SIZE,
+    HTTP_TIMEOUT,
+    RATE_LIMIT_STATE_PATH,
+    RESPONSE_CACHE_MAX_MB,
+    RESPONSE_CACHE_MODE,
+    RESPONSE_CACHE_PATH,
+    STRAVA_API_URL,
+    STRAVA_OAUTH_URL,
+)
+from src.metrics import endpoint_label, metrics
 # from src.utils import check_rate_limit
 
 
@@ -14,20 +35,35 @@ class StravaClient:
         refresh_token,
         athlete_id,
         access_token=None,
+        rate_limiter=None,
+        pool_size=HTTP_POOL_SIZE,
+        response_cache=None,
+        api_url=STRAVA_API_URL,
+        oauth_url=STRAVA_OAUTH_URL,
     ):
         self.client_id = client_id
         self.client_secret = client_secret
         self.refresh_token = refresh_token
         self.access_token = access_token
+        self.expires_at = None
         self.athlete_id = athlete_id
+        self.api_url = api_url.rstrip("/")
+        self.oauth_url = oauth_url
+        self.session = create_session(pool_size)
+        self._token_lock = threading.Lock()
+        self.rate_limiter = rate_limiter or RateLimiter(state_path=RATE_LIMIT_STATE_PATH)
+        self.response_cache = response_cache or ResponseCache(
+            RESPONSE_CACHE_PATH, RESPONSE_CACHE_MODE, RESPONSE_CACHE_MAX_MB * 1024 * 1024
+        )
         logger.info(f"Initializing StravaClient for athlete {athlete_id}")
 
-        if self.access_token is None:
+        # Replay mode never touches the network, so there is no token to refresh
+        if self.access_token is None and not self.response_cache.replay:
             self.refresh_access_token()
 
     def refresh_access_token(self):
         """Refresh the access token using the refresh token."""
-        url = "https://www.strava.com/oauth/token"
+        url = self.oauth_url
         params = {
             "client_id": self.client_id,
             "client_secret": self.client_secret,
@@ -35,7 +71,7 @@ class StravaClient:
             "grant_type": "refresh_token",
         }
         try:
-            response = requests.post(url, params=params)
+            response = self.session.post(url, params=params, timeout=HTTP_TIMEOUT)
             response.raise_for_status()  # Ensure the request succeeded
 
             data = response.json()
@@ -47,61 +83,173 @@ class StravaClient:
         except requests.exceptions.RequestException as e:
             logger.critical(f"Failed to refresh token: {e}")
 
-    def make_request(self, endpoint, method="GET", params=None):
-        """Make a request to the Strava API and return the JSON response."""
-
-        headers = {"Authorization": f"Bearer {self.access_token}"}
+    def ensure_access_token(self, expired_token=None):
+        """
+        Refresh the access token if it expires within a minute, or if it is still `expired_token`.
 
-        url = f"https://www.strava.com/api/v3/{endpoint}"
+        Concurrent callers that saw the same expired token trigger a single refresh.
+        """
+        with self._token_lock:
+            if expired_token is not None and self.access_token == expired_token:
+                self.refresh_access_token()
+            elif self.expires_at is not None and self.expires_at - time.time() < 60:
+                self.refresh_access_token()
 
-        try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, params=params)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, json=params)
-            else:
-                raise ValueError(f"HTTP method {method} not supported.")
+    def make_request(self, endpoint, method="GET", params=None, max_attempts=HTTP_MAX_ATTEMPTS):
+        """
+        Make a request to the Strava API and return the JSON response, or None if it failed.
+
+        GET requests are answered from the response cache when it holds a fresh entry;
+        in replay mode they are only answered from the cache.
+        Every attempt is admitted by the shared rate limiter first, so this may block until
+        a slot in the 15-minute window opens. Connection errors and 5xx responses are retried
+        with exponential backoff, 429 responses after Retry-After (or the next 15-minute window),
+        and a 401 once after refreshing the access token.
+        Raises RateLimitExhausted when the daily budget is spent.
+        """
 
+        url = f"{self.api_url}/{endpoint}"
+
+        if method not in ("GET", "POST"):
+            raise ValueError(f"HTTP method {method} not supported.")
+
+        endpoint_name = endpoint_label(endpoint)
+        use_cache = method == "GET" and self.response_cache.enabled
+        if use_cache:
+            cached = self.response_cache.get(endpoint, params)
+            if cached is not None or self.response_cache.replay:
+                if cached is None:
+                    logger.warning(f"No cached response for {endpoint} in replay mode.")
+                else:
+                    metrics.increment("http_cache_hits_total", api="strava", endpoint=endpoint_name)
+                return cached
+
+        refreshed = False
+        for attempt in range(1, max_attempts + 1):
+            self.ensure_access_token()
+            access_token = self.access_token
+            headers = {"Authorization": f"Bearer {access_token}"}
+
+            wait = self.rate_limiter.acquire()
+            if wait:
+                metrics.increment("rate_limit_wait_seconds_total", wait, api="strava")
+            start = time.perf_counter()
+            try:
+                if method == "GET":
+                    response = self.session.get(url, headers=headers, params=params, timeout=HTTP_TIMEOUT)
+                else:
+                    response = self.session.post(url, headers=headers, json=params, timeout=HTTP_TIMEOUT)
+            except RETRY_EXCEPTIONS as e:
+                metrics.increment("http_requests_total", api="strava", endpoint=endpoint_name, status="error")
+                self.rate_limiter.release()
+                if attempt < max_attempts:
+                    delay = backoff_delay(attempt)
+                    logger.warning(f"Request to {endpoint} failed ({e}), retrying in {delay:.1f}s.")
+                    time.sleep(delay)
+                    continue
+                logger.error(f"Request to {endpoint} failed: {e}")
+                return None
+            except requests.exceptions.RequestException as e:
+                metrics.increment("http_requests_total", api="strava", endpoint=endpoint_name, status="error")
+                self.rate_limiter.release()
+                logger.error(f"Request to {endpoint} failed: {e}")
+                return None
+
+            metrics.observe(
+                "http_request_seconds", time.perf_counter() - start, api="strava", endpoint=endpoint_name
+            )
+            metrics.increment(
+                "http_requests_total", api="strava", endpoint=endpoint_name, status=response.status_code
+            )
             self.check_rate_limit(response)
-            response.raise_for_status()
 
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request to {endpoint} failed: {e}")
-
-    def get_activities(self, per_page=200, max_activities=None):
+            if attempt < max_attempts:
+                if response.status_code == 401 and not refreshed:
+                    logger.warning("Access token rejected, refreshing.")
+                    self.ensure_access_token(expired_token=access_token)
+                    refreshed = True
+                    continue
+
+                if response.status_code == 429:
+                    retry_after = retry_after_seconds(response)
+                    if retry_after is not None:
+                        logger.warning(f"Rate limit exceeded. Retrying after {retry_after:.0f}s.")
+                        metrics.increment("rate_limit_wait_seconds_total", retry_after, api="strava")
+                        time.sleep(retry_after)
+                    else:
+                        logger.critical("Rate limit exceeded. Waiting for the next 15-minute window.")
+                        self.rate_limiter.throttled()
+                    continue
+
+                if response.status_code in RETRY_STATUS_CODES:
+                    delay = backoff_delay(attempt)
+                    logger.warning(
+                        f"Request to {endpoint} returned {response.status_code}, retrying in {delay:.1f}s."
+                    )
+                    time.sleep(delay)
+                    continue
+
+            try:
+                response.raise_for_status()
+                data = response.json()
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Request to {endpoint} failed: {e}")
+                return None
+
+            if use_cache:
+                self.response_cache.put(endpoint, params, data)
+            return data
+
+    def iter_activity_pages(self, per_page=200, max_activities=None, after=None):
         """
-        Fetch the athlete's activities, supporting pagination.
+        Fetch the athlete's activities one page at a time.
 
         :param per_page: Number of activities to fetch per page (default is 200).
         :param max_activities: Maximum number of activities to fetch (default is None for all available).
-        :return: A list of activities.
+        :param after: Epoch timestamp; only activities starting after it are fetched (default is None for all).
+        :return: A generator yielding each page as a list of activities.
         """
-        activities = []
+        fetched = 0
         page = 1
 
         while True:
             params = {"per_page": per_page, "page": page}
+            if after is not None:
+                params["after"] = int(after)
 
             data = self.make_request("athlete/activities", params=params)
 
             if not data:
-                logger.warning("No activity data recieved.")
+                if page == 1:
+                    logger.warning("No activity data recieved.")
                 break
 
-            activities.extend(data)
-
             # Stop if we've fetched enough activities
-            if max_activities and len(activities) >= max_activities:
-                activities = activities[:max_activities]
+            if max_activities and fetched + len(data) >= max_activities:
+                yield data[: max_activities - fetched]
                 break
 
+            yield data
+            fetched += len(data)
+
             # Stop if fewer activities are returned than requested (end of data)
             if len(data) < per_page:
                 break
 
             page += 1
 
+    def get_activities(self, per_page=200, max_activities=None, after=None):
+        """
+        Fetch the athlete's activities, supporting pagination.
+
+        :param per_page: Number of activities to fetch per page (default is 200).
+        :param max_activities: Maximum number of activities to fetch (default is None for all available).
+        :param after: Epoch timestamp; only activities starting after it are fetched (default is None for all).
+        :return: A list of activities.
+        """
+        activities = []
+        for data in self.iter_activity_pages(per_page, max_activities, after):
+            activities.extend(data)
         return activities
 
     def get_detailed_activity(self, activity_id):
@@ -125,29 +273,9 @@ class StravaClient:
         return self.make_request(f"gear/{gear_id}")
     
     def check_rate_limit(self, response) -> None:
-        """Check and handle Strava API rate limits."""
+        """Feed the rate limit headers of a response back into the shared rate limiter."""
         if response is None:
             logger.error("No response received, cannot check rate limit.")
             return
 
-        if response.status_code == 429:
-            logger.critical("Rate limit exceeded. Waiting for 5 minutes...")
-            time.sleep(5 * 60)
-
-        usage = response.headers.get("X-RateLimit-Usage", "0,0").split(",")
-
-        short_limit, daily_limit = 100, 1000
-        short_usage, daily_usage = map(int, usage)
-
-        logger.info(
-            f"Rate limit: {short_usage}/{short_limit} (15-min), {daily_usage}/{daily_limit} (daily)"
-        )
-
-        if daily_usage >= daily_limit:
-            logger.critical("Daily limit reached. Exiting.")
-            sys.exit()
-
-        if short_usage >= short_limit - 1:  # If we're near the short-term limit
-            logger.warning("Approaching 15-minute rate limit. Pausing for 15 minutes.")
-            time.sleep(15 * 60)  # Sleep for 15 minutes
-
+        self.rate_limiter.update(response.headers)
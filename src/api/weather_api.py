@@ -1,52 +1,123 @@
 # src/clients/weather_client.py
+import time
+import pandas as pd
 import requests
 from loguru import logger
-# from src.queries import get_weather_params_from_db
+from src.api.http import (
+    RETRY_EXCEPTIONS,
+    RETRY_STATUS_CODES,
+    backoff_delay,
+    create_session,
+    retry_after_seconds,
+)
+from src.config import (
+    HTTP_MAX_ATTEMPTS,
+    HTTP_POOL_SIZE,
+    HTTP_TIMEOUT,
+    WEATHER_ARCHIVE_DELAY_DAYS,
+    WEATHER_ARCHIVE_URL,
+    WEATHER_FORECAST_URL,
+)
+from src.metrics import metrics
+
+# Hourly variables requested from Open-Meteo
+HOURLY_VARIABLES = [
+    "temperature_2m",
+    "precipitation",
+    "weather_code",
+    "wind_speed_10m",
+    "rain",
+    "snowfall",
+]
 
 
 class WeatherClient:
 
-    def __init__(self):
+    def __init__(
+        self,
+        pool_size=HTTP_POOL_SIZE,
+        forecast_url=WEATHER_FORECAST_URL,
+        archive_url=WEATHER_ARCHIVE_URL,
+    ):
+        self.session = create_session(pool_size)
+        self.forecast_url = forecast_url
+        self.archive_url = archive_url
         logger.success("Initializing WeatherClient")
 
-    def make_request(self, params: dict):
-        """Make a request to the OpenMeteo API and return the JSON response."""
-        url = "https://api.open-meteo.com/v1/forecast?"
+    def make_request(self, params: dict, url: str = None, max_attempts=HTTP_MAX_ATTEMPTS):
+        """
+        Make a request to the OpenMeteo API and return the JSON response, or None if it failed.
+
+        Connection errors and 5xx responses are retried with exponential backoff,
+        429 responses after Retry-After.
+        """
+        url = url or self.forecast_url
+        endpoint_name = url.rstrip("/").rsplit("/", 1)[-1]
+
+        for attempt in range(1, max_attempts + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=HTTP_TIMEOUT)
+            except RETRY_EXCEPTIONS as e:
+                metrics.increment("http_requests_total", api="weather", endpoint=endpoint_name, status="error")
+                if attempt < max_attempts:
+                    time.sleep(backoff_delay(attempt))
+                    continue
+                logger.error(f"Request failed: {e}")
+                return None
+            except requests.exceptions.RequestException as e:
+                metrics.increment("http_requests_total", api="weather", endpoint=endpoint_name, status="error")
+                logger.error(f"Request failed: {e}")
+                return None
 
-        try:
-            response = requests.get(url, params=params)
+            metrics.observe(
+                "http_request_seconds", time.perf_counter() - start, api="weather", endpoint=endpoint_name
+            )
+            metrics.increment(
+                "http_requests_total", api="weather", endpoint=endpoint_name, status=response.status_code
+            )
+            if attempt < max_attempts:
+                if response.status_code == 429:
+                    retry_after = retry_after_seconds(response)
+                    delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                    metrics.increment("rate_limit_wait_seconds_total", delay, api="weather")
+                    time.sleep(delay)
+                    continue
+                if response.status_code in RETRY_STATUS_CODES:
+                    time.sleep(backoff_delay(attempt))
+                    continue
 
-            response.raise_for_status()
+            try:
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Request failed: {e}")
+                return None
 
-            return response.json()
+    @staticmethod
+    def archive_cutoff() -> str:
+        """The first day (YYYY-MM-DD) the archive may not cover yet, WEATHER_ARCHIVE_DELAY_DAYS ago."""
+        return (pd.Timestamp.now() - pd.Timedelta(days=WEATHER_ARCHIVE_DELAY_DAYS)).strftime("%Y-%m-%d")
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {e}")
+    def source_for(self, end_date: str) -> str:
+        """The endpoint ("archive" or "forecast") that serves a date range ending on `end_date`."""
+        return "archive" if end_date < self.archive_cutoff() else "forecast"
 
-    def get_weather_data(self, activity_id: int):
-        print("PARAMS:")
+    def get_weather_data(self, lat: float, lng: float, start_date: str, end_date: str):
+        """
+        Fetches hourly weather for a location over a range of dates (YYYY-MM-DD, inclusive).
 
-        # date, lat_lng = get_weather_params_from_db(activity_id)
-        print(date)
-        print(lat_lng)
-        lat = 0
-        lng = 0
+        Hours are in the local time zone of the location. Ranges ending before the archive
+        cutoff (see archive_cutoff) are served by the historical archive.
+        """
+        url = self.archive_url if self.source_for(end_date) == "archive" else self.forecast_url
         params = {
             "latitude": lat,
             "longitude": lng,
-            "hourly": ",".join(
-                [
-                    "temperature_2m",
-                    "precipitation",
-                    "weather_code",
-                    "wind_speed_10m",
-                    "rain",
-                    "snowfall",
-                ]
-            ),
+            "hourly": ",".join(HOURLY_VARIABLES),
             "wind_speed_unit": "ms",
-            "timezone": "Europe/Berlin",
-            "start_date": date,
-            "end_date": date,
+            "timezone": "auto",
+            "start_date": start_date,
+            "end_date": end_date,
         }
-        return self.make_request(params)
+        return self.make_request(params, url=url)
@@ -15,3 +15,73 @@ def get_strava_config():
 
 DATABASE_NAME = "database.db"
 DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "database", DATABASE_NAME)
+# Remaining Strava request budget, saved when the daily limit is hit so the next run can resume
+RATE_LIMIT_STATE_PATH = os.path.join(os.path.dirname(DATABASE_PATH), "rate_limit_state.json")
+# On-disk cache of Strava API responses: "off", "record" or "replay"
+RESPONSE_CACHE_PATH = os.path.join(os.path.dirname(DATABASE_PATH), "response_cache.db")
+RESPONSE_CACHE_MODE = os.getenv("RESPONSE_CACHE_MODE", "record")
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", 512))
+# Memory-mapped per-stream files used for whole-history stream analytics
+STREAM_STORE_PATH = os.path.join(os.path.dirname(DATABASE_PATH), "streams")
+# Request, query and stage metrics of the last sync, as JSON and as a Prometheus textfile
+METRICS_JSON_PATH = os.getenv("METRICS_JSON_PATH", os.path.join(os.path.dirname(DATABASE_PATH), "metrics.json"))
+METRICS_TEXTFILE_PATH = os.getenv(
+    "METRICS_TEXTFILE_PATH", os.path.join(os.path.dirname(DATABASE_PATH), "metrics.prom")
+)
+# Profiles and reports of `main.py --profile` runs, one timestamped directory per run
+PROFILE_PATH = os.getenv("PROFILE_PATH", os.path.join(os.path.dirname(DATABASE_PATH), "profiles"))
+
+# SQLite pragmas applied to every connection opened by DatabaseManager
+DATABASE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -64000)),  # negative = KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 268435456)),
+    # Lets INSERT OR REPLACE fire delete triggers, which keep activity_rollups correct
+    "recursive_triggers": "ON",
+}
+
+# Maximum number of rows bound per executemany() call in DatabaseManager.insert_dataframe_to_db
+INSERT_CHUNK_SIZE = 50_000
+
+# Number of sync job requests kept in flight by main.run_sync_jobs
+FETCH_CONCURRENCY = int(os.getenv("STRAVA_FETCH_CONCURRENCY", 4))
+# Number of finished sync jobs buffered before their results are written
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", 50))
+# Failed attempts after which a sync job is parked as 'failed' until the next --repair
+SYNC_MAX_ATTEMPTS = int(os.getenv("SYNC_MAX_ATTEMPTS", 3))
+
+# Hours after which stored gear details are fetched again; mileage is kept from activities instead
+GEAR_TTL_HOURS = float(os.getenv("GEAR_TTL_HOURS", 7 * 24))
+
+# Days between full reconcile syncs, which re-list the whole history to catch edits and deletions
+FULL_SYNC_INTERVAL_DAYS = int(os.getenv("FULL_SYNC_INTERVAL_DAYS", 7))
+# Activities per listing page (Strava's maximum); a shorter page ends the listing
+ACTIVITY_PAGE_SIZE = 200
+
+# HTTP connection pool size per host, and retry behaviour for the API clients
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+HTTP_MAX_ATTEMPTS = int(os.getenv("HTTP_MAX_ATTEMPTS", 5))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+
+# Strava endpoints; overridden to point the client at a local stand-in such as benchmarks/fake_server.py
+STRAVA_API_URL = os.getenv("STRAVA_API_URL", "https://www.strava.com/api/v3")
+STRAVA_OAUTH_URL = os.getenv("STRAVA_OAUTH_URL", "https://www.strava.com/oauth/token")
+
+# Open-Meteo endpoints; the archive serves dates older than WEATHER_ARCHIVE_DELAY_DAYS
+WEATHER_FORECAST_URL = os.getenv("WEATHER_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+WEATHER_ARCHIVE_URL = os.getenv("WEATHER_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+WEATHER_ARCHIVE_DELAY_DAYS = int(os.getenv("WEATHER_ARCHIVE_DELAY_DAYS", 5))
+# Size (degrees) of the location cells activities share weather with
+WEATHER_CELL_DEGREES = float(os.getenv("WEATHER_CELL_DEGREES", 0.1))
+# A cell's dates are fetched in one request per run of dates spanning at most WEATHER_MAX_RANGE_DAYS
+# with no gap longer than WEATHER_MAX_GAP_DAYS
+WEATHER_MAX_RANGE_DAYS = int(os.getenv("WEATHER_MAX_RANGE_DAYS", 92))
+WEATHER_MAX_GAP_DAYS = int(os.getenv("WEATHER_MAX_GAP_DAYS", 14))
+
+# Training load model: time constants (days) for fitness (CTL) and fatigue (ATL), and the
+# resting/maximum heart rate used for TRIMP when an activity has no suffer score
+CTL_DAYS = int(os.getenv("CTL_DAYS", 42))
+ATL_DAYS = int(os.getenv("ATL_DAYS", 7))
+HEARTRATE_REST = int(os.getenv("HEARTRATE_REST", 50))
+HEARTRATE_MAX = int(os.getenv("HEARTRATE_MAX", 190))
@@ -14,6 +14,52 @@ ALL_STREAM_TYPES = [
 ]
 
 
+# Per-activity sync stages tracked in sync_jobs, in the order the scheduler runs them
+SYNC_STAGES = ["detail", "zones", "gear", "weather", "streams"]
+
+
+# Distances (meters) computed as best efforts from the distance/time streams of runs
+STREAM_BEST_EFFORT_DISTANCES = {
+    "400m": 400,
+    "1K": 1000,
+    "1 mile": 1609.34,
+    "3K": 3000,
+    "5K": 5000,
+    "10K": 10000,
+    "15K": 15000,
+    "Half-Marathon": 21097.5,
+    "Marathon": 42195,
+}
+
+
+# Column in the streams table for each Strava stream type
+STREAM_COLUMNS = {
+    "time": "time",
+    "distance": "distance",
+    "latlng": "latlng",
+    "altitude": "altitude",
+    "velocity_smooth": "speed",
+    "heartrate": "heartrate",
+    "cadence": "cadence",
+    "watts": "watts",
+}
+
+# NumPy dtype each stream column is stored as. latlng is stored as (n, 2) pairs.
+STREAM_DTYPES = {
+    "time": "int32",
+    "distance": "float32",
+    "latlng": "float32",
+    "altitude": "float32",
+    "speed": "float32",
+    "heartrate": "int16",
+    "cadence": "int16",
+    "watts": "int16",
+}
+
+# Stored in place of missing samples in integer streams (float streams use NaN)
+STREAM_MISSING_VALUE = -1
+
+
 WEATHER_CODE_MAPPING = {
     0: "Clear sky",
     1: "Mainly clear",
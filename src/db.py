@@ -1,46 +1,160 @@
 # src/database/db.py
 import sqlite3
+import threading
+from contextlib import contextmanager
 import pandas as pd
 from loguru import logger
 
 from src.queries import (
     ALLOWED_TABLES,
-    INSERT_ID_TO_CACHE,
     CREATE_ALL_TABLES,
+    CREATE_ALL_INDEXES,
+    CREATE_ALL_TRIGGERS,
+    ROLLUP_PERIODS,
+    CLEAR_ROLLUPS,
+    REBUILD_ROLLUPS,
+    GET_ROLLUPS,
+    GET_DISCREPANCIES,
+    CLEAR_ACTIVITY_LOCATIONS,
+    REBUILD_ACTIVITY_LOCATIONS,
+    GET_UNINDEXED_LOCATION_COUNT,
+    ENQUEUE_SYNC_JOB,
+    RESET_SYNC_JOB,
+    GET_PENDING_SYNC_JOBS,
+    COMPLETE_SYNC_JOB,
+    FAIL_SYNC_JOB,
+    GET_SYNC_JOB_IDS,
+    GET_SYNC_JOB_COUNTS,
+    CLEAR_SYNC_JOBS,
+    SYNC_STAGE_DONE_CHECKS,
+    SEED_SYNC_JOBS,
+    DROP_CACHE_TABLE,
+    ADDED_COLUMNS,
+    MIGRATE_LAT_LNG,
+    GET_TABLE_COLUMNS,
+    ADD_COLUMN,
     INSERT_OR_IGNORE_QUERY,
     GET_WEATHER_PARAMS,
-    GET_CACHED_IDS,
-    CLEAR_CACHE,
     GET_STREAMS_IDS,
     GET_ACTIVITIES_IDS,
     GET_SPLITS_IDS,
     GET_ZONES_IDS,
     GET_BEST_EFFORTS_IDS,
+    GET_GEAR_MILEAGE_MISSING,
+    REBUILD_GEAR_MILEAGE,
     GET_ROW_COUNT,
     ADD_WEATHER_DATA,
+    GET_SYNC_STATE,
+    SET_SYNC_STATE,
+    GET_LATEST_ACTIVITY_DATE,
+    GET_ACTIVITIES_IDS_SINCE,
+    GET_ACTIVITIES_IDS_AFTER,
+    DELETE_BY_ID,
+    ACTIVITY_TABLES,
 )
-from src.config import DATABASE_PATH
+from src.config import DATABASE_PATH, DATABASE_PRAGMAS, INSERT_CHUNK_SIZE, SYNC_MAX_ATTEMPTS
+from src.constants import DEFAULT_COORDINATES, SYNC_STAGES
+from src.metrics import metrics, query_label
+from src.profiling import memory_tracker
+
+
+# Sync stages that are run again to fill in each discrepancy piece
+DISCREPANCY_STAGES = {
+    "sync_jobs": SYNC_STAGES,
+    "splits": ["detail"],
+    "best_efforts": ["detail"],
+    "zones": ["zones"],
+    "streams": ["streams"],
+    "weather": ["weather"],
+}
 
 
 class DatabaseManager:
-    def __init__(self, db_path: str = DATABASE_PATH):
-        """Initialize the DatabaseManager with a path to the database."""
-        self.db_path = db_path
+    def __init__(self, db_path: str = DATABASE_PATH, pragmas: dict = None):
+        """
+        Initialize the DatabaseManager with a path to the database.
 
-    def connect_db(self):
-        """Connect to the SQLite database."""
-        conn = sqlite3.connect(self.db_path)
+        Each thread gets one long-lived connection, opened lazily on first use and
+        configured with DATABASE_PRAGMAS (overridable per instance through `pragmas`).
+        """
+        self.db_path = db_path
+        self.pragmas = {**DATABASE_PRAGMAS, **(pragmas or {})}
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def connect_db(self) -> sqlite3.Connection:
+        """Return this thread's connection to the SQLite database, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        # Autocommit mode: statements commit on their own unless a transaction() is open
+        conn = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False
+        )
+        for pragma, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+
+        self._local.conn = conn
+        self._local.depth = 0
+        with self._connections_lock:
+            self._connections.append(conn)
+        logger.trace(f"Opened database connection in {threading.current_thread().name}")
         return conn
 
+    def close(self) -> None:
+        """Close every connection opened by this manager."""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    logger.error(f"Error closing database connection: {e}")
+            self._connections.clear()
+        self._local = threading.local()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Open an explicit transaction scope on this thread's connection.
+
+        Everything executed inside the block is committed once on exit, or rolled back
+        if an exception escapes. Nested scopes become savepoints of the outer one.
+
+        Example:
+            with db_manager.transaction():
+                db_manager.insert_dataframe_to_db(df=splits_df, table_name="splits")
+                db_manager.complete_sync_jobs([(activity_id, "detail")])
+        """
+        conn = self.connect_db()
+        depth = self._local.depth
+        savepoint = f"sp_{depth}"
+
+        conn.execute("BEGIN" if depth == 0 else f"SAVEPOINT {savepoint}")
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        else:
+            conn.execute("COMMIT" if depth == 0 else f"RELEASE {savepoint}")
+        finally:
+            self._local.depth = depth
+
     def execute_query(self, query: str, params=None):
-        """Execute a query on the database."""
+        """Execute a query on the database. Its time is recorded under the statement's verb and table."""
         try:
-            with self.connect_db() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, params or ())
-                conn.commit()
-                logger.trace(f"Query executed:\n{query}\nParams:{params}")
-                return cursor.fetchall()
+            with metrics.timer("db_query_seconds", query=query_label(query)):
+                cursor = self.connect_db().execute(query, params or ())
+                rows = cursor.fetchall()
+            logger.trace(f"Query executed:\n{query}\nParams:{params}")
+            return rows
 
         except sqlite3.Error as e:
             logger.error(f"Error executing query: {e}")
@@ -55,23 +169,121 @@ class DatabaseManager:
         self.execute_query(create_table_query)
 
     def create_all_tables(self) -> None:
-        """Iterates through predefined table creation queries and creates all tables."""
+        """Iterates through predefined table and index creation queries and creates them all."""
         for table_name, create_query in CREATE_ALL_TABLES.items():
             try:
                 self.create_table(create_query)
             except Exception as e:
                 logger.error(f"Failed to create table {table_name}: {e}")
 
-    def update_cache(self, activity_id: int) -> None:
-        """Updates the cache table by inserting or replacing an activity ID."""
-        self.execute_query(INSERT_ID_TO_CACHE, (activity_id,))
+        for table_name, columns in ADDED_COLUMNS.items():
+            self.add_missing_columns(table_name, columns)
+
+        for index_name, create_query in CREATE_ALL_INDEXES.items():
+            try:
+                self.create_table(create_query)
+            except Exception as e:
+                logger.error(f"Failed to create index {index_name}: {e}")
+
+        for trigger_name, create_query in CREATE_ALL_TRIGGERS.items():
+            try:
+                self.create_table(create_query)
+            except Exception as e:
+                logger.error(f"Failed to create trigger {trigger_name}: {e}")
 
-    def get_ids_from_cache(self) -> list:
-        """Fetches all IDs from the cache table."""
-        return [row[0] for row in self.execute_query(GET_CACHED_IDS)]
+    def add_missing_columns(self, table_name: str, columns: dict) -> None:
+        """Adds columns (name -> SQL definition) that an existing table was created without."""
+        self.validate_table(table_name)
+        existing = {row[1] for row in self.execute_query(GET_TABLE_COLUMNS.format(table_name=table_name))}
+        for column, definition in columns.items():
+            if column not in existing:
+                self.execute_query(
+                    ADD_COLUMN.format(table_name=table_name, column=column, definition=definition)
+                )
+                logger.info(f"Added column {column} to the {table_name} table.")
+
+    def migrate_lat_lng(self) -> int:
+        """Copies the text lat_lng of older databases into start_lat/start_lng. Returns the rows updated."""
+        columns = {row[1] for row in self.execute_query(GET_TABLE_COLUMNS.format(table_name="activities"))}
+        if "lat_lng" not in columns:
+            return 0
+
+        with self.transaction() as conn:
+            migrated = conn.execute(MIGRATE_LAT_LNG, (DEFAULT_COORDINATES,)).rowcount
+        if migrated:
+            logger.info(f"Migrated the start coordinates of {migrated} activities to numeric columns.")
+        return migrated
+
+    def enqueue_sync_jobs(self, activity_ids: list, stages: list = SYNC_STAGES) -> None:
+        """Adds pending jobs for the given stages of each activity. Existing jobs are left as they are."""
+        rows = [
+            (activity_id, stage, SYNC_STAGES.index(stage))
+            for activity_id in activity_ids
+            for stage in stages
+        ]
+        with self.transaction() as conn:
+            conn.executemany(ENQUEUE_SYNC_JOB, rows)
+
+    def reset_sync_jobs(self, activity_ids: list, stages: list = SYNC_STAGES) -> None:
+        """Marks the given stages of each activity as pending again, creating missing jobs."""
+        rows = [
+            (activity_id, stage, SYNC_STAGES.index(stage))
+            for activity_id in activity_ids
+            for stage in stages
+        ]
+        with self.transaction() as conn:
+            conn.executemany(RESET_SYNC_JOB, rows)
+
+    def get_pending_sync_jobs(self) -> list:
+        """Fetches (activity ID, stage) for every pending job, in the order they should run."""
+        return self.execute_query(GET_PENDING_SYNC_JOBS)
+
+    def complete_sync_jobs(self, jobs: list) -> None:
+        """Marks (activity ID, stage) jobs as done."""
+        with self.transaction() as conn:
+            conn.executemany(COMPLETE_SYNC_JOB, jobs)
+        for _, stage in jobs:
+            metrics.increment("sync_jobs_total", stage=stage, status="done")
+
+    def fail_sync_jobs(self, failures: list, max_attempts: int = SYNC_MAX_ATTEMPTS) -> None:
+        """
+        Records a failed attempt for each (activity ID, stage, error) job. Jobs stay pending
+        until they have failed `max_attempts` times, after which they are marked as failed.
+        """
+        with self.transaction() as conn:
+            conn.executemany(
+                FAIL_SYNC_JOB,
+                [(error, max_attempts, activity_id, stage) for activity_id, stage, error in failures],
+            )
+        for _, stage, _ in failures:
+            metrics.increment("sync_jobs_total", stage=stage, status="failed")
+
+    def get_ids_from_sync_jobs(self) -> list:
+        """Fetches the IDs of every activity with sync jobs."""
+        return [row[0] for row in self.execute_query(GET_SYNC_JOB_IDS)]
+
+    def get_sync_job_counts(self) -> dict:
+        """Counts jobs by stage and status, as {stage: {status: count}}."""
+        counts = {}
+        for stage, status, count in self.execute_query(GET_SYNC_JOB_COUNTS):
+            counts.setdefault(stage, {})[status] = count
+        return counts
+
+    def seed_sync_jobs(self) -> None:
+        """
+        Creates the missing jobs of every activity, such as those synced before sync_jobs
+        replaced the cache table. Stages whose data is already stored start out done.
+        """
+        with self.transaction() as conn:
+            for stage in SYNC_STAGES:
+                conn.execute(
+                    SEED_SYNC_JOBS.format(done=SYNC_STAGE_DONE_CHECKS[stage]),
+                    (stage, SYNC_STAGES.index(stage), stage),
+                )
+            conn.execute(DROP_CACHE_TABLE)
 
     def get_ids_from_streams(self) -> list:
-        """Fetches all IDs from the cache table."""
+        """Fetches all IDs from the streams table."""
         return [row[0] for row in self.execute_query(GET_STREAMS_IDS)]
 
     def get_ids_from_splits(self) -> list:
@@ -90,54 +302,189 @@ class DatabaseManager:
         """Fetches all IDs from the activities table."""
         return [row[0] for row in self.execute_query(GET_ACTIVITIES_IDS)]
 
-    def check_discrepancies(self) -> None:
-        activities_ids = self.get_ids_from_activities()
-        cached_ids = self.get_ids_from_cache()
-        missing_cache = [item for item in activities_ids if item not in cached_ids]
+    def get_ids_from_activities_since(self, date: str) -> list:
+        """Fetches the IDs of activities on or after a YYYY-MM-DD date."""
+        return [row[0] for row in self.execute_query(GET_ACTIVITIES_IDS_SINCE, (date,))]
 
-        if len(missing_cache) != 0:
-            logger.warning(f"{len(missing_cache)} activities are not present in cache.")
+    def get_ids_from_activities_after(self, date: str) -> list:
+        """Fetches the IDs of activities after a YYYY-MM-DD date."""
+        return [row[0] for row in self.execute_query(GET_ACTIVITIES_IDS_AFTER, (date,))]
 
-        else:
-            return
+    def get_sync_state(self, key: str):
+        """Fetches a value from the sync_state table, or None if it is not set."""
+        result = self.execute_query(GET_SYNC_STATE, (key,))
+        return result[0][0] if result else None
+
+    def set_sync_state(self, key: str, value) -> None:
+        """Stores a value in the sync_state table."""
+        self.execute_query(SET_SYNC_STATE, (key, str(value)))
+
+    def get_sync_watermark(self):
+        """
+        Returns the epoch time of the newest activity already synced, or None on an empty database.
+
+        Falls back to the latest local `date` in activities (minus a day to cover time zones)
+        for databases created before the watermark was stored.
+        """
+        watermark = self.get_sync_state("activities_watermark")
+        if watermark is not None:
+            return int(float(watermark))
+
+        result = self.execute_query(GET_LATEST_ACTIVITY_DATE)
+        if not result or result[0][0] is None:
+            return None
+        latest_date = pd.Timestamp(result[0][0], tz="UTC") - pd.Timedelta(days=1)
+        return int(latest_date.timestamp())
+
+    def delete_activities(self, activity_ids: list) -> None:
+        """Deletes activities and every row keyed by them in the other activity tables."""
+        with self.transaction() as conn:
+            for table_name, id_column in ACTIVITY_TABLES.items():
+                conn.executemany(
+                    DELETE_BY_ID.format(table_name=table_name, id_column=id_column),
+                    [(activity_id,) for activity_id in activity_ids],
+                )
+        logger.warning(f"Deleted {len(activity_ids)} activities no longer on Strava.")
+
+    def rebuild_rollups(self) -> None:
+        """Recomputes the weekly, monthly and yearly activity_rollups from the activities table."""
+        with self.transaction() as conn:
+            conn.execute(CLEAR_ROLLUPS)
+            for period_type, period in ROLLUP_PERIODS.items():
+                conn.execute(
+                    REBUILD_ROLLUPS.format(period_type=period_type, period=period.format(date="date"))
+                )
+        logger.info("Rebuilt activity rollups.")
+
+    def rebuild_gear_mileage(self) -> None:
+        """Recomputes every gear's activity count and distance from the activities table."""
+        with self.transaction() as conn:
+            for query in REBUILD_GEAR_MILEAGE:
+                conn.execute(query)
+        logger.info("Rebuilt gear mileage.")
+
+    def is_gear_mileage_missing(self) -> bool:
+        """Checks for gear rows without mileage, or activities whose gear has no row."""
+        result = self.execute_query(GET_GEAR_MILEAGE_MISSING)
+        return bool(result and result[0][0])
+
+    def rebuild_activity_locations(self) -> None:
+        """Recomputes the activity_locations R*Tree from the start coordinates in activities."""
+        with self.transaction() as conn:
+            conn.execute(CLEAR_ACTIVITY_LOCATIONS)
+            conn.execute(REBUILD_ACTIVITY_LOCATIONS)
+        logger.info("Rebuilt the activity location index.")
+
+    def get_unindexed_location_count(self) -> int:
+        """Counts activities with start coordinates that are missing from activity_locations."""
+        result = self.execute_query(GET_UNINDEXED_LOCATION_COUNT)
+        return result[0][0] if result else 0
+
+    def get_rollups(self, period_type: str, start: str, end: str) -> pd.DataFrame:
+        """
+        Fetches rollups of one granularity ('week', 'month' or 'year') between two period keys.
+
+        Weeks are keyed by their Monday (YYYY-MM-DD), months as YYYY-MM and years as YYYY.
+        Activities without gear are grouped under an empty gear_id.
+        """
+        if period_type not in ROLLUP_PERIODS:
+            raise ValueError(f"Invalid period type: {period_type}")
+        rows = self.execute_query(GET_ROLLUPS, (period_type, start, end))
+        return pd.DataFrame(
+            rows,
+            columns=[
+                "period",
+                "sport_type",
+                "gear_id",
+                "activity_count",
+                "distance",
+                "duration",
+                "elevation_gain",
+            ],
+        )
+
+    def check_discrepancies(self, repair: bool = False) -> dict:
+        """
+        Finds activities missing sync jobs or rows in any child table, using SQL anti-joins.
+
+        Returns a report mapping each piece (see DISCREPANCY_CHECKS) to the sorted IDs of the
+        activities that lack it. With `repair`, the sync stages that produce each missing piece
+        (see DISCREPANCY_STAGES) are marked pending again, so the next scheduler run fetches them.
+        """
+        report = {}
+        for piece, activity_id in self.execute_query(GET_DISCREPANCIES):
+            report.setdefault(piece, []).append(activity_id)
+
+        for piece, activity_ids in report.items():
+            activity_ids.sort()
+            logger.warning(f"{len(activity_ids)} activities are missing {piece}.")
+
+        if repair:
+            for piece, activity_ids in report.items():
+                self.reset_sync_jobs(activity_ids, DISCREPANCY_STAGES[piece])
+                logger.info(f"Queued {len(activity_ids)} activities to re-fetch {piece}.")
+
+        return report
 
     def get_row_count(self, table_name: str) -> int:
         """Fetches the count of rows in the specified table"""
         row_count = self.execute_query(GET_ROW_COUNT.format(table_name=table_name))
         return row_count[0][0] if row_count else 0
 
-    def clear_cache(self) -> None:
-        """Clears all entries in the cache table."""
-        logger.warning("ATTEMPTING TO CLEAR CACHE. ARE YOU SURE? (Y/N)")
+    def clear_sync_jobs(self) -> None:
+        """Clears all entries in the sync_jobs table."""
+        logger.warning("ATTEMPTING TO CLEAR SYNC JOBS. ARE YOU SURE? (Y/N)")
         response = input()
         if response.upper() == "Y":
             try:
-                self.execute_query(CLEAR_CACHE)
-                logger.warning("Cache table cleared successfully.")
+                self.execute_query(CLEAR_SYNC_JOBS)
+                logger.warning("Sync jobs table cleared successfully.")
             except Exception as e:
-                logger.error(f"Error clearing cache table: {e}")
+                logger.error(f"Error clearing sync jobs table: {e}")
         else:
-            logger.warning("ABORTED. CACHE NOT CLEARED.")
+            logger.warning("ABORTED. SYNC JOBS NOT CLEARED.")
 
     def get_weather_params_from_db(self, activity_id: int) -> tuple:
-        """Fetches the weather-related parameters (date, lat_lng) for a given activity ID."""
+        """Fetches the weather-related parameters (date, start time, lat, lng) for a given activity ID."""
         weather_params = self.execute_query(GET_WEATHER_PARAMS, (activity_id,))
         return weather_params[0] if weather_params else None
 
+    @staticmethod
+    def iter_dataframe_rows(df: pd.DataFrame, chunk_size: int):
+        """Yields lists of row tuples built straight from the DataFrame's column arrays."""
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start : start + chunk_size]
+            # Series.tolist() unboxes numpy scalars to native Python values for sqlite3
+            columns = [chunk[column].tolist() for column in chunk.columns]
+            yield list(zip(*columns))
+
+    @memory_tracker.track()
     def insert_dataframe_to_db(
         self,
         df: pd.DataFrame,
         table_name: str,
         query=INSERT_OR_IGNORE_QUERY,
         allowed_tables: list = ALLOWED_TABLES,
-    ) -> None:
+        chunk_size: int = INSERT_CHUNK_SIZE,
+    ) -> int:
         """
         Inserts data from a Pandas DataFrame into a specified SQLite database table using predefined queries.
 
+        Rows are bound with one `executemany` per chunk of `chunk_size` rows, and all chunks
+        are written inside a single transaction.
+
         Args:
             df (pd.DataFrame): A DataFrame containing the data to insert.
             table_name (str): The name of the table to insert data into.
             query (str): The predefined SQL query for inserting data.
+            chunk_size (int): Maximum number of rows materialized per `executemany` call.
+
+        Returns:
+            int: The number of rows written. Rows skipped by `INSERT OR IGNORE` are not counted.
+
+        Raises:
+            Exception: The insert error, when called inside an open `transaction()`, so the whole
+                transaction rolls back. Outside one the error is logged and 0 is returned.
         """
         # Validate table name
         self.validate_table(table_name)
@@ -145,7 +492,7 @@ class DatabaseManager:
 
         if df is None or df.empty:
             # logger.warning(f"No data to insert into table: {table_name}. Skipping.")
-            return
+            return 0
 
         # Prepare columns and placeholders
         columns = ", ".join(df.columns)
@@ -156,23 +503,26 @@ class DatabaseManager:
             table_name=table_name, columns=columns, placeholders=placeholders
         )
 
-
-        # Convert to list of tuples (records)
-        data = df.to_dict(orient="records")
-
         try:
-            for row in data:
-                self.execute_query(query, tuple(row.values()))  # Insert each row
+            inserted = 0
+            with metrics.timer("db_insert_seconds", table=table_name), self.transaction() as conn:
+                for rows in self.iter_dataframe_rows(df, chunk_size):
+                    # rowcount excludes rows written by triggers (such as activity_rollups)
+                    inserted += conn.executemany(query, rows).rowcount
+            metrics.increment("db_rows_written_total", inserted, table=table_name)
+
+            ignored = len(df) - inserted
+            logger.trace(
+                f"Inserted {inserted} rows into the {table_name} table ({ignored} ignored)."
+            )
+            return inserted
 
-            if len(df) == 1:
-                rows_string = "row"
-            else:
-                rows_string = "rows"
-            # logger.info(
-            #     f"Inserted {len(df)} {rows_string} into the {table_name} table."
-            # )
         except Exception as e:
             logger.error(f"Error inserting data into {table_name}: {e}")
+            if getattr(self._local, "depth", 0) > 0:
+                # Nothing the caller writes alongside (such as finished sync jobs) may commit without it
+                raise
+            return 0
 
     def add_weather_data(
         self, activity_id: int, df: pd.DataFrame, query=ADD_WEATHER_DATA
@@ -183,8 +533,7 @@ class DatabaseManager:
             return
 
         weather_data = df.iloc[0]
-        logger.debug("WEATHER DATA RECEIVED:")
-        print(weather_data)
+        logger.debug(f"WEATHER DATA RECEIVED:\n{weather_data}")
 
         # Extract weather data from the dataframe
         temperature = weather_data["temperature"]
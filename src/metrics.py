@@ -0,0 +1,266 @@
+# src/metrics.py
+import bisect
+import functools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from loguru import logger
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prefix of every metric name in the Prometheus textfile
+PROMETHEUS_PREFIX = "strava_sync_"
+
+# Activity, gear and other IDs in API paths, replaced to keep one series per endpoint
+PATH_ID_PATTERN = re.compile(r"/(?:\d+|[a-z]\d+)(?=/|$)")
+QUERY_PATTERN = re.compile(r"^\s*(?:WITH\b.*?\)\s*)?(\w+)", re.DOTALL)
+QUERY_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+# Statements labelled by their verb alone, as schema changes are one-offs
+SCHEMA_VERBS = {"CREATE", "DROP", "ALTER", "PRAGMA"}
+
+
+def endpoint_label(endpoint: str) -> str:
+    """Turns an API path such as 'activities/123/zones' into 'activities/{id}/zones'."""
+    return PATH_ID_PATTERN.sub("/{id}", endpoint)
+
+
+@functools.lru_cache(maxsize=1024)
+def query_label(query: str) -> str:
+    """Labels a SQL statement by its verb and first table, such as 'SELECT activities'."""
+    match = QUERY_PATTERN.match(query)
+    verb = match.group(1).upper() if match else "QUERY"
+    table = QUERY_TABLE_PATTERN.search(query)
+    if verb in SCHEMA_VERBS or table is None:
+        return verb
+    return f"{verb} {table.group(1)}"
+
+
+class Histogram:
+    """Latency distribution over LATENCY_BUCKETS, with the count, sum and maximum."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def __repr__(self):
+        return f"Histogram(count={self.count}, sum={self.sum:.3f}, max={self.max:.3f})"
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile as the upper bound of the bucket it falls in (capped at the maximum)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe in-process registry of counters and latency histograms for one sync run.
+
+    Series are identified by a metric name and keyword labels:
+
+        metrics.increment("http_requests_total", api="strava", endpoint="gear/{id}", status=200)
+        with metrics.timer("db_insert_seconds", table="activities"):
+            ...
+
+    `summary()` renders a table for the log, and `write_json()` / `write_prometheus()` dump
+    every series for other tools (the latter in the node_exporter textfile format).
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Metrics(counters={len(self.counters)}, histograms={len(self.histograms)})"
+
+    @staticmethod
+    def series_key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """Adds `value` to a counter."""
+        key = self.series_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Records one duration in a histogram."""
+        key = self.series_key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Times the block into a histogram, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str = "stage_seconds", **labels):
+        """
+        Decorator timing every call into a histogram, labelled with the function's qualified name
+        as `stage` unless a stage label is given. Place it below @staticmethod.
+        """
+
+        def decorator(function):
+            series_labels = {"stage": function.__qualname__, **labels}
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **series_labels):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def reset(self) -> None:
+        """Drops every series and restarts the run clock."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+    def to_dict(self) -> dict:
+        """Every series as JSON-serializable data."""
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "duration": time.time() - self.started_at,
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), **histogram.to_dict()}
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ],
+            }
+
+    def summary(self) -> str:
+        """Renders the run's histograms (slowest total first) and counters as a text table."""
+        with self._lock:
+            histograms = sorted(self.histograms.items(), key=lambda item: -item[1].sum)
+            counters = sorted(self.counters.items())
+            duration = time.time() - self.started_at
+
+        def label(name, labels):
+            return f"{name}{{{', '.join(f'{k}={v}' for k, v in labels)}}}" if labels else name
+
+        width = max(
+            [len(label(name, labels)) for (name, labels), _ in [*histograms, *counters]], default=0
+        )
+        lines = [f"Sync metrics for a run of {duration:.1f}s"]
+        if histograms:
+            lines.append(
+                f"  {'timer':<{width}} {'count':>8} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"
+            )
+            for (name, labels), histogram in histograms:
+                lines.append(
+                    f"  {label(name, labels):<{width}} {histogram.count:>8} {histogram.sum:>9.2f} "
+                    f"{histogram.sum / histogram.count * 1000:>9.1f} "
+                    f"{histogram.quantile(0.95) * 1000:>9.1f} {histogram.max * 1000:>9.1f}"
+                )
+        if counters:
+            lines.append(f"  {'counter':<{width}} {'value':>8}")
+            for (name, labels), value in counters:
+                lines.append(f"  {label(name, labels):<{width}} {value:>8.{0 if value == int(value) else 2}f}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def write_atomic(path: str, content: str) -> None:
+        """Writes through a temporary file so readers (such as node_exporter) never see a partial file."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def write_json(self, path: str) -> None:
+        try:
+            self.write_atomic(path, json.dumps(self.to_dict(), indent=2))
+        except OSError as e:
+            logger.error(f"Failed to write metrics to {path}: {e}")
+
+    def to_prometheus(self) -> str:
+        """Renders every series in the Prometheus text exposition format."""
+
+        def format_labels(labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        data = self.to_dict()
+        lines = []
+        typed = set()
+        for series in data["counters"]:
+            name = PROMETHEUS_PREFIX + series["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(series['labels'].items())} {series['value']}")
+
+        for series in data["histograms"]:
+            name = PROMETHEUS_PREFIX + series["name"]
+            labels = list(series["labels"].items())
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in series["buckets"].items():
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {series['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} {series['count']}")
+
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}last_run_timestamp_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}last_run_timestamp_seconds {data['started_at']}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}last_run_duration_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}last_run_duration_seconds {data['duration']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        try:
+            self.write_atomic(path, self.to_prometheus())
+        except OSError as e:
+            logger.error(f"Failed to write metrics to {path}: {e}")
+
+
+# Shared registry of the running process
+metrics = Metrics()
@@ -1,6 +1,17 @@
+import numpy as np
 import pandas as pd
 from loguru import logger
-from src.constants import DEFAULT_COORDINATES
+from src.metrics import metrics
+from src.profiling import memory_tracker
+
+# Lookup tables that turn datetime components into their stored labels without strftime
+MONTH_LABELS = np.array([f"{month:02d}" for month in range(1, 13)], dtype=object)
+DAY_LABELS = np.array(
+    ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"], dtype=object
+)
+TIME_LABELS = np.array(
+    [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60)], dtype=object
+)
 
 
 class Activity:
@@ -25,7 +36,8 @@ class Activity:
         average_temp,
         average_watts,
         intensity,
-        lat_lng,
+        start_lat,
+        start_lng,
     ):
         self.id = id
         self.name = name
@@ -46,7 +58,8 @@ class Activity:
         self.average_temp = average_temp
         self.average_watts = average_watts
         self.intensity = intensity
-        self.lat_lng = lat_lng
+        self.start_lat = start_lat
+        self.start_lng = start_lng
 
     def __repr__(self):
         return (
@@ -56,7 +69,8 @@ class Activity:
             f"duration={self.duration}, elevation_gain={self.elevation_gain}, gear_id='{self.gear_id}', "
             f"average_heartrate={self.average_heartrate}, average_speed={self.average_speed}, "
             f"average_cadence={self.average_cadence}, average_temp={self.average_temp}, "
-            f"average_watts={self.average_watts}, intensity={self.intensity}, lat_lng={self.lat_lng})"
+            f"average_watts={self.average_watts}, intensity={self.intensity}, "
+            f"start_lat={self.start_lat}, start_lng={self.start_lng})"
         )
 
     @staticmethod
@@ -69,7 +83,6 @@ class Activity:
                 "start_date_local": "date",
                 "trainer": "indoor",
                 "suffer_score": "intensity",
-                "start_latlng": "lat_lng",
             }
         )
 
@@ -77,44 +90,64 @@ class Activity:
     def convert_units(df: pd.DataFrame) -> pd.DataFrame:
         """Converts units for specific columns."""
         unit_conversions = {
-            "distance": lambda m: m / 1000,  # meters to kilometers
-            "duration": lambda sec: sec / 60,  # seconds to minutes
-            "average_speed": lambda mps: mps * 3.6,  # m/s to km/h
+            "distance": 1 / 1000,  # meters to kilometers
+            "duration": 1 / 60,  # seconds to minutes
+            "average_speed": 3.6,  # m/s to km/h
         }
-        for col, conversion in unit_conversions.items():
+        for col, factor in unit_conversions.items():
             if col in df:
-                df[col] = df[col].apply(conversion)
+                df[col] = df[col].astype(float) * factor
         return df
 
     @staticmethod
     def split_datetime_columns(df: pd.DataFrame) -> pd.DataFrame:
-        """Splits the 'date' column into separate date components and times."""
+        """
+        Splits the 'date' column into separate date components and times.
+
+        The column is parsed once; every label is then read from lookup tables indexed by
+        the datetime components, instead of formatting each value with strftime.
+        """
         if "date" not in df or "duration" not in df:
             raise ValueError('Missing required columns: "date" and "duration".')
 
-        df["start_time"] = pd.to_datetime(df["date"])
-        df["date"] = df["start_time"].dt.strftime("%Y-%m-%d")
-        df["month"] = df["start_time"].dt.strftime("%m")
-        df["day_of_week"] = df["start_time"].dt.strftime("%A").str.title()
-        df["end_time"] = df["start_time"] + pd.to_timedelta(df["duration"], unit="m")
+        start = pd.to_datetime(df["date"], format="ISO8601")
+        if start.dt.tz is not None:
+            # Keep the local wall-clock time of start_date_local, whatever offset it carries
+            start = start.dt.tz_localize(None)
+        values = start.to_numpy(dtype="datetime64[s]")
+        end = values + np.rint(df["duration"].to_numpy(dtype=float) * 60).astype("timedelta64[s]")
 
-        df["start_time"] = df["start_time"].dt.strftime("%H:%M")
-        df["end_time"] = df["end_time"].dt.strftime("%H:%M")
+        days = values.astype("datetime64[D]")
+        df["date"] = days.astype(str)
+        df["month"] = MONTH_LABELS[start.dt.month.to_numpy() - 1]
+        df["day_of_week"] = DAY_LABELS[start.dt.dayofweek.to_numpy()]
+        df["start_time"] = TIME_LABELS[(values - days).astype(np.int64) // 60]
+        df["end_time"] = TIME_LABELS[(end - end.astype("datetime64[D]")).astype(np.int64) // 60]
 
         return df
 
     @staticmethod
-    def replace_lat_lng_values(df: pd.DataFrame) -> pd.DataFrame:
+    def split_lat_lng(df: pd.DataFrame) -> pd.DataFrame:
         """
-        Converts lat_lng column lists to comma-separated strings, replaces "0, 0" with a valid default value.
+        Unpacks the [lat, lng] pairs of start_latlng into numeric start_lat and start_lng columns.
+
+        Activities without a GPS start (an empty list, or "0, 0") get NULL coordinates.
         """
-        df["lat_lng"] = df["lat_lng"].apply(
-            lambda x: (
-                DEFAULT_COORDINATES
-                if (isinstance(x, list) and len(x) == 0) or x == "0, 0"
-                else ", ".join(map(str, x)) if isinstance(x, list) else x
-            )
-        )
+        lat = np.full(len(df), np.nan)
+        lng = np.full(len(df), np.nan)
+
+        if "start_latlng" in df and df["start_latlng"].dtype == object:
+            latlng = df["start_latlng"]
+            has_pair = (latlng.str.len() == 2).to_numpy(dtype=bool)
+            if has_pair.any():
+                pairs = np.array(latlng[has_pair].tolist(), dtype=float)
+                lat[has_pair], lng[has_pair] = pairs[:, 0], pairs[:, 1]
+
+        missing = (lat == 0) & (lng == 0)
+        lat[missing] = np.nan
+        lng[missing] = np.nan
+        df["start_lat"] = lat
+        df["start_lng"] = lng
         return df
     
     @staticmethod
@@ -132,6 +165,8 @@ class Activity:
             
 
     @staticmethod
+    @metrics.timed()
+    @memory_tracker.track()
     def process_activity_data(df: pd.DataFrame) -> pd.DataFrame:
         """
         Processes raw activity data and caches new activity IDs.
@@ -149,15 +184,16 @@ class Activity:
                 # .pipe(Activity.filter_sport_types)
                 .pipe(Activity.convert_units)
                 .pipe(Activity.split_datetime_columns)
-                .pipe(Activity.replace_lat_lng_values)
+                .pipe(Activity.split_lat_lng)
                 .pipe(Activity.fix_virtual_rides)
             )
         except Exception as e:
             logger.error(f"Error processing data: {e}")
             raise
 
-        df = processed_df[
-            [
+        # Reindex rather than select: a single page may lack optional columns such as average_watts
+        df = processed_df.reindex(
+            columns=[
                 "id",
                 "name",
                 "date",
@@ -177,8 +213,9 @@ class Activity:
                 "average_temp",
                 "average_watts",
                 "intensity",
-                "lat_lng",
+                "start_lat",
+                "start_lng",
             ]
-        ]
+        )
 
         return df
@@ -1,7 +1,12 @@
 # src/models/best_efforts.py
 import pandas as pd
+import numpy as np
 import json
 from loguru import logger
+from src.constants import STREAM_BEST_EFFORT_DISTANCES
+from src.models.streams import Streams
+from src.queries import GET_ACTIVITIES_WITHOUT_STREAM_EFFORTS
+from src.metrics import metrics
 
 
 class BestEfforts:
@@ -73,6 +78,7 @@ class BestEfforts:
             )
 
     @staticmethod
+    @metrics.timed()
     def process_best_efforts(activity_id: int, best_efforts_list: list) -> pd.DataFrame:
         best_efforts_data = []  # List to hold the best efforts data
 
@@ -101,3 +107,103 @@ class BestEfforts:
         BestEfforts.check_new_personal_bests(best_efforts_df)
   
         return best_efforts_df
+
+    @staticmethod
+    def fastest_segment(distance: np.ndarray, time: np.ndarray, target: float):
+        """
+        Shortest elapsed time (seconds) to cover `target` meters, or None if the activity is shorter.
+
+        For every start sample, a two-pointer sweep finds the first sample at least `target`
+        meters further on, and the end time is interpolated to the exact distance. `distance`
+        must be non-decreasing. The sweep is a merge of the sorted start + target distances with
+        the sorted sample distances: a stable sort detects the two runs and merges them in one
+        linear pass, so the whole search is O(n) and vectorized.
+        """
+        n = len(distance)
+        if n < 2 or distance[-1] - distance[0] < target:
+            return None
+
+        # Targets go first, so they sort before samples at the same distance (searchsorted "left")
+        order = np.argsort(np.concatenate([distance + target, distance]), kind="stable")
+        ends = np.flatnonzero(order < n) - np.arange(n)
+        valid = ends < n
+        starts = np.nonzero(valid)[0]
+        ends = ends[valid]
+
+        # Interpolate between the samples either side of the target distance
+        prev = np.maximum(ends - 1, starts)
+        span = distance[ends] - distance[prev]
+        fraction = np.divide(
+            distance[starts] + target - distance[prev], span, out=np.ones_like(span), where=span > 0
+        )
+        end_times = time[prev] + fraction * (time[ends] - time[prev])
+        return float((end_times - time[starts]).min())
+
+    @staticmethod
+    @metrics.timed()
+    def process_stream_best_efforts(
+        activity_id: int, date: str, streams: dict, distances: dict = STREAM_BEST_EFFORT_DISTANCES
+    ) -> pd.DataFrame:
+        """Computes best efforts for each configured distance (name -> meters) from an activity's streams."""
+        distance, time = streams.get("distance"), streams.get("time")
+        if distance is None or time is None or len(distance) != len(time):
+            return pd.DataFrame()
+
+        # GPS distance can dip slightly; the sweep needs it non-decreasing
+        distance = np.maximum.accumulate(np.nan_to_num(distance.astype(np.float64)))
+        time = time.astype(np.float64)
+
+        best_efforts = []
+        for name, target in distances.items():
+            elapsed = BestEfforts.fastest_segment(distance, time, target)
+            if elapsed is None:
+                continue
+            best_efforts.append(
+                {
+                    "id": activity_id,
+                    "date": date,
+                    "name": name,
+                    "distance": target,
+                    "time": int(round(elapsed)),
+                    "pr_rank": 0,
+                    "source": "stream",
+                }
+            )
+
+        return pd.DataFrame(best_efforts)
+
+    @staticmethod
+    @metrics.timed()
+    def process_new_stream_best_efforts(db_manager, distances: dict = STREAM_BEST_EFFORT_DISTANCES) -> int:
+        """
+        Computes stream-derived best efforts for every run with streams that has none yet.
+
+        Rows are inserted with INSERT OR IGNORE, so distances Strava already reported keep Strava's row.
+        Every run visited is recorded in processed_activities, so runs without any new effort (too
+        short, or with every distance already reported by Strava) are not computed again.
+        """
+        pending = db_manager.execute_query(GET_ACTIVITIES_WITHOUT_STREAM_EFFORTS)
+
+        frames = []
+        processed = []
+        for activity_id, date in pending:
+            try:
+                streams = Streams.load_streams(db_manager, activity_id)
+                frames.append(BestEfforts.process_stream_best_efforts(activity_id, date, streams, distances))
+                processed.append(activity_id)
+            except Exception as e:
+                logger.error(f"Error computing best efforts for activity {activity_id}: {e}")
+
+        frames = [df for df in frames if not df.empty]
+        with db_manager.transaction():
+            if frames:
+                db_manager.insert_dataframe_to_db(
+                    df=pd.concat(frames, ignore_index=True), table_name="best_efforts"
+                )
+            db_manager.insert_dataframe_to_db(
+                df=pd.DataFrame({"id": processed, "task": "stream_best_efforts"}),
+                table_name="processed_activities",
+            )
+        if frames:
+            logger.info(f"Computed stream best efforts for {len(frames)} activities.")
+        return len(frames)
@@ -1,7 +1,28 @@
 # src/models/gear.py
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+from loguru import logger
+from src.config import FETCH_CONCURRENCY, GEAR_TTL_HOURS
+from src.queries import (
+    GET_STALE_GEAR_IDS,
+    STAMP_GEAR_UPDATED_AT,
+    GET_PENDING_GEAR_JOBS,
+    UPSERT_GEAR,
+    GET_GEAR_MILEAGE,
+)
+from src.metrics import metrics
 
-
+GEAR_COLUMNS = [
+    "gear_id",
+    "name",
+    "distance",
+    "brand_name",
+    "model_name",
+    "retired",
+    "weight",
+    "updated_at",
+]
 
 class Gear:
     def __init__(
@@ -28,41 +49,106 @@ class Gear:
         )
 
     @staticmethod
-    def process_gears(client, df: pd.DataFrame):
-        """Fetch gear details"""
-        gear_ids = df["gear_id"].dropna().unique().tolist()
+    @metrics.timed()
+    def process_gears(client, gear_ids, concurrency: int = FETCH_CONCURRENCY) -> pd.DataFrame:
+        """
+        Fetches the details of each distinct gear ID, `concurrency` at a time.
+
+        Gear that could not be fetched is left out. The fetch time is stored in updated_at
+        (epoch seconds) for the refresh TTL.
+        """
+        gear_ids = list(dict.fromkeys(gear_id for gear_id in gear_ids if gear_id))
+        if not gear_ids:
+            return pd.DataFrame(columns=GEAR_COLUMNS)
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gear") as executor:
+            responses = list(executor.map(client.get_gear_details, gear_ids))
 
+        fetched_at = time.time()
+        gear_data = [
+            [
+                gear_id,
+                gear_details["name"],
+                gear_details["distance"],
+                gear_details["brand_name"],
+                gear_details["model_name"],
+                gear_details["retired"],
+                gear_details.get("weight"),
+                fetched_at,
+            ]
+            for gear_id, gear_details in zip(gear_ids, responses)
+            if gear_details
+        ]
+        gear_df = pd.DataFrame(gear_data, columns=GEAR_COLUMNS)
+        gear_df["retired"] = gear_df["retired"].astype(int)  # Convert boolean to integer
+        return gear_df
 
-        gear_data = []  # List to hold the gear details
+    @staticmethod
+    @metrics.timed()
+    def sync_gear(
+        db_manager, client, ttl_hours: float = GEAR_TTL_HOURS, concurrency: int = FETCH_CONCURRENCY
+    ) -> int:
+        """
+        Refreshes the gear that needs it and completes the pending gear sync jobs. Returns the
+        number of gear items fetched.
 
-        # Collect gear data
-        for gear_id in gear_ids:
-            gear_details = client.get_gear_details(gear_id)
+        Gear is fetched when it was never fetched (the activity triggers add a placeholder row
+        for gear first seen on an activity), when its details are older than `ttl_hours`, or when
+        a new activity uses it. Each gear item is fetched once, and the details are upserted in
+        one batch together with the job status. Gear that could not be fetched keeps its details
+        but has its updated_at stamped, so it is not fetched again before the TTL runs out. The
+        activity_count and activity_distance columns are maintained from activities by triggers
+        and are never overwritten by a refresh.
+        """
+        pending_jobs = db_manager.execute_query(GET_PENDING_GEAR_JOBS)
+        stale_before = time.time() - ttl_hours * 60 * 60
+        stale_ids = [row[0] for row in db_manager.execute_query(GET_STALE_GEAR_IDS, (stale_before,))]
+        gear_ids = set(stale_ids) | {gear_id for _, gear_id in pending_jobs if gear_id}
+        if not gear_ids and not pending_jobs:
+            return 0
 
-            gear_data.append(
-                [
-                    gear_id,
-                    gear_details["name"],
-                    gear_details["distance"],
-                    gear_details["brand_name"],
-                    gear_details["model_name"],
-                    gear_details["retired"],
-                    gear_details.get("weight"),  
-                ]
-            )
+        if gear_ids:
+            logger.info(f"Fetching details of {len(gear_ids)} gear items.")
+        gear_df = Gear.process_gears(client, sorted(gear_ids), concurrency)
+        fetched_ids = set(gear_df["gear_id"])
+        failed_at = time.time()
+        not_fetched = [(failed_at, gear_id) for gear_id in sorted(gear_ids - fetched_ids)]
 
-        # Convert the list of lists to a DataFrame
-        gear_df = pd.DataFrame(
-            gear_data,
+        finished = [
+            (activity_id, "gear")
+            for activity_id, gear_id in pending_jobs
+            if not gear_id or gear_id in fetched_ids
+        ]
+        failed = [
+            (activity_id, "gear", f"No details received for gear {gear_id}")
+            for activity_id, gear_id in pending_jobs
+            if gear_id and gear_id not in fetched_ids
+        ]
+        with db_manager.transaction() as conn:
+            db_manager.insert_dataframe_to_db(df=gear_df, table_name="gear", query=UPSERT_GEAR)
+            conn.executemany(STAMP_GEAR_UPDATED_AT, not_fetched)
+            db_manager.complete_sync_jobs(finished)
+            db_manager.fail_sync_jobs(failed)
+
+        if not_fetched:
+            logger.warning(f"No details received for {len(not_fetched)} gear items.")
+        return len(gear_df)
+
+    @staticmethod
+    def get_gear_mileage(db_manager) -> pd.DataFrame:
+        """
+        Reads every gear item with the number of activities and kilometers recorded with it,
+        most used first.
+        """
+        return pd.DataFrame(
+            db_manager.execute_query(GET_GEAR_MILEAGE),
             columns=[
                 "gear_id",
                 "name",
-                "distance",
                 "brand_name",
                 "model_name",
                 "retired",
-                "weight",
+                "activity_count",
+                "activity_distance",
             ],
         )
-        gear_df["retired"] = gear_df["retired"].astype(int)  # Convert boolean to integer
-        return gear_df
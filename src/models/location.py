@@ -0,0 +1,105 @@
+# src/models/location.py
+import math
+import numpy as np
+import pandas as pd
+from src.queries import GET_ACTIVITIES_IN_BOX
+
+EARTH_RADIUS_KM = 6371.0088
+
+LOCATION_COLUMNS = ["id", "name", "date", "sport_type", "distance", "start_lat", "start_lng"]
+
+
+class Location:
+    def __init__(self, lat, lng):
+        self.lat = lat
+        self.lng = lng
+
+    def __repr__(self):
+        return f"Location(lat={self.lat}, lng={self.lng})"
+
+    @staticmethod
+    def haversine_km(lat1, lng1, lat2, lng2) -> np.ndarray:
+        """Great-circle distance in kilometers between points given in degrees. Accepts arrays."""
+        lat1, lng1, lat2, lng2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lng1, lat2, lng2))
+        a = (
+            np.sin((lat2 - lat1) / 2) ** 2
+            + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+    @staticmethod
+    def bounding_boxes(lat: float, lng: float, radius_km: float) -> list:
+        """
+        Returns (min_lat, min_lng, max_lat, max_lng) boxes that together cover every point within
+        `radius_km` of (lat, lng). The box is split in two where it crosses the antimeridian.
+        """
+        angular_radius = radius_km / EARTH_RADIUS_KM
+        min_lat = lat - math.degrees(angular_radius)
+        max_lat = lat + math.degrees(angular_radius)
+
+        if min_lat <= -90 or max_lat >= 90:
+            # The circle covers a pole, so it spans every longitude
+            return [(max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0)]
+
+        delta_lng = math.degrees(math.asin(math.sin(angular_radius) / math.cos(math.radians(lat))))
+        min_lng = lng - delta_lng
+        max_lng = lng + delta_lng
+        if min_lng < -180:
+            return [(min_lat, min_lng + 360, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+        if max_lng > 180:
+            return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng - 360)]
+        return [(min_lat, min_lng, max_lat, max_lng)]
+
+    @staticmethod
+    def activities_in_box(
+        db_manager, min_lat: float, min_lng: float, max_lat: float, max_lng: float
+    ) -> pd.DataFrame:
+        """
+        Fetches the activities starting inside a bounding box through the activity_locations R*Tree.
+
+        A box with `min_lng` greater than `max_lng` is taken to cross the antimeridian.
+        """
+        if min_lng > max_lng:
+            boxes = [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+        else:
+            boxes = [(min_lat, min_lng, max_lat, max_lng)]
+
+        rows = []
+        for box_min_lat, box_min_lng, box_max_lat, box_max_lng in boxes:
+            rows.extend(
+                db_manager.execute_query(
+                    GET_ACTIVITIES_IN_BOX,
+                    {
+                        "min_lat": box_min_lat,
+                        "min_lng": box_min_lng,
+                        "max_lat": box_max_lat,
+                        "max_lng": box_max_lng,
+                    },
+                )
+            )
+        return pd.DataFrame(rows, columns=LOCATION_COLUMNS).drop_duplicates("id")
+
+    @staticmethod
+    def activities_near(db_manager, lat: float, lng: float, radius_km: float) -> pd.DataFrame:
+        """
+        Fetches the activities starting within `radius_km` of (lat, lng), nearest first.
+
+        The R*Tree narrows the search to the bounding boxes of the circle, and the exact
+        great-circle distance (in the added distance_km column) filters the candidates.
+        """
+        candidates = pd.concat(
+            [
+                Location.activities_in_box(db_manager, *box)
+                for box in Location.bounding_boxes(lat, lng, radius_km)
+            ],
+            ignore_index=True,
+        ).drop_duplicates("id")
+
+        candidates["distance_km"] = Location.haversine_km(
+            lat, lng, candidates["start_lat"], candidates["start_lng"]
+        )
+        return (
+            candidates[candidates["distance_km"] <= radius_km]
+            .sort_values("distance_km")
+            .reset_index(drop=True)
+        )
@@ -0,0 +1,166 @@
+# src/models/power_curve.py
+import numpy as np
+import pandas as pd
+from loguru import logger
+from src.models.streams import Streams
+from src.queries import (
+    GET_ACTIVITIES_WITHOUT_CURVES,
+    MERGE_POWER_CURVE_ENVELOPE,
+    GET_POWER_CURVE_ENVELOPE,
+    GET_ROLLING_POWER_CURVE,
+    CLEAR_POWER_CURVE_ENVELOPE,
+    GET_ALL_POWER_CURVES,
+)
+from src.metrics import metrics
+
+# Durations (seconds) the mean-maximal curves are evaluated at, from 1s to 2h
+CURVE_DURATIONS = [
+    1, 2, 3, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 300, 420, 600,
+    900, 1200, 1800, 2700, 3600, 5400, 7200,
+]
+
+# Recording gaps longer than this (seconds) count as stopped, not as holding the last value
+MAX_GAP_SECONDS = 5
+
+# Stream column each curve metric is computed from: watts in W, speed in m/s
+CURVE_METRICS = {"watts": "watts", "speed": "speed"}
+
+
+class PowerCurve:
+    def __init__(self, activity_id, sport_type, date, metric, duration, value):
+        self.activity_id = activity_id
+        self.sport_type = sport_type
+        self.date = date
+        self.metric = metric
+        self.duration = duration
+        self.value = value
+
+    def __repr__(self):
+        return (
+            f"PowerCurve(activity_id={self.activity_id}, sport_type='{self.sport_type}', "
+            f"metric='{self.metric}', duration={self.duration}, value={self.value})"
+        )
+
+    @staticmethod
+    def resample_to_seconds(time: np.ndarray, values: np.ndarray, max_gap: int = MAX_GAP_SECONDS) -> np.ndarray:
+        """
+        Resamples an irregularly sampled stream onto a 1-second grid.
+
+        Each second takes the latest sample at or before it. Seconds inside a recording gap
+        longer than `max_gap` are set to 0. Missing samples (NaN or negative) also count as 0.
+        """
+        t = time.astype(np.int64) - int(time[0])
+        values = np.nan_to_num(values.astype(np.float64), nan=0.0).clip(min=0)
+
+        grid = np.arange(t[-1] + 1)
+        sample_index = np.searchsorted(t, grid, side="right") - 1
+        resampled = values[sample_index]
+
+        long_gap_after = np.append(np.diff(t) > max_gap, False)
+        in_gap = (grid > t[sample_index]) & long_gap_after[sample_index]
+        resampled[in_gap] = 0.0
+        return resampled
+
+    @staticmethod
+    def mean_maximal(values: np.ndarray, durations: list = CURVE_DURATIONS) -> dict:
+        """
+        Best average of `values` (sampled at 1 Hz) over every window length in `durations`.
+
+        Uses a cumulative sum, so each duration is one vectorized pass over the array.
+        Durations longer than the activity are left out.
+        """
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        curve = {}
+        for duration in durations:
+            if duration > len(values):
+                break
+            window_sums = cumulative[duration:] - cumulative[:-duration]
+            curve[duration] = float(window_sums.max() / duration)
+        return curve
+
+    @staticmethod
+    @metrics.timed()
+    def process_power_curve(activity_id: int, sport_type: str, date: str, streams: dict) -> pd.DataFrame:
+        """Computes the mean-maximal power and speed curves of an activity from its streams."""
+        time = streams.get("time")
+        if time is None or len(time) < 2:
+            return pd.DataFrame()
+
+        rows = []
+        for metric, column in CURVE_METRICS.items():
+            values = streams.get(column)
+            if values is None or len(values) != len(time):
+                continue
+
+            resampled = PowerCurve.resample_to_seconds(time, values)
+            for duration, value in PowerCurve.mean_maximal(resampled).items():
+                rows.append([activity_id, sport_type, date, metric, duration, value])
+
+        return pd.DataFrame(
+            rows, columns=["id", "sport_type", "date", "metric", "duration", "value"]
+        )
+
+    @staticmethod
+    def update_envelope(db_manager, curves_df: pd.DataFrame) -> None:
+        """Merges new per-activity curves into the all-time envelope without rescanning history."""
+        if curves_df is None or curves_df.empty:
+            return
+
+        rows = curves_df[["metric", "sport_type", "duration", "value", "id", "date"]]
+        with db_manager.transaction() as conn:
+            conn.executemany(MERGE_POWER_CURVE_ENVELOPE, rows.itertuples(index=False, name=None))
+
+    @staticmethod
+    def rebuild_envelope(db_manager) -> None:
+        """Recomputes the all-time envelope from every stored per-activity curve."""
+        with db_manager.transaction() as conn:
+            conn.execute(CLEAR_POWER_CURVE_ENVELOPE)
+            conn.executemany(MERGE_POWER_CURVE_ENVELOPE, conn.execute(GET_ALL_POWER_CURVES).fetchall())
+
+    @staticmethod
+    def get_envelope(db_manager, metric: str, sport_type: str) -> pd.DataFrame:
+        """Returns the all-time best curve for a metric and sport type."""
+        rows = db_manager.execute_query(GET_POWER_CURVE_ENVELOPE, (metric, sport_type))
+        return pd.DataFrame(rows, columns=["duration", "value", "activity_id", "date"])
+
+    @staticmethod
+    def get_rolling_envelope(db_manager, metric: str, sport_type: str, since_date: str) -> pd.DataFrame:
+        """Returns the best curve over activities on or after `since_date` (YYYY-MM-DD)."""
+        rows = db_manager.execute_query(GET_ROLLING_POWER_CURVE, (metric, sport_type, since_date))
+        return pd.DataFrame(rows, columns=["duration", "value"])
+
+    @staticmethod
+    @metrics.timed()
+    def process_new_curves(db_manager) -> int:
+        """
+        Computes and stores curves for ride and run activities that have streams but no curve yet.
+
+        Activities without a usable curve are recorded in processed_activities, so their streams
+        are not decoded again on the next run.
+        """
+        pending = db_manager.execute_query(GET_ACTIVITIES_WITHOUT_CURVES)
+
+        processed = 0
+        no_curve = []
+        for activity_id, sport_type, date in pending:
+            try:
+                streams = Streams.load_streams(db_manager, activity_id)
+                curves_df = PowerCurve.process_power_curve(activity_id, sport_type, date, streams)
+                if curves_df.empty:
+                    no_curve.append(activity_id)
+                    continue
+                with db_manager.transaction():
+                    db_manager.insert_dataframe_to_db(df=curves_df, table_name="power_curves")
+                    PowerCurve.update_envelope(db_manager, curves_df)
+                processed += 1
+            except Exception as e:
+                logger.error(f"Error computing power curve for activity {activity_id}: {e}")
+
+        if no_curve:
+            db_manager.insert_dataframe_to_db(
+                df=pd.DataFrame({"id": no_curve, "task": "power_curve"}),
+                table_name="processed_activities",
+            )
+        if processed:
+            logger.info(f"Computed mean-maximal curves for {processed} activities.")
+        return processed
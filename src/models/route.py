@@ -0,0 +1,346 @@
+# src/models/route.py
+import zlib
+import numpy as np
+import pandas as pd
+from loguru import logger
+from src.models.streams import Streams
+from src.queries import (
+    GET_ACTIVITIES_WITHOUT_ROUTES,
+    GET_ROUTE_FINGERPRINT,
+    GET_ROUTE_CANDIDATES,
+    GET_ROUTE_FINGERPRINTS,
+    CLEAR_ROUTE_FINGERPRINTS,
+    CLEAR_ROUTE_LSH,
+    CLEAR_ROUTE_MARKERS,
+)
+from src.metrics import metrics
+
+EARTH_RADIUS_M = 6_371_008.8
+
+# Points every route is resampled to, evenly spaced along its length
+POLYLINE_POINTS = 64
+
+# Routes shorter than this (km) are not fingerprinted
+MIN_ROUTE_KM = 0.2
+
+# Geohash cells of 30 bits (geohash precision 6, about 1.2 x 0.6 km) make up a route's cell set
+GEOHASH_BITS = 30
+
+# MinHash signature length, split into LSH bands of MINHASH_SIZE // LSH_BANDS rows. Routes whose
+# cell sets have a Jaccard similarity of about (1 / LSH_BANDS) ** (LSH_BANDS / MINHASH_SIZE) = 0.5
+# or more are likely to share a bucket in at least one band
+MINHASH_SIZE = 64
+LSH_BANDS = 16
+
+# Deviation allowed by the Fréchet refinement, on top of half the spacing of the resampled points
+MAX_DEVIATION_M = 150
+
+# Routes whose lengths differ by more than this fraction are never matched
+MAX_LENGTH_DIFFERENCE = 0.2
+
+# Candidates refined per vectorized Fréchet pass, bounding the (candidates, N, N) distance array
+REFINE_CHUNK_SIZE = 256
+
+# Multiply-shift hash parameters. The seed is fixed, so stored signatures stay comparable
+# between runs; changing it (or the sizes above) requires Route.rebuild_index.
+_hash_rng = np.random.default_rng(20_240_101)
+MINHASH_MULTIPLIERS = _hash_rng.integers(1, 2**63, MINHASH_SIZE, dtype=np.uint64) | np.uint64(1)
+MINHASH_OFFSETS = _hash_rng.integers(0, 2**63, MINHASH_SIZE, dtype=np.uint64)
+BUCKET_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class Route:
+    def __init__(self, activity_id, length_km, polyline):
+        self.activity_id = activity_id
+        self.length_km = length_km
+        self.polyline = polyline
+
+    def __repr__(self):
+        return (
+            f"Route(activity_id={self.activity_id}, length_km={self.length_km}, "
+            f"points={len(self.polyline)})"
+        )
+
+    @staticmethod
+    def to_local_meters(latlng: np.ndarray, origin_lat: float) -> np.ndarray:
+        """Projects (lat, lng) degrees to planar meters with an equirectangular projection."""
+        radians = np.radians(latlng)
+        return np.stack(
+            [
+                radians[..., 1] * np.cos(np.radians(origin_lat)) * EARTH_RADIUS_M,
+                radians[..., 0] * EARTH_RADIUS_M,
+            ],
+            axis=-1,
+        )
+
+    @staticmethod
+    def resample_polyline(latlng: np.ndarray, n_points: int = POLYLINE_POINTS):
+        """
+        Resamples a latlng stream to `n_points` evenly spaced along its length.
+
+        Returns the (n_points, 2) polyline and the route length in km, or (None, 0.0) if the
+        stream has fewer than two valid samples. Missing samples (NaN) are dropped first.
+        """
+        latlng = np.asarray(latlng, dtype=np.float64).reshape(-1, 2)
+        latlng = latlng[~np.isnan(latlng).any(axis=1)]
+        if len(latlng) < 2:
+            return None, 0.0
+
+        xy = Route.to_local_meters(latlng, latlng[:, 0].mean())
+        along = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(xy, axis=0).T))))
+        targets = np.linspace(0.0, along[-1], n_points)
+        polyline = np.column_stack(
+            [np.interp(targets, along, latlng[:, 0]), np.interp(targets, along, latlng[:, 1])]
+        )
+        return polyline, along[-1] / 1000
+
+    @staticmethod
+    def _spread_bits(values: np.ndarray) -> np.ndarray:
+        """Moves bit k of each 16-bit value to bit 2k, leaving zeros in between."""
+        values = values.astype(np.uint64)
+        values = (values | (values << np.uint64(8))) & np.uint64(0x00FF00FF)
+        values = (values | (values << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+        values = (values | (values << np.uint64(2))) & np.uint64(0x33333333)
+        values = (values | (values << np.uint64(1))) & np.uint64(0x55555555)
+        return values
+
+    @staticmethod
+    def geohash_cells(latlng: np.ndarray, bits: int = GEOHASH_BITS) -> np.ndarray:
+        """
+        Returns the unique geohash cells visited by a latlng stream, as integers.
+
+        Longitude and latitude bits are interleaved the same way as in geohash strings, so
+        a cell is the integer form of a geohash of `bits` / 5 characters.
+        """
+        latlng = np.asarray(latlng, dtype=np.float64).reshape(-1, 2)
+        latlng = latlng[~np.isnan(latlng).any(axis=1)]
+
+        lng_bits = (bits + 1) // 2
+        lat_bits = bits // 2
+        lat = np.clip((latlng[:, 0] + 90) / 180, 0, 1 - 1e-12) * (1 << lat_bits)
+        lng = np.clip((latlng[:, 1] + 180) / 360, 0, 1 - 1e-12) * (1 << lng_bits)
+
+        cells = (Route._spread_bits(lng.astype(np.uint64)) << np.uint64(1)) | Route._spread_bits(
+            lat.astype(np.uint64)
+        )
+        if bits % 2:
+            cells = cells >> np.uint64(1)
+        return np.unique(cells)
+
+    @staticmethod
+    def minhash(cells: np.ndarray) -> np.ndarray:
+        """MinHash signature of a cell set: the minimum of MINHASH_SIZE multiply-shift hashes."""
+        hashes = cells[None, :] * MINHASH_MULTIPLIERS[:, None] + MINHASH_OFFSETS[:, None]
+        return (hashes >> np.uint64(32)).min(axis=1)
+
+    @staticmethod
+    def lsh_buckets(signature: np.ndarray) -> np.ndarray:
+        """Hashes each band of a MinHash signature into one signed 64-bit bucket."""
+        bands = signature.reshape(LSH_BANDS, -1)
+        buckets = np.zeros(LSH_BANDS, dtype=np.uint64)
+        for row in bands.T:
+            buckets = (buckets ^ row) * BUCKET_MULTIPLIER
+        return buckets.view(np.int64)
+
+    @staticmethod
+    def fingerprint(latlng: np.ndarray):
+        """
+        Builds the fingerprint of a latlng stream: resampled polyline, length in km and MinHash
+        signature. Returns None for streams that are too short to be a route.
+        """
+        if latlng is None:
+            return None
+
+        polyline, length_km = Route.resample_polyline(latlng)
+        if polyline is None or length_km < MIN_ROUTE_KM:
+            return None
+        return polyline, length_km, Route.minhash(Route.geohash_cells(latlng))
+
+    @staticmethod
+    def discrete_frechet(query: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """
+        Discrete Fréchet distance (meters) between a (N, 2) polyline and each of C candidate
+        (C, M, 2) polylines, all given in local meters.
+
+        The dynamic program walks the anti-diagonals of the coupling matrix, so each step
+        updates one diagonal of every candidate at once.
+        """
+        n_candidates, m = candidates.shape[0], candidates.shape[1]
+        n = query.shape[0]
+        distances = np.linalg.norm(candidates[:, None, :, :] - query[None, :, None, :], axis=-1)
+
+        # Padded so that row and column 0 act as the boundary: only the corner allows a start
+        coupling = np.full((n_candidates, n + 1, m + 1), np.inf)
+        coupling[:, 0, 0] = 0.0
+        for diagonal in range(n + m - 1):
+            i = np.arange(max(0, diagonal - m + 1), min(n, diagonal + 1))
+            j = diagonal - i
+            reachable = np.minimum(
+                np.minimum(coupling[:, i, j + 1], coupling[:, i, j]), coupling[:, i + 1, j]
+            )
+            coupling[:, i + 1, j + 1] = np.maximum(distances[:, i, j], reachable)
+
+        return coupling[:, n, m]
+
+    @staticmethod
+    def store_fingerprints(db_manager, fingerprints: list) -> None:
+        """Writes (activity ID, polyline, length km, signature) fingerprints and their LSH buckets."""
+        routes_df = pd.DataFrame(
+            [
+                (
+                    activity_id,
+                    length_km,
+                    zlib.compress(polyline.astype(np.float32).tobytes()),
+                    signature.tobytes(),
+                )
+                for activity_id, polyline, length_km, signature in fingerprints
+            ],
+            columns=["id", "length_km", "polyline", "signature"],
+        )
+        lsh_df = pd.DataFrame(
+            [
+                (band, int(bucket), activity_id)
+                for activity_id, _, _, signature in fingerprints
+                for band, bucket in enumerate(Route.lsh_buckets(signature))
+            ],
+            columns=["band", "bucket", "id"],
+        )
+        with db_manager.transaction():
+            db_manager.insert_dataframe_to_db(df=routes_df, table_name="route_fingerprints")
+            db_manager.insert_dataframe_to_db(df=lsh_df, table_name="route_lsh")
+
+    @staticmethod
+    @metrics.timed()
+    def process_new_fingerprints(db_manager, batch_size: int = 500) -> int:
+        """
+        Fingerprints every activity with a latlng stream and no fingerprint yet. Returns the count.
+
+        Activities without a usable route (too short, or no valid latlng) are recorded in
+        processed_activities, so their streams are not decoded again on the next run.
+        """
+        pending = [row[0] for row in db_manager.execute_query(GET_ACTIVITIES_WITHOUT_ROUTES)]
+
+        stored = 0
+        for start in range(0, len(pending), batch_size):
+            fingerprints = []
+            no_route = []
+            for activity_id in pending[start : start + batch_size]:
+                try:
+                    latlng = Streams.load_streams(db_manager, activity_id).get("latlng")
+                    fingerprint = Route.fingerprint(latlng)
+                    if fingerprint is None:
+                        no_route.append(activity_id)
+                    else:
+                        fingerprints.append((activity_id, *fingerprint))
+                except Exception as e:
+                    logger.error(f"Error fingerprinting route of activity {activity_id}: {e}")
+
+            with db_manager.transaction():
+                if fingerprints:
+                    Route.store_fingerprints(db_manager, fingerprints)
+                if no_route:
+                    db_manager.insert_dataframe_to_db(
+                        df=pd.DataFrame({"id": no_route, "task": "route"}),
+                        table_name="processed_activities",
+                    )
+            stored += len(fingerprints)
+
+        if stored:
+            logger.info(f"Fingerprinted the routes of {stored} activities.")
+        return stored
+
+    @staticmethod
+    def rebuild_index(db_manager) -> int:
+        """Drops every stored fingerprint and no-route marker and recomputes them from the streams table."""
+        with db_manager.transaction() as conn:
+            conn.execute(CLEAR_ROUTE_FINGERPRINTS)
+            conn.execute(CLEAR_ROUTE_LSH)
+            conn.execute(CLEAR_ROUTE_MARKERS)
+        return Route.process_new_fingerprints(db_manager)
+
+    @staticmethod
+    def find_candidates(db_manager, signature: np.ndarray) -> list:
+        """Returns the IDs of routes sharing an LSH bucket with `signature`, through the (band, bucket) key."""
+        buckets = Route.lsh_buckets(signature)
+        params = [value for band, bucket in enumerate(buckets) for value in (band, int(bucket))]
+        query = GET_ROUTE_CANDIDATES.format(pairs=", ".join(["(?, ?)"] * len(buckets)))
+        return [row[0] for row in db_manager.execute_query(query, params)]
+
+    @staticmethod
+    def find_similar_routes(
+        db_manager,
+        latlng: np.ndarray,
+        max_deviation_m: float = MAX_DEVIATION_M,
+        allow_reverse: bool = False,
+        exclude_id: int = None,
+    ) -> pd.DataFrame:
+        """
+        Finds stored activities that follow the same route as a latlng stream, best match first.
+
+        LSH buckets give the candidates, which are filtered by length and then refined with the
+        discrete Fréchet distance between resampled polylines. A candidate matches if it deviates
+        by at most `max_deviation_m` plus half the spacing of the resampled points. With
+        `allow_reverse`, routes run in the opposite direction match too.
+        """
+        columns = ["id", "name", "date", "sport_type", "length_km", "deviation_m"]
+        fingerprint = Route.fingerprint(latlng)
+        if fingerprint is None:
+            return pd.DataFrame(columns=columns)
+        polyline, length_km, signature = fingerprint
+
+        candidate_ids = [
+            activity_id
+            for activity_id in Route.find_candidates(db_manager, signature)
+            if activity_id != exclude_id
+        ]
+        if not candidate_ids:
+            return pd.DataFrame(columns=columns)
+
+        rows = []
+        for start in range(0, len(candidate_ids), REFINE_CHUNK_SIZE):
+            chunk = candidate_ids[start : start + REFINE_CHUNK_SIZE]
+            query = GET_ROUTE_FINGERPRINTS.format(placeholders=", ".join(["?"] * len(chunk)))
+            rows.extend(db_manager.execute_query(query, chunk))
+
+        candidates_df = pd.DataFrame(
+            rows, columns=["id", "name", "date", "sport_type", "length_km", "polyline"]
+        )
+        length_ratio = np.abs(candidates_df["length_km"] / length_km - 1)
+        candidates_df = candidates_df[length_ratio <= MAX_LENGTH_DIFFERENCE].reset_index(drop=True)
+        if candidates_df.empty:
+            return pd.DataFrame(columns=columns)
+
+        origin_lat = polyline[:, 0].mean()
+        query_xy = Route.to_local_meters(polyline, origin_lat)
+        candidate_xy = Route.to_local_meters(
+            np.stack(
+                [
+                    np.frombuffer(zlib.decompress(blob), dtype=np.float32).reshape(-1, 2)
+                    for blob in candidates_df["polyline"]
+                ]
+            ).astype(np.float64),
+            origin_lat,
+        )
+
+        deviation = Route.discrete_frechet(query_xy, candidate_xy)
+        if allow_reverse:
+            deviation = np.minimum(deviation, Route.discrete_frechet(query_xy, candidate_xy[:, ::-1]))
+
+        spacing_m = np.maximum(length_km, candidates_df["length_km"].to_numpy()) * 1000 / (POLYLINE_POINTS - 1)
+        candidates_df["deviation_m"] = deviation
+        matches = candidates_df[deviation <= max_deviation_m + spacing_m / 2]
+        return matches[columns].sort_values("deviation_m").reset_index(drop=True)
+
+    @staticmethod
+    def find_similar_activities(db_manager, activity_id: int, **kwargs) -> pd.DataFrame:
+        """Finds other activities on the same route as a stored activity (see find_similar_routes)."""
+        latlng = Streams.load_streams(db_manager, activity_id).get("latlng")
+        return Route.find_similar_routes(db_manager, latlng, exclude_id=activity_id, **kwargs)
+
+    @staticmethod
+    def get_polyline(db_manager, activity_id: int):
+        """Returns the stored resampled polyline of an activity as (lat, lng) rows, or None."""
+        rows = db_manager.execute_query(GET_ROUTE_FINGERPRINT, (activity_id,))
+        if not rows:
+            return None
+        return np.frombuffer(zlib.decompress(rows[0][1]), dtype=np.float32).reshape(-1, 2)
@@ -2,7 +2,38 @@
 import pandas as pd
 import json
 from loguru import logger
+from src.queries import GET_SPLITS_WITHOUT_ROWS
+from src.metrics import metrics
 
+# Typed columns of split_rows and lap_rows, mapped to the key they are read from in Strava's objects
+SPLIT_ROW_COLUMNS = {
+    "distance": "distance",
+    "elapsed_time": "elapsed_time",
+    "moving_time": "moving_time",
+    "elevation_difference": "elevation_difference",
+    "average_speed": "average_speed",
+    "average_grade_adjusted_speed": "average_grade_adjusted_speed",
+    "average_heartrate": "average_heartrate",
+    "pace_zone": "pace_zone",
+}
+LAP_ROW_COLUMNS = {
+    "lap_id": "id",
+    "name": "name",
+    "start_date": "start_date",
+    "distance": "distance",
+    "elapsed_time": "elapsed_time",
+    "moving_time": "moving_time",
+    "start_index": "start_index",
+    "end_index": "end_index",
+    "total_elevation_gain": "total_elevation_gain",
+    "average_speed": "average_speed",
+    "max_speed": "max_speed",
+    "average_cadence": "average_cadence",
+    "average_watts": "average_watts",
+    "average_heartrate": "average_heartrate",
+    "max_heartrate": "max_heartrate",
+    "pace_zone": "pace_zone",
+}
 
 
 class Splits:
@@ -28,6 +59,7 @@ class Splits:
         )
 
     @staticmethod
+    @metrics.timed()
     def process_splits(client, df: pd.DataFrame):
         """Fetch splits details"""
         splits_data = []
@@ -64,4 +96,80 @@ class Splits:
 
         return splits_df
 
-        
\ No newline at end of file
+    @staticmethod
+    def flatten_rows(activity_ids, entries, index_name: str, columns: dict) -> pd.DataFrame:
+        """
+        Flattens each activity's list of split or lap objects (or its JSON text) into one row per object.
+
+        `columns` maps each output column to the object key it is read from. Rows are numbered
+        from 1 within each activity in `index_name`; keys missing from an object become NULL.
+        """
+        records = []
+        for activity_id, items in zip(activity_ids, entries):
+            if isinstance(items, str):
+                items = json.loads(items)
+            if not isinstance(items, list):
+                continue
+            for index, item in enumerate(items, start=1):
+                records.append({**item, "activity_id": activity_id, index_name: index})
+
+        output_columns = ["activity_id", index_name, *columns]
+        if not records:
+            return pd.DataFrame(columns=output_columns)
+
+        rows_df = pd.DataFrame.from_records(records)
+        renamed = {key: column for column, key in columns.items() if key != column}
+        return rows_df.rename(columns=renamed).reindex(columns=output_columns)
+
+    @staticmethod
+    @metrics.timed()
+    def process_split_rows(df: pd.DataFrame) -> pd.DataFrame:
+        """Builds one split_rows row per metric split of every activity in `df`."""
+        if "splits_metric" not in df:
+            return pd.DataFrame()
+        return Splits.flatten_rows(df["id"], df["splits_metric"], "split_index", SPLIT_ROW_COLUMNS)
+
+    @staticmethod
+    @metrics.timed()
+    def process_lap_rows(df: pd.DataFrame) -> pd.DataFrame:
+        """Builds one lap_rows row per lap of every activity in `df`."""
+        if "laps" not in df:
+            return pd.DataFrame()
+        return Splits.flatten_rows(df["id"], df["laps"], "lap_index", LAP_ROW_COLUMNS)
+
+    @staticmethod
+    @metrics.timed()
+    def backfill_rows(db_manager, batch_size: int = 500) -> int:
+        """
+        Fills split_rows and lap_rows from the JSON stored in the splits table for activities
+        that have neither yet. Returns the number of activities visited.
+
+        Every activity visited is recorded in processed_activities, so activities whose splits
+        and laps are empty are not scanned again at the next startup.
+        """
+        last_id = 0
+        visited = 0
+
+        while True:
+            rows = db_manager.execute_query(GET_SPLITS_WITHOUT_ROWS, (last_id, batch_size))
+            if not rows:
+                break
+
+            splits_df = pd.DataFrame(rows, columns=["id", "splits_metric", "laps"])
+            with db_manager.transaction():
+                db_manager.insert_dataframe_to_db(
+                    df=Splits.process_split_rows(splits_df), table_name="split_rows"
+                )
+                db_manager.insert_dataframe_to_db(
+                    df=Splits.process_lap_rows(splits_df), table_name="lap_rows"
+                )
+                db_manager.insert_dataframe_to_db(
+                    df=pd.DataFrame({"id": splits_df["id"], "task": "split_rows"}),
+                    table_name="processed_activities",
+                )
+            last_id = rows[-1][0]
+            visited += len(rows)
+
+        if visited:
+            logger.info(f"Backfilled split and lap rows for {visited} activities.")
+        return visited
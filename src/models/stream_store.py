@@ -0,0 +1,161 @@
+# src/models/stream_store.py
+import os
+import sqlite3
+import threading
+import numpy as np
+from loguru import logger
+from src.constants import STREAM_DTYPES
+from src.models.streams import Streams
+from src.queries import GET_STREAMS_IDS
+from src.metrics import metrics
+
+CREATE_OFFSETS_TABLE = """
+    CREATE TABLE IF NOT EXISTS stream_offsets (
+        id INTEGER,
+        stream TEXT,
+        offset INTEGER,
+        length INTEGER,
+        PRIMARY KEY (id, stream)
+    )
+"""
+
+# Activities synced without any stream, so they are not loaded from the database again
+CREATE_EMPTY_TABLE = """
+    CREATE TABLE IF NOT EXISTS stream_empty (
+        id INTEGER PRIMARY KEY
+    )
+"""
+
+
+class StreamStore:
+    """
+    Append-only store of activity streams for whole-history scans.
+
+    Every stream column (see STREAM_COLUMNS) has one flat binary file holding the arrays of all
+    activities back to back in the column's dtype. A small SQLite index maps (activity id, stream)
+    to the sample offset and length inside that file. Readers memory-map the files, so a single
+    activity is a zero-copy slice and scanning every activity runs in constant memory.
+
+    Re-appending an activity points the index at the new copy; the old bytes stay in the file.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.db"), isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(CREATE_OFFSETS_TABLE)
+        self._conn.execute(CREATE_EMPTY_TABLE)
+        self._lock = threading.Lock()
+        self._memmaps = {}
+
+    @staticmethod
+    def width(stream: str) -> int:
+        """Number of values per sample: latlng holds (lat, lng) pairs."""
+        return 2 if stream == "latlng" else 1
+
+    def path(self, stream: str) -> str:
+        return os.path.join(self.directory, f"{stream}.bin")
+
+    def memmap(self, stream: str):
+        """Returns a read-only memory map of a stream file, or None if nothing was stored yet."""
+        mapped = self._memmaps.get(stream)
+        if mapped is None:
+            path = self.path(stream)
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                return None
+            mapped = np.memmap(path, dtype=STREAM_DTYPES[stream], mode="r")
+            self._memmaps[stream] = mapped
+        return mapped
+
+    def append(self, activity_id: int, arrays: dict) -> None:
+        """
+        Appends an activity's arrays, keyed by stream column, to the store. None entries are skipped.
+
+        An activity without any array is recorded as empty, so sync_from_db does not load it again.
+        """
+        with self._lock:
+            index_rows = []
+            for stream, array in arrays.items():
+                if array is None or stream not in STREAM_DTYPES:
+                    continue
+
+                data = np.ascontiguousarray(array, dtype=STREAM_DTYPES[stream])
+                with open(self.path(stream), "ab") as f:
+                    offset = f.tell() // (data.itemsize * self.width(stream))
+                    f.write(data.tobytes())
+
+                index_rows.append((activity_id, stream, offset, len(data)))
+                # The mapped size is fixed when the file is mapped, so remap on the next read
+                self._memmaps.pop(stream, None)
+
+            # The index is only written after the data, so it never points past the end of a file
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO stream_offsets VALUES (?, ?, ?, ?)", index_rows
+            )
+            if index_rows:
+                self._conn.execute("DELETE FROM stream_empty WHERE id = ?", (activity_id,))
+            else:
+                self._conn.execute("INSERT OR IGNORE INTO stream_empty VALUES (?)", (activity_id,))
+
+    def get(self, activity_id: int, stream: str):
+        """Returns a zero-copy view of one activity's stream, or None if it is not stored."""
+        row = self._conn.execute(
+            "SELECT offset, length FROM stream_offsets WHERE id = ? AND stream = ?",
+            (activity_id, stream),
+        ).fetchone()
+        if row is None:
+            return None
+        return self._slice(stream, *row)
+
+    def iter_stream(self, stream: str):
+        """Yields (activity id, zero-copy view) for every activity with the stream, in file order."""
+        mapped = self.memmap(stream)
+        if mapped is None:
+            return
+
+        cursor = self._conn.execute(
+            "SELECT id, offset, length FROM stream_offsets WHERE stream = ? ORDER BY offset",
+            (stream,),
+        )
+        for activity_id, offset, length in cursor:
+            yield activity_id, self._slice(stream, offset, length)
+
+    def _slice(self, stream: str, offset: int, length: int):
+        width = self.width(stream)
+        view = self.memmap(stream)[offset * width : (offset + length) * width]
+        return view.reshape(-1, 2) if width == 2 else view
+
+    def get_activity_ids(self) -> set:
+        """Returns the IDs of every activity with at least one stored stream."""
+        return {row[0] for row in self._conn.execute("SELECT DISTINCT id FROM stream_offsets")}
+
+    def get_synced_ids(self) -> set:
+        """Returns the IDs of every activity appended so far, including those without any stream."""
+        return {
+            row[0]
+            for row in self._conn.execute(
+                "SELECT id FROM stream_offsets UNION SELECT id FROM stream_empty"
+            )
+        }
+
+    @metrics.timed()
+    def sync_from_db(self, db_manager) -> int:
+        """Appends every activity in the streams table that is not in the store yet. Returns the count."""
+        stored_ids = self.get_synced_ids()
+        missing_ids = [
+            row[0] for row in db_manager.execute_query(GET_STREAMS_IDS) if row[0] not in stored_ids
+        ]
+
+        for activity_id in missing_ids:
+            self.append(activity_id, Streams.load_streams(db_manager, activity_id))
+
+        if missing_ids:
+            logger.info(f"Added {len(missing_ids)} activities to the stream store.")
+        return len(missing_ids)
+
+    def close(self) -> None:
+        self._memmaps.clear()
+        self._conn.close()
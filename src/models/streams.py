@@ -1,8 +1,18 @@
 # src/models/streams.py
-import pandas as pd
 import json
+import zlib
+import numpy as np
+import pandas as pd
 from loguru import logger
-from src.constants import ALL_STREAM_TYPES
+from src.api.rate_limiter import RateLimitExhausted
+from src.constants import (
+    ALL_STREAM_TYPES,
+    STREAM_COLUMNS,
+    STREAM_DTYPES,
+    STREAM_MISSING_VALUE,
+)
+from src.queries import GET_STREAMS_BY_ID, GET_JSON_STREAMS, UPDATE_STREAMS
+from src.metrics import metrics
 
 """
 FETCH THE STREAM FROM THE ACTIVITY
@@ -21,53 +31,102 @@ class Streams:
         self.strava_client = strava_client
 
     @staticmethod
+    def encode_stream(column: str, values: list):
+        """
+        Packs a stream into a zlib-compressed array of the column's dtype (see STREAM_DTYPES).
+
+        Returns None for an absent or empty stream. Missing samples become NaN in float
+        streams and STREAM_MISSING_VALUE in integer streams.
+        """
+        if not values:
+            return None
+
+        dtype = np.dtype(STREAM_DTYPES[column])
+        if dtype.kind == "f":
+            array = np.array(values, dtype=np.float64)
+        else:
+            array = np.array(
+                [STREAM_MISSING_VALUE if value is None else value for value in values],
+                dtype=np.float64,
+            )
+            array = np.rint(array)
+
+        return zlib.compress(array.astype(dtype).tobytes())
+
+    @staticmethod
+    def decode_stream(column: str, blob):
+        """Unpacks a stored stream into a NumPy array, or None if the stream is absent."""
+        if blob is None:
+            return None
+
+        if isinstance(blob, str):
+            # Legacy JSON row; "[0]" was written as a placeholder for absent streams
+            values = json.loads(blob)
+            if values == [0]:
+                return None
+            blob = Streams.encode_stream(column, values)
+
+        array = np.frombuffer(zlib.decompress(blob), dtype=STREAM_DTYPES[column])
+        return array.reshape(-1, 2) if column == "latlng" else array
+
+    @staticmethod
+    @metrics.timed()
     def process_streams(activity_id, response) -> pd.DataFrame:
-        """Process and serialize streams data."""
-        streams_data = []
-
-        keys = [
-            "time",
-            "distance",
-            "latlng",
-            "altitude",
-            "velocity_smooth",
-            "heartrate",
-            "cadence",
-            "watts",
-        ]
-
-        # Initialize a dictionary to hold stream data for the activity
+        """Process streams data into one row of binary arrays."""
         row_data = {"id": activity_id}
 
-        for key in keys:
+        for key, column in STREAM_COLUMNS.items():
             stream_values = response.get(key, {}).get("data", None)
+            row_data[column] = Streams.encode_stream(column, stream_values)
 
-            # Serialize the list as JSON if it exists
-            row_data[key] = (
-                json.dumps(stream_values) if stream_values else json.dumps([0])
-            )
-
-        # Rename `velocity_smooth` to `speed`
-        row_data["speed"] = row_data.pop("velocity_smooth", json.dumps([0]))
-
-        streams_data.append(row_data)
-
-   
-        columns = [
-            "id",
-            "time",
-            "distance",
-            "latlng",
-            "altitude",
-            "speed",
-            "heartrate",
-            "cadence",
-            "watts",
-        ]
-        streams_df = pd.DataFrame(streams_data, columns=columns)
+        columns = ["id"] + list(STREAM_COLUMNS.values())
+        streams_df = pd.DataFrame([row_data], columns=columns)
 
         return streams_df
 
+    @staticmethod
+    def load_streams(db_manager, activity_id) -> dict:
+        """
+        Loads the stored streams of an activity as NumPy arrays keyed by column name.
+
+        Absent streams map to None. Returns an empty dictionary if the activity has no streams row.
+        """
+        rows = db_manager.execute_query(GET_STREAMS_BY_ID, (activity_id,))
+        if not rows:
+            return {}
+
+        return {
+            column: Streams.decode_stream(column, blob)
+            for column, blob in zip(STREAM_COLUMNS.values(), rows[0])
+        }
+
+    @staticmethod
+    def migrate_json_streams(db_manager, batch_size: int = 500) -> int:
+        """Rewrites streams rows stored as JSON text into binary arrays. Returns the rows migrated."""
+        columns = list(STREAM_COLUMNS.values())
+        migrated = 0
+
+        while True:
+            rows = db_manager.execute_query(GET_JSON_STREAMS, (batch_size,))
+            if not rows:
+                break
+
+            updates = []
+            for activity_id, *blobs in rows:
+                arrays = [Streams.decode_stream(column, blob) for column, blob in zip(columns, blobs)]
+                encoded = [
+                    None if array is None else zlib.compress(array.tobytes()) for array in arrays
+                ]
+                updates.append((*encoded, activity_id))
+
+            with db_manager.transaction() as conn:
+                conn.executemany(UPDATE_STREAMS, updates)
+            migrated += len(updates)
+
+        if migrated:
+            logger.info(f"Migrated {migrated} streams rows from JSON to binary arrays.")
+        return migrated
+
     def get_streams(
         self, activity_id, keys=ALL_STREAM_TYPES, resolution="low", key_by_type=True
     ) -> pd.DataFrame:
@@ -96,6 +155,9 @@ class Streams:
             streams_df = self.process_streams(activity_id, streams_response)
             return streams_df
 
+        except RateLimitExhausted:
+            # The sync scheduler leaves the job pending and stops submitting
+            raise
         except Exception as e:
             logger.error(f"Error fetching streams for activity {activity_id}: {e}")
             return pd.DataFrame() 
@@ -0,0 +1,117 @@
+# src/models/training_load.py
+import numpy as np
+import pandas as pd
+from loguru import logger
+from src.config import CTL_DAYS, ATL_DAYS, HEARTRATE_REST, HEARTRATE_MAX
+from src.queries import (
+    GET_ACTIVITY_LOADS_SINCE,
+    GET_FIRST_ACTIVITY_DATE,
+    GET_LATEST_TRAINING_LOAD_DATE,
+    GET_TRAINING_LOAD_BEFORE,
+    DELETE_TRAINING_LOAD_SINCE,
+    GET_TRAINING_LOAD_RANGE,
+)
+from src.metrics import metrics
+
+
+class TrainingLoad:
+    def __init__(self, date, load, ctl, atl, tsb):
+        self.date = date
+        self.load = load
+        self.ctl = ctl
+        self.atl = atl
+        self.tsb = tsb
+
+    def __repr__(self):
+        return (
+            f"TrainingLoad(date='{self.date}', load={self.load}, ctl={self.ctl}, "
+            f"atl={self.atl}, tsb={self.tsb})"
+        )
+
+    @staticmethod
+    def calculate_trimp(duration: pd.Series, average_heartrate: pd.Series) -> pd.Series:
+        """Banister TRIMP from duration (minutes) and average heart rate."""
+        heartrate_reserve = (
+            (average_heartrate - HEARTRATE_REST) / (HEARTRATE_MAX - HEARTRATE_REST)
+        ).clip(0, 1)
+        return duration * heartrate_reserve * 0.64 * np.exp(1.92 * heartrate_reserve)
+
+    @staticmethod
+    def calculate_daily_load(activities_df: pd.DataFrame) -> pd.Series:
+        """Sums the load of each day: the suffer score, or TRIMP for activities without one."""
+        load = activities_df["intensity"].astype(float).fillna(
+            TrainingLoad.calculate_trimp(
+                activities_df["duration"].astype(float),
+                activities_df["average_heartrate"].astype(float),
+            )
+        )
+        return load.fillna(0).groupby(activities_df["date"]).sum()
+
+    @staticmethod
+    def calculate_training_load(
+        daily_load: pd.Series, ctl: float = 0.0, atl: float = 0.0
+    ) -> pd.DataFrame:
+        """
+        Runs the fitness/fatigue model over consecutive days of load.
+
+        `ctl` and `atl` are the values of the day before the first day. Form (TSB) on a day is
+        the previous day's fitness minus fatigue.
+        """
+        rows = []
+        for date, load in daily_load.items():
+            tsb = ctl - atl
+            ctl += (load - ctl) / CTL_DAYS
+            atl += (load - atl) / ATL_DAYS
+            rows.append([date, load, ctl, atl, tsb])
+
+        return pd.DataFrame(rows, columns=["date", "load", "ctl", "atl", "tsb"])
+
+    @staticmethod
+    @metrics.timed()
+    def update_training_load(db_manager, since_date: str = None) -> int:
+        """
+        Recomputes the training_load table from `since_date` (YYYY-MM-DD) up to today.
+
+        Days before `since_date` are left untouched and seed the model. Without `since_date`,
+        only the days after the last stored one are added. Returns the number of days written.
+        """
+        latest = db_manager.execute_query(GET_LATEST_TRAINING_LOAD_DATE)
+        latest_date = latest[0][0] if latest else None
+        if latest_date is None:
+            # Nothing materialized yet: start from the first activity
+            first = db_manager.execute_query(GET_FIRST_ACTIVITY_DATE)
+            since_date = first[0][0] if first else None
+        elif since_date is None or since_date > latest_date:
+            since_date = (pd.Timestamp(latest_date) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+
+        today = pd.Timestamp.now().strftime("%Y-%m-%d")
+        if since_date is None or since_date > today:
+            return 0
+
+        previous = db_manager.execute_query(GET_TRAINING_LOAD_BEFORE, (since_date,))
+        ctl, atl = previous[0] if previous else (0.0, 0.0)
+
+        activities_df = pd.DataFrame(
+            db_manager.execute_query(GET_ACTIVITY_LOADS_SINCE, (since_date,)),
+            columns=["date", "intensity", "duration", "average_heartrate"],
+        )
+        last_date = today if activities_df.empty else max(today, activities_df["date"].max())
+        days = pd.date_range(since_date, last_date)
+        daily_load = (
+            TrainingLoad.calculate_daily_load(activities_df)
+            .reindex(days.strftime("%Y-%m-%d"), fill_value=0.0)
+        )
+
+        training_load_df = TrainingLoad.calculate_training_load(daily_load, ctl, atl)
+        with db_manager.transaction():
+            db_manager.execute_query(DELETE_TRAINING_LOAD_SINCE, (since_date,))
+            db_manager.insert_dataframe_to_db(df=training_load_df, table_name="training_load")
+
+        logger.debug(f"Updated training load for {len(training_load_df)} days from {since_date}.")
+        return len(training_load_df)
+
+    @staticmethod
+    def get_training_load(db_manager, start_date: str, end_date: str) -> pd.DataFrame:
+        """Reads the materialized daily fitness, fatigue and form between two dates."""
+        rows = db_manager.execute_query(GET_TRAINING_LOAD_RANGE, (start_date, end_date))
+        return pd.DataFrame(rows, columns=["date", "load", "ctl", "atl", "tsb"])
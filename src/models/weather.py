@@ -1,8 +1,37 @@
 # src/models/weather.py
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
 from loguru import logger
+from src.config import (
+    FETCH_CONCURRENCY,
+    WEATHER_CELL_DEGREES,
+    WEATHER_MAX_GAP_DAYS,
+    WEATHER_MAX_RANGE_DAYS,
+)
+from src.queries import (
+    CLEAR_WEATHER_KEYS,
+    CREATE_WEATHER_KEYS,
+    GET_FORECAST_WEATHER_IDS,
+    GET_PENDING_WEATHER_JOBS,
+    GET_WEATHER_FOR_KEYS,
+    INSERT_OR_REPLACE_QUERY,
+    INSERT_WEATHER_KEY,
+)
+from src.metrics import metrics
 # from src.queries import check_weather_ids, get_weather_params_from_db
 
+# weather_hourly columns and the Open-Meteo hourly variable each is read from
+HOURLY_COLUMNS = {
+    "temperature": "temperature_2m",
+    "weather_code": "weather_code",
+    "precipitation": "precipitation",
+    "rain": "rain",
+    "wind_speed": "wind_speed_10m",
+    "snow": "snowfall",
+}
+
 
 
 class Weather:
@@ -39,7 +68,8 @@ class Weather:
             f"wind={self.wind}, snow={self.snow})"
         )
     
-    def round_time_to_nearest_hour(self, time_str):
+    @staticmethod
+    def round_time_to_nearest_hour(time_str):
         # Convert the time string into a datetime object
         time_obj = datetime.strptime(time_str, "%H:%M")
 
@@ -51,6 +81,184 @@ class Weather:
         # Return the rounded time as a string with format HH:MM
         return time_obj.strftime("%H:00")
     
+    @staticmethod
+    def round_to_nearest_hour(timestamps: pd.Series) -> pd.Series:
+        """
+        Vectorized round_time_to_nearest_hour for full timestamps: half past and later rounds up,
+        carrying over into the next day when needed.
+        """
+        return (timestamps + pd.Timedelta(minutes=30)).dt.floor("h")
+
+    @staticmethod
+    def to_cell(values, cell_degrees: float = WEATHER_CELL_DEGREES) -> np.ndarray:
+        """Snaps coordinates to the center of their WEATHER_CELL_DEGREES cell."""
+        return np.round(np.round(np.asarray(values, dtype=float) / cell_degrees) * cell_degrees, 6)
+
+    @staticmethod
+    def group_date_ranges(
+        dates, max_range_days: int = WEATHER_MAX_RANGE_DAYS, max_gap_days: int = WEATHER_MAX_GAP_DAYS
+    ) -> list:
+        """
+        Splits dates (YYYY-MM-DD) into (start, end) ranges that each become one request. A new
+        range starts after a gap of more than `max_gap_days` or once it would span `max_range_days`.
+        """
+        days = pd.to_datetime(pd.Series(dates).drop_duplicates()).sort_values().tolist()
+        ranges = []
+        start = previous = days[0]
+        for day in days[1:]:
+            if (day - previous).days > max_gap_days or (day - start).days >= max_range_days:
+                ranges.append((start, previous))
+                start = day
+            previous = day
+        ranges.append((start, previous))
+        return [(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")) for start, end in ranges]
+
+    @staticmethod
+    @metrics.timed()
+    def process_hourly_response(
+        response: dict, cell_lat: float, cell_lng: float, source: str
+    ) -> pd.DataFrame:
+        """
+        Turns an Open-Meteo hourly response into weather_hourly rows for one cell, recording the
+        endpoint (`source`: "forecast" or "archive") it came from.
+        """
+        hourly = (response or {}).get("hourly") or {}
+        if not hourly.get("time"):
+            return pd.DataFrame()
+
+        hourly_df = pd.DataFrame(
+            {
+                column: hourly.get(variable, [None] * len(hourly["time"]))
+                for column, variable in HOURLY_COLUMNS.items()
+            }
+        )
+        hourly_df.insert(0, "hour", hourly["time"])
+        hourly_df.insert(0, "cell_lng", cell_lng)
+        hourly_df.insert(0, "cell_lat", cell_lat)
+        hourly_df["source"] = source
+        return hourly_df
+
+    @staticmethod
+    def get_cached_hours(db_manager, located: pd.DataFrame, archive_cutoff: str) -> pd.DataFrame:
+        """
+        Reads the weather_hourly row of each activity's (cell_lat, cell_lng, hour) in one join,
+        indexed by activity ID. Activities without a cached hour are left out, and so are those
+        whose hour came from the forecast but is older than `archive_cutoff` (YYYY-MM-DD).
+        """
+        with db_manager.transaction() as conn:
+            conn.execute(CREATE_WEATHER_KEYS)
+            conn.execute(CLEAR_WEATHER_KEYS)
+            conn.executemany(
+                INSERT_WEATHER_KEY,
+                located[["id", "cell_lat", "cell_lng", "hour"]].itertuples(index=False, name=None),
+            )
+            rows = conn.execute(GET_WEATHER_FOR_KEYS, (archive_cutoff,)).fetchall()
+            conn.execute(CLEAR_WEATHER_KEYS)
+        return pd.DataFrame(rows, columns=["id", *HOURLY_COLUMNS, "source"]).set_index("id")
+
+    @staticmethod
+    def requeue_forecast_weather(db_manager, archive_cutoff: str) -> int:
+        """
+        Marks the weather jobs of activities answered from forecast hours before `archive_cutoff`
+        (YYYY-MM-DD) as pending again, so their weather is replaced by the archive's. Returns the count.
+        """
+        rows = db_manager.execute_query(GET_FORECAST_WEATHER_IDS, (archive_cutoff,))
+        activity_ids = [row[0] for row in rows]
+        if activity_ids:
+            db_manager.reset_sync_jobs(activity_ids, ["weather"])
+            logger.info(f"Refetching archived weather for {len(activity_ids)} activities.")
+        return len(activity_ids)
+
+    @staticmethod
+    @metrics.timed()
+    def process_weather_jobs(db_manager, weather_client, concurrency: int = FETCH_CONCURRENCY) -> int:
+        """
+        Runs every pending weather sync job. Returns the number of activities answered.
+
+        Activities are snapped to location cells and their start rounded to the nearest hour.
+        Hours already in weather_hourly are answered from it. The missing ones are fetched with one
+        hourly request per cell and date range (see group_date_ranges), `concurrency` at a time,
+        and cached there too, split at the archive cutoff so each range comes from one endpoint.
+        Forecast hours are fetched again from the archive once it covers them, for pending jobs
+        and for activities already answered from them. Indoor activities and activities without a
+        GPS start need no weather.
+        """
+        archive_cutoff = weather_client.archive_cutoff()
+        Weather.requeue_forecast_weather(db_manager, archive_cutoff)
+        rows = db_manager.execute_query(GET_PENDING_WEATHER_JOBS)
+        if not rows:
+            return 0
+
+        jobs_df = pd.DataFrame(
+            rows, columns=["id", "date", "start_time", "start_lat", "start_lng", "indoor"]
+        )
+        no_weather = (
+            jobs_df["start_lat"].isna()
+            | jobs_df["start_lng"].isna()
+            | jobs_df["indoor"].fillna(0).astype(bool)
+        )
+        finished = [(activity_id, "weather") for activity_id in jobs_df.loc[no_weather, "id"]]
+
+        located = jobs_df[~no_weather].copy()
+        located["cell_lat"] = Weather.to_cell(located["start_lat"])
+        located["cell_lng"] = Weather.to_cell(located["start_lng"])
+        starts = pd.to_datetime(located["date"] + " " + located["start_time"], format="%Y-%m-%d %H:%M")
+        located["hour"] = Weather.round_to_nearest_hour(starts).dt.strftime("%Y-%m-%dT%H:00")
+
+        cached_hours = Weather.get_cached_hours(db_manager, located, archive_cutoff)
+        cached = located["id"].isin(cached_hours.index).to_numpy()
+        misses = located[~cached].copy()
+        misses["archived"] = misses["hour"].str[:10] < archive_cutoff
+        fetches = [
+            (cell_lat, cell_lng, start_date, end_date)
+            for (cell_lat, cell_lng, _), cell_df in misses.groupby(["cell_lat", "cell_lng", "archived"])
+            for start_date, end_date in Weather.group_date_ranges(cell_df["hour"].str[:10])
+        ]
+        if fetches:
+            logger.info(
+                f"Fetching weather for {len(misses)} activities in {len(fetches)} requests "
+                f"({int(cached.sum())} answered from the cache)."
+            )
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="weather") as executor:
+                responses = executor.map(
+                    lambda fetch: weather_client.get_weather_data(*fetch), fetches
+                )
+                hourly_frames = [
+                    Weather.process_hourly_response(
+                        response, cell_lat, cell_lng, weather_client.source_for(end_date)
+                    )
+                    for (cell_lat, cell_lng, _, end_date), response in zip(fetches, responses)
+                ]
+            hourly_frames = [df for df in hourly_frames if not df.empty]
+            if hourly_frames:
+                db_manager.insert_dataframe_to_db(
+                    df=pd.concat(hourly_frames, ignore_index=True),
+                    table_name="weather_hourly",
+                    query=INSERT_OR_REPLACE_QUERY,
+                )
+
+        hours = Weather.get_cached_hours(db_manager, located, archive_cutoff)
+        answered = located["id"].isin(hours.index)
+        weather_df = hours.loc[located.loc[answered, "id"]].reset_index()
+        weather_df.insert(1, "date", located.loc[answered, "hour"].str.replace("T", " ").to_numpy())
+        finished.extend((activity_id, "weather") for activity_id in weather_df["id"])
+        failed = [
+            (activity_id, "weather", "No weather data received")
+            for activity_id in located.loc[~answered, "id"]
+        ]
+
+        with db_manager.transaction():
+            # Replaces the forecast weather of activities requeued for the archive's
+            db_manager.insert_dataframe_to_db(
+                df=weather_df, table_name="weather", query=INSERT_OR_REPLACE_QUERY
+            )
+            db_manager.complete_sync_jobs(finished)
+            db_manager.fail_sync_jobs(failed)
+
+        if failed:
+            logger.warning(f"No weather data for {len(failed)} activities.")
+        return len(weather_df)
+
     def get_params(self, activity_id: int):
         # date, lat_lng = get_weather_params_from_db(activity_id)
         logger.info("Validate params!")
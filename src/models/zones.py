@@ -1,6 +1,7 @@
 # src/models/zones.py
 import pandas as pd
 from loguru import logger
+from src.metrics import metrics
 # from src.db import insert_data_to_db
 
 
@@ -12,6 +13,7 @@ class Zones:
         return f"Zones(zone_data={self.zone_data}"
 
     @staticmethod
+    @metrics.timed()
     def process_zones(zone_data: list, activity_id: int) -> pd.DataFrame:
         if not isinstance(zone_data, list):
             raise ValueError("Zones data should be a list.")
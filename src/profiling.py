@@ -0,0 +1,404 @@
+# src/profiling.py
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from loguru import logger
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+PROFILE_MODES = ["cprofile", "sampling"]
+
+# Stages main.py can profile; "sync" is the whole run
+PROFILE_STAGES = [
+    "sync",
+    "listing",
+    "sync_jobs",
+    "gear",
+    "weather",
+    "stream_store",
+    "power_curves",
+    "routes",
+    "stream_best_efforts",
+]
+
+# Allocation sites left out of the tracemalloc report, such as the snapshots themselves
+SNAPSHOT_EXCLUDES = {tracemalloc.__file__, "<frozen importlib._bootstrap>", "<unknown>"}
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread each `interval` seconds from a background thread. The
+    samples are wall-clock, so threads blocked on I/O or locks are counted too.
+
+    Unlike cProfile it sees worker threads and adds no per-call overhead. The samples are kept
+    as folded stacks ("outer;inner;leaf count"), the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return f"SamplingProfiler(interval={self.interval}, samples={sum(self.samples.values())})"
+
+    @staticmethod
+    def frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def sample(self) -> None:
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self.frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            self.samples[";".join(reversed(stack))] += 1
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def top_functions(self, limit: int) -> list:
+        """(function, samples as leaf, samples anywhere on the stack) for the most sampled leaves."""
+        own = Counter()
+        total = Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(";")[1:]  # Drop the thread name
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+    def write_folded(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """
+    Optional profiling of named sync stages, configured from the command line of main.py.
+
+    In "cprofile" mode each stage gets a cProfile.Profile per thread that runs it (see `wrap`
+    for work handed to thread pools), merged into `<stage>.prof`. In "sampling" mode every
+    thread is sampled while the stage runs, written to `<stage>.folded` for flamegraphs.
+    Either way a top-N report of the hottest functions is written to report.txt, together with
+    the peak RSS reached by the end of each stage. Disabled until `configure` is called.
+    """
+
+    def __init__(self):
+        self.mode = None
+        self.stages = set()
+        self.output_dir = None
+        self.top = 30
+        self.interval = 0.005
+        self.profiles = defaultdict(list)
+        self.samplers = {}
+        self.peak_rss = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Profiler(mode={self.mode}, stages={sorted(self.stages)}, output_dir={self.output_dir})"
+
+    def configure(self, mode: str, stages: list, output_dir: str, top: int = 30, interval: float = 0.005):
+        """Starts profiling `stages` with `mode`; without a mode only the memory report is written."""
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"Invalid profile mode: {mode}. Expected one of {PROFILE_MODES}.")
+        unknown = set(stages) - set(PROFILE_STAGES)
+        if unknown:
+            raise ValueError(f"Unknown profile stages: {sorted(unknown)}. Expected {PROFILE_STAGES}.")
+        if mode == "cprofile" and "sync" in stages and len(stages) > 1:
+            # cProfile allows one active profile per thread, so stages cannot nest inside "sync"
+            raise ValueError("cProfile cannot profile 'sync' together with other stages.")
+
+        self.mode = mode
+        self.stages = set(stages)
+        self.output_dir = output_dir
+        self.top = top
+        self.interval = interval
+        os.makedirs(output_dir, exist_ok=True)
+        if mode is not None:
+            logger.info(f"Profiling {', '.join(sorted(self.stages))} with {mode} into {output_dir}")
+
+    def enabled_for(self, stage: str) -> bool:
+        return self.mode is not None and stage in self.stages
+
+    def thread_profile(self, stage: str) -> cProfile.Profile:
+        """The calling thread's profile for `stage`, created on first use."""
+        profiles = self._local.__dict__.setdefault("profiles", {})
+        if stage not in profiles:
+            profiles[stage] = cProfile.Profile()
+            with self._lock:
+                self.profiles[stage].append(profiles[stage])
+        return profiles[stage]
+
+    def enable(self, profile: cProfile.Profile) -> None:
+        profile.enable()
+        self._local.active = profile
+
+    def disable(self, profile: cProfile.Profile) -> None:
+        profile.disable()
+        self._local.active = None
+
+    @contextmanager
+    def paused(self):
+        """Stops the calling thread's cProfile for the block, to keep profiling overhead out of it."""
+        profile = getattr(self._local, "active", None)
+        if profile is not None:
+            profile.disable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.enable()
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Profiles the block as `stage` if it was selected, and records the peak RSS after it."""
+        if not self.enabled_for(stage):
+            yield
+            return
+
+        if self.mode == "cprofile":
+            profile = self.thread_profile(stage)
+            self.enable(profile)
+        else:
+            sampler = self.samplers.setdefault(stage, SamplingProfiler(self.interval))
+            sampler.start()
+        try:
+            yield
+        finally:
+            if self.mode == "cprofile":
+                self.disable(profile)
+            else:
+                sampler.stop()
+            self.peak_rss[stage] = peak_rss_bytes()
+
+    def wrap(self, stage: str, function):
+        """
+        Returns `function` profiled as part of `stage`, or of the whole "sync" if only that is
+        selected, in whichever thread calls it. Only needed for cProfile, which sees the thread
+        it was enabled in; sampling covers every thread.
+        """
+        if self.mode != "cprofile":
+            return function
+        if stage not in self.stages:
+            if "sync" not in self.stages:
+                return function
+            stage = "sync"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profile = self.thread_profile(stage)
+            self.enable(profile)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.disable(profile)
+
+        return wrapper
+
+    def stage_report(self, stage: str) -> str:
+        """Writes the stage's profile file and returns its top-N report."""
+        if self.mode == "cprofile":
+            profiles = [profile for profile in self.profiles.get(stage, []) if profile.getstats()]
+            if not profiles:
+                return ""
+            stats = pstats.Stats(*profiles)
+            stats.dump_stats(os.path.join(self.output_dir, f"{stage}.prof"))
+            buffer = io.StringIO()
+            stats.stream = buffer
+            stats.sort_stats("cumulative").print_stats(self.top)
+            stats.sort_stats("tottime").print_stats(self.top)
+            return buffer.getvalue()
+
+        sampler = self.samplers.get(stage)
+        if sampler is None or not sampler.samples:
+            return ""
+        sampler.write_folded(os.path.join(self.output_dir, f"{stage}.folded"))
+        total = sum(sampler.samples.values())
+        lines = [f"{total} samples every {sampler.interval * 1000:.1f} ms across all threads"]
+        lines.append(f"{'self %':>8} {'total %':>8}  function")
+        for frame, own, cumulative in sampler.top_functions(self.top):
+            lines.append(f"{own / total:>8.1%} {cumulative / total:>8.1%}  {frame}")
+        return "\n".join(lines)
+
+    def write_reports(self, extra: str = "") -> None:
+        """Writes every profiled stage's files and report.txt, and logs where they are."""
+        if self.output_dir is None:
+            return
+
+        sections = []
+        for stage in PROFILE_STAGES:
+            if stage not in self.stages:
+                continue
+            report = self.stage_report(stage)
+            if report:
+                peak = self.peak_rss.get(stage)
+                peak_text = f", peak RSS {peak / 2**20:.0f} MiB" if peak else ""
+                sections.append(f"=== {stage} ({self.mode}{peak_text})\n{report}")
+
+        peak = peak_rss_bytes()
+        if peak:
+            sections.append(f"Peak RSS of the run: {peak / 2**20:.0f} MiB")
+        if extra:
+            sections.append(extra)
+
+        report_path = os.path.join(self.output_dir, "report.txt")
+        with open(report_path, "w") as f:
+            f.write("\n\n".join(sections) + "\n")
+        logger.info(f"Wrote profiles and {report_path}")
+
+
+class MemoryTracker:
+    """
+    Optional tracemalloc tracking of the functions decorated with `track`.
+
+    Every call records the peak memory traced while it ran (allocations of other threads in
+    that time count too). Each time a call receives a larger DataFrame than before, snapshots
+    are taken before and after it, and the allocation sites that grew the most are kept for the
+    report. The snapshot after the largest call is dumped for tracemalloc.Snapshot.load().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.top = 15
+        self.calls = Counter()
+        self.rows = Counter()
+        self.max_peak = {}
+        self.largest = {}
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return f"MemoryTracker(enabled={self.enabled}, functions={sorted(self.calls)})"
+
+    def start(self, frames: int = 10, top: int = 15) -> None:
+        self.top = top
+        tracemalloc.start(frames)
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+        tracemalloc.stop()
+
+    @staticmethod
+    def input_rows(args, kwargs) -> int:
+        """Rows of the first DataFrame argument, or 0."""
+        for value in [*args, *kwargs.values()]:
+            if hasattr(value, "shape") and hasattr(value, "columns"):
+                return len(value)
+        return 0
+
+    def track(self):
+        """Decorator tracking the function's memory while enabled. Place it below @staticmethod."""
+
+        def decorator(function):
+            name = function.__qualname__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                return self.call(name, function, args, kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def call(self, name: str, function, args, kwargs):
+        rows = self.input_rows(args, kwargs)
+        with self._lock, profiler.paused():
+            take_snapshots = rows > self.largest.get(name, {}).get("rows", -1)
+            before = tracemalloc.take_snapshot() if take_snapshots else None
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+
+        result = function(*args, **kwargs)
+
+        with self._lock, profiler.paused():
+            _, peak = tracemalloc.get_traced_memory()
+            self.calls[name] += 1
+            self.rows[name] += rows
+            self.max_peak[name] = max(self.max_peak.get(name, 0), peak - start)
+            if take_snapshots:
+                after = tracemalloc.take_snapshot()
+                growth = [
+                    stat
+                    for stat in after.compare_to(before, "lineno")
+                    if stat.traceback[0].filename not in SNAPSHOT_EXCLUDES
+                ]
+                self.largest[name] = {
+                    "rows": rows,
+                    "peak": peak - start,
+                    "after": after,
+                    "growth": growth[: self.top],
+                }
+        return result
+
+    def report(self, output_dir: str = None) -> str:
+        """Summarizes every tracked function, dumping the largest call's snapshot into `output_dir`."""
+        if not self.calls:
+            return ""
+
+        lines = ["=== tracemalloc"]
+        for name in sorted(self.calls):
+            largest = self.largest.get(name, {})
+            lines.append(
+                f"{name}: {self.calls[name]} calls, {self.rows[name]} rows, "
+                f"max peak {self.max_peak[name] / 2**20:.1f} MiB"
+            )
+            if not largest:
+                continue
+            lines.append(
+                f"  Largest call ({largest['rows']} rows, peak {largest['peak'] / 2**20:.1f} MiB), "
+                f"top allocation growth:"
+            )
+            lines.extend(f"    {stat}" for stat in largest["growth"])
+            if output_dir:
+                largest["after"].dump(os.path.join(output_dir, f"{name}.snapshot"))
+        return "\n".join(lines)
+
+
+# Shared profiler and memory tracker of the running process, both off by default
+profiler = Profiler()
+memory_tracker = MemoryTracker()
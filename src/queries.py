@@ -5,15 +5,23 @@ ALLOWED_TABLES = [
     "best_efforts",
     "gear",
     "weather",
+    "weather_hourly",
     "splits",
+    "split_rows",
+    "lap_rows",
     "zones",
-    "cache",
     "streams",
+    "sync_state",
+    "sync_jobs",
+    "power_curves",
+    "power_curve_envelope",
+    "training_load",
+    "activity_rollups",
+    "activity_locations",
+    "route_fingerprints",
+    "route_lsh",
+    "processed_activities",
 ]
-INSERT_ID_TO_CACHE = """
-        INSERT OR REPLACE INTO cache (id)
-        VALUES (?)
-    """
 
 
 CREATE_ALL_TABLES = {
@@ -38,7 +46,8 @@ CREATE_ALL_TABLES = {
                     average_temp REAL,
                     average_watts REAL,
                     intensity INTEGER,
-                    lat_lng TEXT
+                    start_lat REAL,
+                    start_lng REAL
                 )
             """,
     "best_efforts": """
@@ -49,6 +58,7 @@ CREATE_ALL_TABLES = {
                     distance REAL,
                     time INTEGER,
                     pr_rank INTEGER,
+                    source TEXT DEFAULT 'strava',
                     PRIMARY KEY (id, name)
                 )
             """,
@@ -60,7 +70,10 @@ CREATE_ALL_TABLES = {
                     brand_name TEXT,
                     model_name TEXT,
                     retired INTEGER,
-                    weight REAL
+                    weight REAL,
+                    updated_at REAL,
+                    activity_count INTEGER,
+                    activity_distance REAL
                 )
             """,
     "weather": """
@@ -72,9 +85,27 @@ CREATE_ALL_TABLES = {
                     precipitation REAL,
                     rain REAL,
                     wind_speed REAL,
-                    snow REAL
+                    snow REAL,
+                    source TEXT
                 )
             """,
+    # Open-Meteo hourly weather by location cell and local hour (YYYY-MM-DDTHH:00). The source
+    # is the endpoint it came from: "forecast" hours are replaced once the archive covers them.
+    "weather_hourly": """
+                CREATE TABLE IF NOT EXISTS weather_hourly (
+                    cell_lat REAL,
+                    cell_lng REAL,
+                    hour TEXT,
+                    temperature REAL,
+                    weather_code INTEGER,
+                    precipitation REAL,
+                    rain REAL,
+                    wind_speed REAL,
+                    snow REAL,
+                    source TEXT,
+                    PRIMARY KEY (cell_lat, cell_lng, hour)
+                ) WITHOUT ROWID
+            """,
     "splits": """
                 CREATE TABLE IF NOT EXISTS splits (
                     id INTEGER PRIMARY KEY,
@@ -84,6 +115,44 @@ CREATE_ALL_TABLES = {
                     available_zones TEXT)
                 
             """,
+    "split_rows": """
+                CREATE TABLE IF NOT EXISTS split_rows (
+                    activity_id INTEGER,
+                    split_index INTEGER,
+                    distance REAL,
+                    elapsed_time INTEGER,
+                    moving_time INTEGER,
+                    elevation_difference REAL,
+                    average_speed REAL,
+                    average_grade_adjusted_speed REAL,
+                    average_heartrate REAL,
+                    pace_zone INTEGER,
+                    PRIMARY KEY (activity_id, split_index)
+                )
+            """,
+    "lap_rows": """
+                CREATE TABLE IF NOT EXISTS lap_rows (
+                    activity_id INTEGER,
+                    lap_index INTEGER,
+                    lap_id INTEGER,
+                    name TEXT,
+                    start_date TEXT,
+                    distance REAL,
+                    elapsed_time INTEGER,
+                    moving_time INTEGER,
+                    start_index INTEGER,
+                    end_index INTEGER,
+                    total_elevation_gain REAL,
+                    average_speed REAL,
+                    max_speed REAL,
+                    average_cadence REAL,
+                    average_watts REAL,
+                    average_heartrate REAL,
+                    max_heartrate REAL,
+                    pace_zone INTEGER,
+                    PRIMARY KEY (activity_id, lap_index)
+                )
+            """,
     "zones": """
                 CREATE TABLE IF NOT EXISTS zones (
                     id INTEGER,
@@ -97,27 +166,200 @@ CREATE_ALL_TABLES = {
     "streams": """
                 CREATE TABLE IF NOT EXISTS streams (
                     id INTEGER PRIMARY KEY,
-                    time TEXT,
-                    distance TEXT,
-                    latlng TEXT,
-                    altitude TEXT,
-                    speed TEXT,
-                    heartrate TEXT,
-                    cadence TEXT,
-                    watts TEXT
+                    time BLOB,
+                    distance BLOB,
+                    latlng BLOB,
+                    altitude BLOB,
+                    speed BLOB,
+                    heartrate BLOB,
+                    cadence BLOB,
+                    watts BLOB
+                )
+            """,
+    "sync_jobs": """
+                CREATE TABLE IF NOT EXISTS sync_jobs (
+                    id INTEGER,
+                    stage TEXT,
+                    status TEXT DEFAULT 'pending',
+                    priority INTEGER,
+                    attempts INTEGER DEFAULT 0,
+                    last_error TEXT,
+                    updated_at TEXT,
+                    PRIMARY KEY (id, stage)
+                )
+            """,
+    "sync_state": """
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """,
+    "power_curves": """
+                CREATE TABLE IF NOT EXISTS power_curves (
+                    id INTEGER,
+                    sport_type TEXT,
+                    date TEXT,
+                    metric TEXT,
+                    duration INTEGER,
+                    value REAL,
+                    PRIMARY KEY (id, metric, duration)
                 )
             """,
-    "cache": """
-                CREATE TABLE IF NOT EXISTS cache (
-                    id INTEGER PRIMARY KEY
+    "power_curve_envelope": """
+                CREATE TABLE IF NOT EXISTS power_curve_envelope (
+                    metric TEXT,
+                    sport_type TEXT,
+                    duration INTEGER,
+                    value REAL,
+                    activity_id INTEGER,
+                    date TEXT,
+                    PRIMARY KEY (metric, sport_type, duration)
+                )
+            """,
+    "training_load": """
+                CREATE TABLE IF NOT EXISTS training_load (
+                    date TEXT PRIMARY KEY,
+                    load REAL,
+                    ctl REAL,
+                    atl REAL,
+                    tsb REAL
                 )
             """,
+    "activity_rollups": """
+                CREATE TABLE IF NOT EXISTS activity_rollups (
+                    period_type TEXT,
+                    period TEXT,
+                    sport_type TEXT,
+                    gear_id TEXT,
+                    activity_count INTEGER,
+                    distance REAL,
+                    duration REAL,
+                    elevation_gain REAL,
+                    PRIMARY KEY (period_type, period, sport_type, gear_id)
+                )
+            """,
+    # R*Tree over start coordinates; each point is stored as a zero-size box
+    "activity_locations": """
+                CREATE VIRTUAL TABLE IF NOT EXISTS activity_locations USING rtree (
+                    id,
+                    min_lat, max_lat,
+                    min_lng, max_lng
+                )
+            """,
+    "route_fingerprints": """
+                CREATE TABLE IF NOT EXISTS route_fingerprints (
+                    id INTEGER PRIMARY KEY,
+                    length_km REAL,
+                    polyline BLOB,
+                    signature BLOB
+                )
+            """,
+    # Locality-sensitive hashing buckets: one row per MinHash band of every route
+    "route_lsh": """
+                CREATE TABLE IF NOT EXISTS route_lsh (
+                    band INTEGER,
+                    bucket INTEGER,
+                    id INTEGER,
+                    PRIMARY KEY (band, bucket, id)
+                ) WITHOUT ROWID
+            """,
+    # Activities a post-sync task has visited, including those it produced no rows for
+    "processed_activities": """
+                CREATE TABLE IF NOT EXISTS processed_activities (
+                    id INTEGER,
+                    task TEXT,
+                    PRIMARY KEY (id, task)
+                ) WITHOUT ROWID
+            """,
+}
+
+# Columns added after a table was first released, added to existing databases on startup
+ADDED_COLUMNS = {
+    "best_efforts": {"source": "TEXT DEFAULT 'strava'"},
+    "activities": {"start_lat": "REAL", "start_lng": "REAL"},
+    "gear": {"updated_at": "REAL", "activity_count": "INTEGER", "activity_distance": "REAL"},
+    "weather": {"source": "TEXT"},
+    "weather_hourly": {"source": "TEXT"},
+}
+
+# Fills start_lat/start_lng from the "lat, lng" text that older databases stored in lat_lng.
+# The "0, 0" and default-coordinate placeholders mean the activity had no GPS start.
+MIGRATE_LAT_LNG = """
+UPDATE activities SET
+    start_lat = CAST(substr(lat_lng, 1, instr(lat_lng, ',') - 1) AS REAL),
+    start_lng = CAST(substr(lat_lng, instr(lat_lng, ',') + 1) AS REAL)
+WHERE start_lat IS NULL AND instr(lat_lng, ',') > 0 AND lat_lng NOT IN ('0, 0', ?);
+"""
+
+GET_TABLE_COLUMNS = "PRAGMA table_info({table_name});"
+
+ADD_COLUMN = "ALTER TABLE {table_name} ADD COLUMN {column} {definition};"
+
+CREATE_ALL_INDEXES = {
+    "idx_weather_forecast": """
+                CREATE INDEX IF NOT EXISTS idx_weather_forecast
+                ON weather (date) WHERE source = 'forecast'
+            """,
+    "idx_power_curves_date": """
+                CREATE INDEX IF NOT EXISTS idx_power_curves_date
+                ON power_curves (metric, sport_type, date)
+            """,
+    "idx_power_curves_duration": """
+                CREATE INDEX IF NOT EXISTS idx_power_curves_duration
+                ON power_curves (metric, sport_type, duration, value)
+            """,
+    "idx_route_lsh_id": """
+                CREATE INDEX IF NOT EXISTS idx_route_lsh_id
+                ON route_lsh (id)
+            """,
+    "idx_sync_jobs_pending": """
+                CREATE INDEX IF NOT EXISTS idx_sync_jobs_pending
+                ON sync_jobs (status, priority, id)
+            """,
 }
 
 GET_WEATHER_PARAMS = (
-    "SELECT id, date, start_time, lat_lng FROM activities WHERE id = ?;"
+    "SELECT id, date, start_time, start_lat, start_lng FROM activities WHERE id = ?;"
 )
 
+GET_PENDING_WEATHER_JOBS = """
+SELECT a.id, a.date, a.start_time, a.start_lat, a.start_lng, a.indoor
+FROM sync_jobs j
+JOIN activities a ON a.id = j.id
+WHERE j.stage = 'weather' AND j.status = 'pending'
+ORDER BY a.id DESC;
+"""
+
+# Per-connection scratch table of the (cell, hour) each activity needs weather for
+CREATE_WEATHER_KEYS = """
+CREATE TEMP TABLE IF NOT EXISTS weather_keys (
+    id INTEGER PRIMARY KEY,
+    cell_lat REAL,
+    cell_lng REAL,
+    hour TEXT
+);
+"""
+
+CLEAR_WEATHER_KEYS = "DELETE FROM temp.weather_keys;"
+
+INSERT_WEATHER_KEY = "INSERT INTO temp.weather_keys (id, cell_lat, cell_lng, hour) VALUES (?, ?, ?, ?);"
+
+# One primary key lookup in weather_hourly per activity. Forecast hours on days before the
+# archive cutoff (YYYY-MM-DD) count as missing, so they are fetched again from the archive.
+GET_WEATHER_FOR_KEYS = """
+SELECT k.id, w.temperature, w.weather_code, w.precipitation, w.rain, w.wind_speed, w.snow, w.source
+FROM temp.weather_keys k
+JOIN weather_hourly w ON w.cell_lat = k.cell_lat AND w.cell_lng = k.cell_lng AND w.hour = k.hour
+WHERE NOT (w.source = 'forecast' AND w.hour < ?);
+"""
+
+# Activities answered from forecast hours that the archive now covers; failed jobs are left alone
+GET_FORECAST_WEATHER_IDS = """
+SELECT w.id FROM weather w
+JOIN sync_jobs j ON j.id = w.id AND j.stage = 'weather'
+WHERE w.source = 'forecast' AND w.date < ? AND j.status = 'done';
+"""
+
 ADD_WEATHER_DATA = """
 UPDATE activities
 SET temperature = ?, wind_speed = ?, snow = ?
@@ -128,10 +370,91 @@ INSERT_OR_IGNORE_QUERY = (
     "INSERT OR IGNORE INTO {table_name} ({columns}) VALUES ({placeholders})"
 )
 
+INSERT_OR_REPLACE_QUERY = (
+    "INSERT OR REPLACE INTO {table_name} ({columns}) VALUES ({placeholders})"
+)
+
+GET_SYNC_STATE = "SELECT value FROM sync_state WHERE key = ?;"
+
+SET_SYNC_STATE = "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?);"
+
+GET_LATEST_ACTIVITY_DATE = "SELECT MAX(date) FROM activities;"
+
+GET_ACTIVITIES_IDS_SINCE = "SELECT id FROM activities WHERE date >= ?;"
+
+GET_ACTIVITIES_IDS_AFTER = "SELECT id FROM activities WHERE date > ?;"
+
+DELETE_BY_ID = "DELETE FROM {table_name} WHERE {id_column} = ?;"
+
+# Tables keyed by activity id, and the column holding it, cleaned up when an activity is deleted on Strava
+ACTIVITY_TABLES = {
+    "activities": "id",
+    "best_efforts": "id",
+    "weather": "id",
+    "splits": "id",
+    "split_rows": "activity_id",
+    "lap_rows": "activity_id",
+    "zones": "id",
+    "streams": "id",
+    "sync_jobs": "id",
+    "power_curves": "id",
+    "route_fingerprints": "id",
+    "route_lsh": "id",
+    "processed_activities": "id",
+}
+
+ENQUEUE_SYNC_JOB = "INSERT OR IGNORE INTO sync_jobs (id, stage, priority) VALUES (?, ?, ?);"
+
+RESET_SYNC_JOB = """
+INSERT INTO sync_jobs (id, stage, priority) VALUES (?, ?, ?)
+ON CONFLICT (id, stage) DO UPDATE SET status = 'pending', attempts = 0, last_error = NULL;
+"""
+
+# Stages run in priority order; within a stage, newest activities (highest IDs) go first
+GET_PENDING_SYNC_JOBS = """
+SELECT id, stage FROM sync_jobs
+WHERE status = 'pending'
+ORDER BY priority, id DESC;
+"""
+
+COMPLETE_SYNC_JOB = """
+UPDATE sync_jobs SET status = 'done', last_error = NULL, updated_at = CURRENT_TIMESTAMP
+WHERE id = ? AND stage = ?;
+"""
+
+# A job that keeps failing is parked as 'failed' once it reaches the attempt limit
+FAIL_SYNC_JOB = """
+UPDATE sync_jobs SET
+    attempts = attempts + 1,
+    last_error = ?,
+    status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END,
+    updated_at = CURRENT_TIMESTAMP
+WHERE id = ? AND stage = ?;
+"""
+
+GET_SYNC_JOB_IDS = "SELECT DISTINCT id FROM sync_jobs;"
 
-GET_CACHED_IDS = "SELECT id FROM cache;"
+GET_SYNC_JOB_COUNTS = "SELECT stage, status, COUNT(*) FROM sync_jobs GROUP BY stage, status;"
 
-CLEAR_CACHE = "DELETE FROM cache;"
+CLEAR_SYNC_JOBS = "DELETE FROM sync_jobs;"
+
+# When a stage counts as done for activities synced before sync_jobs existed
+SYNC_STAGE_DONE_CHECKS = {
+    "detail": "EXISTS (SELECT 1 FROM splits t WHERE t.id = a.id)",
+    "zones": "EXISTS (SELECT 1 FROM zones t WHERE t.id = a.id)",
+    "gear": "a.gear_id IS NULL OR EXISTS (SELECT 1 FROM gear g WHERE g.gear_id = a.gear_id AND g.name IS NOT NULL)",
+    "weather": "a.start_lat IS NULL OR a.indoor OR EXISTS (SELECT 1 FROM weather t WHERE t.id = a.id)",
+    "streams": "EXISTS (SELECT 1 FROM streams t WHERE t.id = a.id)",
+}
+
+SEED_SYNC_JOBS = """
+INSERT OR IGNORE INTO sync_jobs (id, stage, status, priority)
+SELECT a.id, ?, CASE WHEN {done} THEN 'done' ELSE 'pending' END, ?
+FROM activities a
+WHERE NOT EXISTS (SELECT 1 FROM sync_jobs j WHERE j.id = a.id AND j.stage = ?);
+"""
+
+DROP_CACHE_TABLE = "DROP TABLE IF EXISTS cache;"
 
 GET_ROW_COUNT = "SELECT COUNT(*) FROM {table_name}"
 
@@ -140,3 +463,406 @@ GET_ZONES_IDS = "SELECT id FROM zones;"
 GET_SPLITS_IDS = "SELECT id FROM splits;"
 GET_STREAMS_IDS = "SELECT id FROM streams;"
 GET_BEST_EFFORTS_IDS = "SELECT id FROM best_efforts;"
+
+# Keyset-paginated so rows without any splits or laps are visited only once per backfill
+GET_SPLITS_WITHOUT_ROWS = """
+SELECT s.id, s.splits_metric, s.laps FROM splits s
+WHERE s.id > ?
+    AND NOT EXISTS (SELECT 1 FROM split_rows r WHERE r.activity_id = s.id)
+    AND NOT EXISTS (SELECT 1 FROM lap_rows r WHERE r.activity_id = s.id)
+    AND NOT EXISTS (SELECT 1 FROM processed_activities p WHERE p.id = s.id AND p.task = 'split_rows')
+ORDER BY s.id
+LIMIT ?;
+"""
+
+# Gear never fetched (placeholders) or last fetched before the given epoch time
+GET_STALE_GEAR_IDS = "SELECT gear_id FROM gear WHERE updated_at IS NULL OR updated_at < ?;"
+
+# Stamps gear whose fetch failed, so retired, deleted or foreign gear is only retried after the TTL
+STAMP_GEAR_UPDATED_AT = "UPDATE gear SET updated_at = ? WHERE gear_id = ?;"
+
+GET_PENDING_GEAR_JOBS = """
+SELECT j.id, a.gear_id
+FROM sync_jobs j
+JOIN activities a ON a.id = j.id
+WHERE j.stage = 'gear' AND j.status = 'pending';
+"""
+
+# Refreshes the details reported by Strava, leaving the mileage kept by the triggers alone.
+# Used as the query of insert_dataframe_to_db, with the columns in this order.
+UPSERT_GEAR = """
+INSERT INTO gear (gear_id, name, distance, brand_name, model_name, retired, weight, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (gear_id) DO UPDATE SET
+    name = excluded.name,
+    distance = excluded.distance,
+    brand_name = excluded.brand_name,
+    model_name = excluded.model_name,
+    retired = excluded.retired,
+    weight = excluded.weight,
+    updated_at = excluded.updated_at;
+"""
+
+GET_GEAR_MILEAGE = """
+SELECT gear_id, name, brand_name, model_name, retired, activity_count, activity_distance
+FROM gear
+ORDER BY activity_distance DESC;
+"""
+
+# Gear mileage is missing for databases created before the gear triggers existed
+GET_GEAR_MILEAGE_MISSING = """
+SELECT
+    (SELECT COUNT(*) FROM gear WHERE activity_count IS NULL)
+    + (SELECT COUNT(*) FROM activities a
+       WHERE a.gear_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM gear g WHERE g.gear_id = a.gear_id));
+"""
+
+REBUILD_GEAR_MILEAGE = [
+    "INSERT OR IGNORE INTO gear (gear_id) SELECT DISTINCT gear_id FROM activities WHERE gear_id IS NOT NULL;",
+    """
+    UPDATE gear SET
+        activity_count = (SELECT COUNT(*) FROM activities a WHERE a.gear_id = gear.gear_id),
+        activity_distance = (
+            SELECT COALESCE(SUM(a.distance), 0) FROM activities a WHERE a.gear_id = gear.gear_id
+        );
+    """,
+]
+
+STREAM_COLUMNS_SQL = "time, distance, latlng, altitude, speed, heartrate, cadence, watts"
+
+GET_STREAMS_BY_ID = f"SELECT {STREAM_COLUMNS_SQL} FROM streams WHERE id = ?;"
+
+# Rows written before streams were stored as binary arrays hold JSON text
+GET_JSON_STREAMS = f"""
+SELECT id, {STREAM_COLUMNS_SQL} FROM streams
+WHERE typeof(time) = 'text'
+LIMIT ?;
+"""
+
+UPDATE_STREAMS = """
+UPDATE streams
+SET time = ?, distance = ?, latlng = ?, altitude = ?, speed = ?, heartrate = ?, cadence = ?, watts = ?
+WHERE id = ?;
+"""
+
+# Ride and run activities with streams but no mean-maximal curve yet. Activities visited before
+# without a usable curve (no time, watts or speed stream) are recorded in processed_activities.
+GET_ACTIVITIES_WITHOUT_CURVES = """
+SELECT a.id, a.sport_type, a.date
+FROM activities a
+JOIN streams s ON s.id = a.id
+WHERE a.sport_type IN ('Ride', 'Run')
+  AND NOT EXISTS (SELECT 1 FROM power_curves p WHERE p.id = a.id)
+  AND NOT EXISTS (SELECT 1 FROM processed_activities m WHERE m.id = a.id AND m.task = 'power_curve');
+"""
+
+# Keeps the best value per (metric, sport_type, duration) as new curves arrive
+MERGE_POWER_CURVE_ENVELOPE = """
+INSERT INTO power_curve_envelope (metric, sport_type, duration, value, activity_id, date)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (metric, sport_type, duration) DO UPDATE SET
+    value = excluded.value,
+    activity_id = excluded.activity_id,
+    date = excluded.date
+WHERE excluded.value > power_curve_envelope.value;
+"""
+
+GET_POWER_CURVE_ENVELOPE = """
+SELECT duration, value, activity_id, date
+FROM power_curve_envelope
+WHERE metric = ? AND sport_type = ?
+ORDER BY duration;
+"""
+
+GET_ROLLING_POWER_CURVE = """
+SELECT duration, MAX(value)
+FROM power_curves
+WHERE metric = ? AND sport_type = ? AND date >= ?
+GROUP BY duration
+ORDER BY duration;
+"""
+
+CLEAR_POWER_CURVE_ENVELOPE = "DELETE FROM power_curve_envelope;"
+
+GET_ALL_POWER_CURVES = "SELECT metric, sport_type, duration, value, id, date FROM power_curves;"
+
+# best_efforts.id is TEXT: comparing it with the INTEGER activity id as text keeps its primary key
+# usable, where a bare `b.id = a.id` scans the whole table for every activity
+BEST_EFFORTS_ACTIVITY_ID = "CAST(a.id AS TEXT)"
+
+# Run activities with streams whose stream-derived best efforts were not computed yet. Databases
+# from before processed_activities count runs with stream rows as computed.
+GET_ACTIVITIES_WITHOUT_STREAM_EFFORTS = f"""
+SELECT a.id, a.date
+FROM activities a
+JOIN streams s ON s.id = a.id
+WHERE a.sport_type = 'Run'
+  AND NOT EXISTS (
+      SELECT 1 FROM processed_activities p WHERE p.id = a.id AND p.task = 'stream_best_efforts'
+  )
+  AND NOT EXISTS (
+      SELECT 1 FROM best_efforts b WHERE b.id = {BEST_EFFORTS_ACTIVITY_ID} AND b.source = 'stream'
+  );
+"""
+
+GET_ACTIVITY_LOADS_SINCE = """
+SELECT date, intensity, duration, average_heartrate
+FROM activities
+WHERE date >= ?;
+"""
+
+GET_FIRST_ACTIVITY_DATE = "SELECT MIN(date) FROM activities;"
+
+GET_LATEST_TRAINING_LOAD_DATE = "SELECT MAX(date) FROM training_load;"
+
+GET_TRAINING_LOAD_BEFORE = """
+SELECT ctl, atl
+FROM training_load
+WHERE date < ?
+ORDER BY date DESC
+LIMIT 1;
+"""
+
+DELETE_TRAINING_LOAD_SINCE = "DELETE FROM training_load WHERE date >= ?;"
+
+GET_TRAINING_LOAD_RANGE = """
+SELECT date, load, ctl, atl, tsb
+FROM training_load
+WHERE date BETWEEN ? AND ?
+ORDER BY date;
+"""
+
+# Period key of an activity date for each rollup granularity. Weeks are keyed by their Monday.
+ROLLUP_PERIODS = {
+    "week": "date({date}, 'weekday 0', '-6 days')",
+    "month": "strftime('%Y-%m', {date})",
+    "year": "strftime('%Y', {date})",
+}
+
+
+def _rollup_add(row: str, sign: str) -> str:
+    """Upserts that add (sign '+') or subtract (sign '-') one activity row to every rollup period."""
+    return "\n".join(
+        f"""
+        INSERT INTO activity_rollups
+            (period_type, period, sport_type, gear_id, activity_count, distance, duration, elevation_gain)
+        VALUES (
+            '{period_type}', {period.format(date=f"{row}.date")},
+            COALESCE({row}.sport_type, ''), COALESCE({row}.gear_id, ''),
+            {sign}1, {sign}COALESCE({row}.distance, 0), {sign}COALESCE({row}.duration, 0),
+            {sign}COALESCE({row}.elevation_gain, 0)
+        )
+        ON CONFLICT (period_type, period, sport_type, gear_id) DO UPDATE SET
+            activity_count = activity_count + excluded.activity_count,
+            distance = distance + excluded.distance,
+            duration = duration + excluded.duration,
+            elevation_gain = elevation_gain + excluded.elevation_gain;"""
+        for period_type, period in ROLLUP_PERIODS.items()
+    )
+
+
+# Triggers keep activity_rollups in step with activities inside the writing transaction.
+# REPLACE only fires the delete trigger with PRAGMA recursive_triggers on (see DATABASE_PRAGMAS).
+CREATE_ALL_TRIGGERS = {
+    "activities_rollup_insert": f"""
+                CREATE TRIGGER IF NOT EXISTS activities_rollup_insert
+                AFTER INSERT ON activities
+                BEGIN {_rollup_add("NEW", "")}
+                END
+            """,
+    "activities_rollup_delete": f"""
+                CREATE TRIGGER IF NOT EXISTS activities_rollup_delete
+                AFTER DELETE ON activities
+                BEGIN {_rollup_add("OLD", "-")}
+                    DELETE FROM activity_rollups WHERE activity_count <= 0;
+                END
+            """,
+    "activities_rollup_update": f"""
+                CREATE TRIGGER IF NOT EXISTS activities_rollup_update
+                AFTER UPDATE OF date, sport_type, gear_id, distance, duration, elevation_gain ON activities
+                BEGIN {_rollup_add("OLD", "-")} {_rollup_add("NEW", "")}
+                    DELETE FROM activity_rollups WHERE activity_count <= 0;
+                END
+            """,
+    # Gear mileage; unknown gear gets a placeholder row, which the gear sync then fills in
+    "activities_gear_insert": """
+                CREATE TRIGGER IF NOT EXISTS activities_gear_insert
+                AFTER INSERT ON activities
+                WHEN NEW.gear_id IS NOT NULL
+                BEGIN
+                    INSERT INTO gear (gear_id, activity_count, activity_distance)
+                    VALUES (NEW.gear_id, 1, COALESCE(NEW.distance, 0))
+                    ON CONFLICT (gear_id) DO UPDATE SET
+                        activity_count = activity_count + 1,
+                        activity_distance = activity_distance + excluded.activity_distance;
+                END
+            """,
+    "activities_gear_delete": """
+                CREATE TRIGGER IF NOT EXISTS activities_gear_delete
+                AFTER DELETE ON activities
+                WHEN OLD.gear_id IS NOT NULL
+                BEGIN
+                    UPDATE gear SET
+                        activity_count = activity_count - 1,
+                        activity_distance = activity_distance - COALESCE(OLD.distance, 0)
+                    WHERE gear_id = OLD.gear_id;
+                END
+            """,
+    "activities_gear_update": """
+                CREATE TRIGGER IF NOT EXISTS activities_gear_update
+                AFTER UPDATE OF gear_id, distance ON activities
+                BEGIN
+                    UPDATE gear SET
+                        activity_count = activity_count - 1,
+                        activity_distance = activity_distance - COALESCE(OLD.distance, 0)
+                    WHERE gear_id = OLD.gear_id;
+                    INSERT INTO gear (gear_id, activity_count, activity_distance)
+                    SELECT NEW.gear_id, 1, COALESCE(NEW.distance, 0)
+                    WHERE NEW.gear_id IS NOT NULL
+                    ON CONFLICT (gear_id) DO UPDATE SET
+                        activity_count = activity_count + 1,
+                        activity_distance = activity_distance + excluded.activity_distance;
+                END
+            """,
+    "activities_location_insert": """
+                CREATE TRIGGER IF NOT EXISTS activities_location_insert
+                AFTER INSERT ON activities
+                WHEN NEW.start_lat IS NOT NULL AND NEW.start_lng IS NOT NULL
+                BEGIN
+                    INSERT OR REPLACE INTO activity_locations
+                    VALUES (NEW.id, NEW.start_lat, NEW.start_lat, NEW.start_lng, NEW.start_lng);
+                END
+            """,
+    "activities_location_delete": """
+                CREATE TRIGGER IF NOT EXISTS activities_location_delete
+                AFTER DELETE ON activities
+                BEGIN
+                    DELETE FROM activity_locations WHERE id = OLD.id;
+                END
+            """,
+    "activities_location_update": """
+                CREATE TRIGGER IF NOT EXISTS activities_location_update
+                AFTER UPDATE OF start_lat, start_lng ON activities
+                BEGIN
+                    DELETE FROM activity_locations WHERE id = OLD.id;
+                    INSERT INTO activity_locations
+                    SELECT NEW.id, NEW.start_lat, NEW.start_lat, NEW.start_lng, NEW.start_lng
+                    WHERE NEW.start_lat IS NOT NULL AND NEW.start_lng IS NOT NULL;
+                END
+            """,
+    # Deleting the curve that holds an envelope value hands it to the next best remaining curve
+    "power_curves_envelope_delete": """
+                CREATE TRIGGER IF NOT EXISTS power_curves_envelope_delete
+                AFTER DELETE ON power_curves
+                WHEN EXISTS (
+                    SELECT 1 FROM power_curve_envelope e
+                    WHERE e.metric = OLD.metric AND e.sport_type = OLD.sport_type
+                      AND e.duration = OLD.duration AND e.activity_id = OLD.id
+                )
+                BEGIN
+                    DELETE FROM power_curve_envelope
+                    WHERE metric = OLD.metric AND sport_type = OLD.sport_type AND duration = OLD.duration;
+                    INSERT INTO power_curve_envelope (metric, sport_type, duration, value, activity_id, date)
+                    SELECT metric, sport_type, duration, value, id, date FROM power_curves
+                    WHERE metric = OLD.metric AND sport_type = OLD.sport_type AND duration = OLD.duration
+                    ORDER BY value DESC
+                    LIMIT 1;
+                END
+            """,
+}
+
+CLEAR_ROLLUPS = "DELETE FROM activity_rollups;"
+
+REBUILD_ROLLUPS = """
+INSERT INTO activity_rollups
+    (period_type, period, sport_type, gear_id, activity_count, distance, duration, elevation_gain)
+SELECT
+    '{period_type}', {period}, COALESCE(sport_type, ''), COALESCE(gear_id, ''),
+    COUNT(*), SUM(COALESCE(distance, 0)), SUM(COALESCE(duration, 0)), SUM(COALESCE(elevation_gain, 0))
+FROM activities
+GROUP BY 2, 3, 4;
+"""
+
+GET_ROLLUPS = """
+SELECT period, sport_type, gear_id, activity_count, distance, duration, elevation_gain
+FROM activity_rollups
+WHERE period_type = ? AND period BETWEEN ? AND ?
+ORDER BY period, sport_type, gear_id;
+"""
+
+# Activities visited before without a usable route (too short, or no valid latlng) are recorded
+# in processed_activities, so their streams are not decoded again
+GET_ACTIVITIES_WITHOUT_ROUTES = """
+SELECT s.id FROM streams s
+WHERE s.latlng IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM route_fingerprints r WHERE r.id = s.id)
+  AND NOT EXISTS (SELECT 1 FROM processed_activities p WHERE p.id = s.id AND p.task = 'route');
+"""
+
+GET_ROUTE_FINGERPRINT = "SELECT length_km, polyline FROM route_fingerprints WHERE id = ?;"
+
+# Activities sharing at least one (band, bucket) pair with the query route; one primary key
+# lookup per pair
+GET_ROUTE_CANDIDATES = """
+WITH query (band, bucket) AS (VALUES {pairs})
+SELECT DISTINCT l.id FROM query q
+JOIN route_lsh l ON l.band = q.band AND l.bucket = q.bucket;
+"""
+
+GET_ROUTE_FINGERPRINTS = """
+SELECT r.id, a.name, a.date, a.sport_type, r.length_km, r.polyline
+FROM route_fingerprints r
+JOIN activities a ON a.id = r.id
+WHERE r.id IN ({placeholders});
+"""
+
+CLEAR_ROUTE_FINGERPRINTS = "DELETE FROM route_fingerprints;"
+CLEAR_ROUTE_LSH = "DELETE FROM route_lsh;"
+CLEAR_ROUTE_MARKERS = "DELETE FROM processed_activities WHERE task = 'route';"
+
+CLEAR_ACTIVITY_LOCATIONS = "DELETE FROM activity_locations;"
+
+REBUILD_ACTIVITY_LOCATIONS = """
+INSERT INTO activity_locations
+SELECT id, start_lat, start_lat, start_lng, start_lng FROM activities
+WHERE start_lat IS NOT NULL AND start_lng IS NOT NULL;
+"""
+
+GET_UNINDEXED_LOCATION_COUNT = """
+SELECT COUNT(*) FROM activities a
+WHERE a.start_lat IS NOT NULL AND a.start_lng IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM activity_locations l WHERE l.id = a.id);
+"""
+
+# The R*Tree stores float32 boxes rounded outwards, so candidates are re-checked against the
+# exact REAL coordinates
+GET_ACTIVITIES_IN_BOX = """
+SELECT a.id, a.name, a.date, a.sport_type, a.distance, a.start_lat, a.start_lng
+FROM activity_locations l
+JOIN activities a ON a.id = l.id
+WHERE l.max_lat >= :min_lat AND l.min_lat <= :max_lat
+    AND l.max_lng >= :min_lng AND l.min_lng <= :max_lng
+    AND a.start_lat BETWEEN :min_lat AND :max_lat
+    AND a.start_lng BETWEEN :min_lng AND :max_lng;
+"""
+
+# Pieces every activity is expected to have: table holding it, and which activities need it
+DISCREPANCY_CHECKS = {
+    "sync_jobs": ("sync_jobs", "1"),
+    "splits": ("splits", "1"),
+    "zones": ("zones", "a.average_heartrate IS NOT NULL OR a.average_watts IS NOT NULL"),
+    "best_efforts": ("best_efforts", "a.sport_type = 'Run'"),
+    "streams": ("streams", "1"),
+    "weather": ("weather", "a.start_lat IS NOT NULL AND NOT a.indoor"),
+}
+
+# One pass over activities with an indexed anti-join per piece; a row per piece an activity lacks
+GET_DISCREPANCIES = "\nUNION ALL\n".join(
+    f"""SELECT '{piece}', a.id FROM activities a
+WHERE ({condition}) AND NOT EXISTS (
+    SELECT 1 FROM {table_name} t
+    WHERE t.id = {BEST_EFFORTS_ACTIVITY_ID if table_name == "best_efforts" else "a.id"}
+)"""
+    for piece, (table_name, condition) in DISCREPANCY_CHECKS.items()
+) + ";"
+
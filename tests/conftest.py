@@ -0,0 +1,30 @@
+# tests/conftest.py
+import pytest
+from src.db import DatabaseManager
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """A DatabaseManager on an empty database with the full schema."""
+    manager = DatabaseManager(str(tmp_path / "test.db"))
+    manager.create_all_tables()
+    yield manager
+    manager.close()
+
+
+def insert_activity(db_manager, activity_id: int, **columns) -> None:
+    """Inserts an activity row with sensible defaults for the columns not given."""
+    row = {
+        "id": activity_id,
+        "name": f"Activity {activity_id}",
+        "date": "2024-05-01",
+        "sport_type": "Run",
+        "indoor": 0,
+        "distance": 10000.0,
+        "duration": 3000.0,
+        **columns,
+    }
+    placeholders = ", ".join("?" for _ in row)
+    db_manager.execute_query(
+        f"INSERT INTO activities ({', '.join(row)}) VALUES ({placeholders});", tuple(row.values())
+    )
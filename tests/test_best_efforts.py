@@ -0,0 +1,74 @@
+# tests/test_best_efforts.py
+import numpy as np
+import pytest
+
+from conftest import insert_activity
+from src.models.best_efforts import BestEfforts
+from src.models.streams import Streams
+from src.queries import GET_ACTIVITIES_WITHOUT_STREAM_EFFORTS
+
+
+def reference_fastest_segment(distance, time, target):
+    """Quadratic reference: from every start, walk to the first sample `target` meters on."""
+    best = None
+    for i in range(len(distance)):
+        for j in range(i, len(distance)):
+            if distance[j] >= distance[i] + target:
+                prev = max(j - 1, i)
+                span = distance[j] - distance[prev]
+                fraction = (distance[i] + target - distance[prev]) / span if span > 0 else 1.0
+                elapsed = time[prev] + fraction * (time[j] - time[prev]) - time[i]
+                best = elapsed if best is None else min(best, elapsed)
+                break
+    return best
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fastest_segment_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    steps = rng.uniform(0, 6, 400)
+    steps[rng.random(400) < 0.1] = 0  # Standing still repeats distances
+    distance = np.cumsum(steps)
+    time = np.cumsum(rng.uniform(0.5, 2, 400))
+
+    for target in (50.0, 400.0, 1000.0):
+        assert BestEfforts.fastest_segment(distance, time, target) == pytest.approx(
+            reference_fastest_segment(distance, time, target)
+        )
+    assert BestEfforts.fastest_segment(distance, time, distance[-1] + 1) is None
+
+
+def add_run_with_streams(db_manager, activity_id: int, meters: float) -> None:
+    insert_activity(db_manager, activity_id)
+    samples = np.arange(0, int(meters) + 1, 5)
+    response = {
+        "distance": {"data": samples.tolist()},
+        "time": {"data": (samples / 4).tolist()},
+    }
+    db_manager.insert_dataframe_to_db(
+        df=Streams.process_streams(activity_id, response), table_name="streams"
+    )
+
+
+def test_pending_runs_query_searches_best_efforts_by_key(db_manager):
+    plan = [row[3] for row in db_manager.execute_query(f"EXPLAIN QUERY PLAN {GET_ACTIVITIES_WITHOUT_STREAM_EFFORTS}")]
+
+    assert not [step for step in plan if step.startswith("SCAN b") or step.startswith("SCAN p")], plan
+
+
+def test_runs_are_computed_once(db_manager):
+    add_run_with_streams(db_manager, 1, 1200)
+    add_run_with_streams(db_manager, 2, 1200)
+    # Strava already reported every configured distance of run 2
+    for name in ("400m", "1K"):
+        db_manager.execute_query(
+            "INSERT INTO best_efforts (id, name, time) VALUES (2, ?, 100);", (name,)
+        )
+    distances = {"400m": 400, "1K": 1000}
+
+    assert BestEfforts.process_new_stream_best_efforts(db_manager, distances) == 2
+    assert db_manager.execute_query(
+        "SELECT id, name, time FROM best_efforts WHERE source = 'stream' ORDER BY name;"
+    ) == [("1", "1K", 250), ("1", "400m", 100)]
+    assert db_manager.execute_query(GET_ACTIVITIES_WITHOUT_STREAM_EFFORTS) == []
+    assert BestEfforts.process_new_stream_best_efforts(db_manager, distances) == 0
@@ -0,0 +1,56 @@
+# tests/test_discrepancies.py
+from conftest import insert_activity
+from src.queries import GET_DISCREPANCIES
+
+
+def add_children(db_manager, activity_id: int, best_efforts: bool = True) -> None:
+    db_manager.execute_query(
+        "INSERT INTO sync_jobs (id, stage, status) VALUES (?, 'detail', 'done');", (activity_id,)
+    )
+    db_manager.execute_query("INSERT INTO splits (id) VALUES (?);", (activity_id,))
+    db_manager.execute_query("INSERT INTO streams (id) VALUES (?);", (activity_id,))
+    if best_efforts:
+        db_manager.execute_query(
+            "INSERT INTO best_efforts (id, name, time) VALUES (?, '5k', 1200);", (activity_id,)
+        )
+
+
+def test_every_anti_join_searches_an_index(db_manager):
+    plan = [row[3] for row in db_manager.execute_query(f"EXPLAIN QUERY PLAN {GET_DISCREPANCIES}")]
+    child_steps = [step for step in plan if " t " in f"{step} "]
+
+    assert len(child_steps) == 6
+    assert all(step.startswith("SEARCH t USING") for step in child_steps), plan
+    assert all(step == "SCAN a" for step in plan if step.startswith("SCAN"))
+
+
+def test_report_lists_missing_pieces(db_manager):
+    insert_activity(db_manager, 1)
+    add_children(db_manager, 1)
+    insert_activity(db_manager, 2)
+    add_children(db_manager, 2, best_efforts=False)
+    insert_activity(db_manager, 3, sport_type="Ride")
+    add_children(db_manager, 3, best_efforts=False)
+    insert_activity(db_manager, 4, average_heartrate=150.0, start_lat=52.1, start_lng=5.1)
+
+    report = db_manager.check_discrepancies()
+
+    assert report == {
+        "sync_jobs": [4],
+        "splits": [4],
+        "zones": [4],
+        "best_efforts": [2, 4],
+        "streams": [4],
+        "weather": [4],
+    }
+
+
+def test_repair_requeues_the_stages_of_missing_pieces(db_manager):
+    insert_activity(db_manager, 1)
+    add_children(db_manager, 1, best_efforts=False)
+
+    db_manager.check_discrepancies(repair=True)
+
+    assert db_manager.execute_query("SELECT stage, status FROM sync_jobs WHERE id = 1;") == [
+        ("detail", "pending")
+    ]
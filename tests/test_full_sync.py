@@ -0,0 +1,64 @@
+# tests/test_full_sync.py
+import pandas as pd
+import pytest
+
+import main
+from benchmarks.synthetic import SyntheticAthlete
+from conftest import insert_activity
+
+
+class ListingClient:
+    """Serves a fixed activity listing, like a StravaClient whose pagination stopped after it."""
+
+    def __init__(self, pages: list):
+        self.pages = pages
+
+    def iter_activity_pages(self, per_page=200, after=None):
+        yield from self.pages
+
+
+@pytest.fixture
+def listed_db(db_manager, monkeypatch):
+    """A database synced from one listing page of five activities, plus three unlisted ones."""
+    monkeypatch.setattr(main, "db_manager", db_manager, raising=False)
+    monkeypatch.setattr(main, "run_sync_jobs", lambda: None)
+    monkeypatch.setattr(main.Gear, "sync_gear", staticmethod(lambda *args, **kwargs: 0))
+    monkeypatch.setattr(main.Weather, "process_weather_jobs", staticmethod(lambda *args, **kwargs: 0))
+    monkeypatch.setattr(main, "ACTIVITY_PAGE_SIZE", 5)
+
+    page = SyntheticAthlete(12).list_activities(page=1, per_page=5)
+    monkeypatch.setattr(main, "strava_client", ListingClient([page]), raising=False)
+    main.main(full_sync=True)
+
+    boundary = db_manager.execute_query("SELECT MIN(date) FROM activities;")[0][0]
+    day = pd.Timedelta(days=1)
+    insert_activity(db_manager, 900, date=boundary)
+    insert_activity(db_manager, 901, date=(pd.Timestamp(boundary) + day).strftime("%Y-%m-%d"))
+    insert_activity(db_manager, 902, date=(pd.Timestamp(boundary) - day).strftime("%Y-%m-%d"))
+    return db_manager
+
+
+def stored_ids(db_manager) -> set:
+    return {row[0] for row in db_manager.execute_query("SELECT id FROM activities;")}
+
+
+def test_listing_ending_on_a_full_page_keeps_its_oldest_day(listed_db):
+    main.main(full_sync=True)
+
+    ids = stored_ids(listed_db)
+    assert 900 in ids  # May be on the page that was never fetched
+    assert 901 not in ids
+    assert 902 in ids
+    assert len(ids) == 7
+
+
+def test_complete_listing_deletes_unlisted_activities_of_its_oldest_day(listed_db, monkeypatch):
+    monkeypatch.setattr(main, "ACTIVITY_PAGE_SIZE", 6)
+
+    main.main(full_sync=True)
+
+    ids = stored_ids(listed_db)
+    assert 900 not in ids
+    assert 901 not in ids
+    assert 902 in ids
+    assert len(ids) == 6
@@ -0,0 +1,34 @@
+# tests/test_gear.py
+from conftest import insert_activity
+from src.models.gear import Gear
+
+
+class GearClient:
+    """Serves details for `known` gear IDs and nothing for any other, counting the requests."""
+
+    def __init__(self, known):
+        self.known = known
+        self.requests = []
+
+    def get_gear_details(self, gear_id):
+        self.requests.append(gear_id)
+        if gear_id not in self.known:
+            return None
+        return {"name": gear_id, "distance": 0, "brand_name": "", "model_name": "", "retired": False}
+
+
+def test_gear_that_cannot_be_fetched_waits_for_the_ttl(db_manager):
+    # The activity triggers add a placeholder row for each gear ID
+    insert_activity(db_manager, 1, gear_id="g1")
+    insert_activity(db_manager, 2, gear_id="gone")
+    client = GearClient(known={"g1"})
+
+    assert Gear.sync_gear(db_manager, client) == 1
+    assert sorted(client.requests) == ["g1", "gone"]
+
+    client.requests.clear()
+    assert Gear.sync_gear(db_manager, client) == 0
+    assert client.requests == []
+
+    assert Gear.sync_gear(db_manager, client, ttl_hours=0) == 1
+    assert sorted(client.requests) == ["g1", "gone"]
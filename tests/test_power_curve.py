@@ -0,0 +1,80 @@
+# tests/test_power_curve.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import insert_activity
+from src.models.power_curve import PowerCurve
+from src.models.streams import Streams
+from src.queries import GET_ACTIVITIES_WITHOUT_CURVES
+
+
+def test_resample_holds_the_latest_sample_through_short_gaps():
+    time = np.array([100, 101, 103, 104, 107])
+    values = np.array([10, 20, 30, 40, 50])
+
+    resampled = PowerCurve.resample_to_seconds(time, values)
+
+    np.testing.assert_array_equal(resampled, [10, 20, 20, 30, 40, 40, 40, 50])
+
+
+def test_resample_zeroes_long_gaps_and_missing_samples():
+    time = np.array([0, 1, 2, 10, 11])
+    values = np.array([100.0, np.nan, -1, 200, 300])
+
+    resampled = PowerCurve.resample_to_seconds(time, values, max_gap=5)
+
+    # Second 2 is a sample; seconds 3-9 fall inside the 8-second gap that follows it
+    np.testing.assert_array_equal(resampled, [100, 0, 0, 0, 0, 0, 0, 0, 0, 0, 200, 300])
+
+
+def test_mean_maximal_matches_brute_force():
+    values = np.random.default_rng(0).uniform(0, 400, 500)
+    durations = [1, 7, 60, 500, 501]
+
+    curve = PowerCurve.mean_maximal(values, durations)
+
+    assert list(curve) == [1, 7, 60, 500]
+    for duration, value in curve.items():
+        best = max(values[i : i + duration].mean() for i in range(len(values) - duration + 1))
+        assert value == pytest.approx(best)
+
+
+def add_curve(db_manager, activity_id: int, watts: float) -> None:
+    insert_activity(db_manager, activity_id, sport_type="Ride", date=f"2024-05-0{activity_id}")
+    curves_df = pd.DataFrame(
+        [[activity_id, "Ride", f"2024-05-0{activity_id}", "watts", duration, watts] for duration in (1, 60)],
+        columns=["id", "sport_type", "date", "metric", "duration", "value"],
+    )
+    db_manager.insert_dataframe_to_db(df=curves_df, table_name="power_curves")
+    PowerCurve.update_envelope(db_manager, curves_df)
+
+
+def test_deleting_the_best_activity_falls_back_to_the_next_best(db_manager):
+    add_curve(db_manager, 1, 300)
+    add_curve(db_manager, 2, 350)
+    add_curve(db_manager, 3, 250)
+
+    db_manager.delete_activities([2])
+
+    envelope = PowerCurve.get_envelope(db_manager, "watts", "Ride")
+    assert envelope["activity_id"].tolist() == [1, 1]
+    assert envelope["value"].tolist() == [300, 300]
+
+    db_manager.delete_activities([1, 3])
+    assert PowerCurve.get_envelope(db_manager, "watts", "Ride").empty
+
+
+def test_activities_without_a_curve_are_visited_once(db_manager):
+    for activity_id, response in [
+        (1, {"time": {"data": list(range(120))}, "watts": {"data": [200] * 120}}),
+        (2, {"time": {"data": list(range(120))}, "heartrate": {"data": [140] * 120}}),
+        (3, {"time": {"data": [0]}, "watts": {"data": [200]}}),
+    ]:
+        insert_activity(db_manager, activity_id, sport_type="Ride")
+        db_manager.insert_dataframe_to_db(
+            df=Streams.process_streams(activity_id, response), table_name="streams"
+        )
+
+    assert PowerCurve.process_new_curves(db_manager) == 1
+    assert db_manager.execute_query(GET_ACTIVITIES_WITHOUT_CURVES) == []
@@ -0,0 +1,132 @@
+# tests/test_rate_limiter.py
+import threading
+
+import pytest
+
+from src.api import rate_limiter
+from src.api.rate_limiter import RateLimiter, RateLimitExhausted
+
+# Start of a 15-minute window, four hours into a UTC day
+WINDOW_START = 20 * 24 * 60 * 60 + 4 * 60 * 60
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() advances time() instead of blocking."""
+
+    def __init__(self, now: float, advance: bool = True):
+        self.now = now
+        self.advance = advance
+        self.sleeps = []
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.sleeps.append(seconds)
+            if self.advance:
+                self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock(WINDOW_START)
+    monkeypatch.setattr(rate_limiter, "time", fake_clock)
+    return fake_clock
+
+
+def test_requests_are_paced_over_the_window(clock):
+    limiter = RateLimiter(short_limit=4, daily_limit=1000)
+
+    waits = [limiter.acquire() for _ in range(4)]
+
+    # The remaining tokens are spread over the time left in the window
+    assert waits == [0.0, 300.0, 300.0, 300.0]
+    assert clock.now == WINDOW_START + 900
+    assert limiter.total_wait == 900.0
+
+
+def test_concurrent_workers_get_distinct_slots(monkeypatch):
+    frozen_clock = FakeClock(WINDOW_START, advance=False)
+    monkeypatch.setattr(rate_limiter, "time", frozen_clock)
+    limiter = RateLimiter(short_limit=4, daily_limit=1000)
+
+    workers = [threading.Thread(target=limiter.acquire) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(frozen_clock.sleeps) == [300.0, 600.0, 900.0]
+    assert limiter.in_flight == 4
+
+
+def test_spent_short_window_waits_for_the_next_one(clock):
+    limiter = RateLimiter(short_limit=100, daily_limit=1000)
+    limiter.acquire()
+
+    limiter.throttled()
+
+    assert limiter.acquire() == 900.0
+    assert limiter.short.reset_at == WINDOW_START + 2 * 900
+
+
+def test_spent_daily_budget_raises_and_saves_state(clock, tmp_path):
+    state_path = tmp_path / "rate_limit_state.json"
+    limiter = RateLimiter(short_limit=1000, daily_limit=2, state_path=str(state_path))
+    limiter.acquire()
+    limiter.acquire()
+
+    with pytest.raises(RateLimitExhausted) as exhausted:
+        limiter.acquire()
+
+    next_midnight = WINDOW_START - 4 * 60 * 60 + 24 * 60 * 60
+    assert exhausted.value.reset_at == next_midnight
+    assert state_path.exists()
+
+
+def test_headers_reseed_both_buckets(clock):
+    limiter = RateLimiter(short_limit=100, daily_limit=1000)
+    limiter.acquire()
+    limiter.acquire()
+
+    # One request is still in flight when the first response arrives
+    limiter.update({"X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "150,1200"})
+
+    assert limiter.in_flight == 1
+    assert (limiter.short.limit, limiter.short.tokens) == (200, 49.0)
+    assert (limiter.daily.limit, limiter.daily.tokens) == (2000, 799.0)
+
+    # Without a limit header the known limits are kept
+    limiter.update({"X-RateLimit-Usage": "160,1210"})
+    assert limiter.in_flight == 0
+    assert (limiter.short.limit, limiter.short.tokens) == (200, 40.0)
+    assert (limiter.daily.limit, limiter.daily.tokens) == (2000, 790.0)
+
+
+def test_headers_without_usage_only_release(clock):
+    limiter = RateLimiter(short_limit=100, daily_limit=1000)
+    limiter.acquire()
+
+    limiter.update({})
+
+    assert limiter.in_flight == 0
+    assert limiter.short.tokens == 99.0
+
+
+def test_saved_state_resumes_until_its_window_resets(clock, tmp_path):
+    state_path = str(tmp_path / "rate_limit_state.json")
+    limiter = RateLimiter(short_limit=100, daily_limit=1000, state_path=state_path)
+    limiter.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "30,600"})
+    limiter.save_state()
+
+    resumed = RateLimiter(short_limit=100, daily_limit=1000, state_path=state_path)
+    assert resumed.short.tokens == 70.0
+    assert resumed.daily.tokens == 400.0
+
+    # After the 15-minute boundary only the daily budget carries over
+    clock.now += 900
+    after_reset = RateLimiter(short_limit=100, daily_limit=1000, state_path=state_path)
+    assert after_reset.short.tokens == 100.0
+    assert after_reset.daily.tokens == 400.0
@@ -0,0 +1,98 @@
+# tests/test_route.py
+import numpy as np
+import pytest
+
+from conftest import insert_activity
+from src.models.route import Route
+from src.models.streams import Streams
+from src.queries import GET_ACTIVITIES_WITHOUT_ROUTES
+
+METERS_PER_DEGREE = 111_195
+
+
+def reference_frechet(p, q):
+    """Textbook discrete Fréchet distance: the row-by-row dynamic program of Eiter and Mannila."""
+    d = np.linalg.norm(p[:, None, :] - q[None, :, :], axis=-1)
+    ca = np.full(d.shape, np.inf)
+    for i in range(len(p)):
+        for j in range(len(q)):
+            if i == 0 and j == 0:
+                reach = 0.0
+            else:
+                reach = min(
+                    ca[i - 1, j] if i > 0 else np.inf,
+                    ca[i, j - 1] if j > 0 else np.inf,
+                    ca[i - 1, j - 1] if i > 0 and j > 0 else np.inf,
+                )
+            ca[i, j] = max(reach, d[i, j])
+    return ca[-1, -1]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_discrete_frechet_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    query = np.cumsum(rng.normal(0, 50, (30, 2)), axis=0)
+    candidates = np.stack(
+        [query + rng.normal(0, 20, query.shape)]
+        + [np.cumsum(rng.normal(0, 50, (30, 2)), axis=0) for _ in range(4)]
+    )
+
+    expected = [reference_frechet(query, candidate) for candidate in candidates]
+
+    assert Route.discrete_frechet(query, candidates) == pytest.approx(expected)
+
+
+def random_route(rng, points: int = 600, step_m: float = 10.0) -> np.ndarray:
+    """A smooth random walk of about points * step_m meters near London, as (lat, lng) rows."""
+    heading = np.cumsum(rng.normal(0, 0.15, points))
+    start = np.array([51.5, -0.1]) + rng.uniform(-0.3, 0.3, 2)
+    north = np.cumsum(step_m * np.cos(heading)) / METERS_PER_DEGREE
+    east = np.cumsum(step_m * np.sin(heading)) / (METERS_PER_DEGREE * np.cos(np.radians(start[0])))
+    return start + np.column_stack([north, east])
+
+
+def with_gps_noise(rng, latlng: np.ndarray, sigma_m: float = 5.0) -> np.ndarray:
+    return latlng + rng.normal(0, sigma_m / METERS_PER_DEGREE, latlng.shape)
+
+
+def test_lsh_candidates_recall_repeated_routes(db_manager):
+    rng = np.random.default_rng(7)
+    routes = [random_route(rng) for _ in range(40)]
+    Route.store_fingerprints(
+        db_manager, [(activity_id, *Route.fingerprint(latlng)) for activity_id, latlng in enumerate(routes)]
+    )
+
+    recalled = 0
+    stray = 0
+    for activity_id, latlng in enumerate(routes):
+        _, _, signature = Route.fingerprint(with_gps_noise(rng, latlng))
+        candidates = set(Route.find_candidates(db_manager, signature))
+        recalled += activity_id in candidates
+        stray += len(candidates - {activity_id})
+
+    assert recalled / len(routes) >= 0.95
+    # Routes spread over 60 km rarely share cells, so few other routes come back as candidates
+    assert stray / len(routes) < 1
+
+
+def add_streams(db_manager, activity_id: int, latlng) -> None:
+    insert_activity(db_manager, activity_id)
+    response = {"latlng": {"data": latlng.tolist()}} if latlng is not None else {}
+    response["time"] = {"data": list(range(10))}
+    db_manager.insert_dataframe_to_db(
+        df=Streams.process_streams(activity_id, response), table_name="streams"
+    )
+
+
+def test_activities_without_route_are_visited_once(db_manager):
+    rng = np.random.default_rng(3)
+    add_streams(db_manager, 1, random_route(rng))
+    add_streams(db_manager, 2, random_route(rng, points=5))  # 50 m, too short to be a route
+    add_streams(db_manager, 3, np.full((100, 2), 51.5))  # standing still
+
+    assert Route.process_new_fingerprints(db_manager) == 1
+    assert db_manager.execute_query(GET_ACTIVITIES_WITHOUT_ROUTES) == []
+
+    Route.rebuild_index(db_manager)
+    assert Route.get_polyline(db_manager, 1) is not None
+    assert db_manager.execute_query(GET_ACTIVITIES_WITHOUT_ROUTES) == []
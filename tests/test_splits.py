@@ -0,0 +1,27 @@
+# tests/test_splits.py
+import json
+
+import pandas as pd
+
+from conftest import insert_activity
+from src.models.splits import Splits
+from src.queries import GET_SPLITS_WITHOUT_ROWS
+
+
+def test_backfill_visits_each_activity_once(db_manager):
+    split = {"split": 1, "distance": 1000.0, "elapsed_time": 300, "moving_time": 295}
+    splits_df = pd.DataFrame(
+        [
+            {"id": 1, "splits_metric": json.dumps([split]), "laps": "[]"},
+            {"id": 2, "splits_metric": "[]", "laps": "[]"},  # Nothing to backfill
+        ]
+    )
+    for activity_id in splits_df["id"]:
+        insert_activity(db_manager, int(activity_id))
+    db_manager.insert_dataframe_to_db(df=splits_df, table_name="splits")
+
+    assert Splits.backfill_rows(db_manager) == 2
+    assert db_manager.execute_query("SELECT activity_id, split_index FROM split_rows;") == [(1, 1)]
+
+    assert Splits.backfill_rows(db_manager) == 0
+    assert db_manager.execute_query(GET_SPLITS_WITHOUT_ROWS, (0, 10)) == []
@@ -0,0 +1,35 @@
+# tests/test_stream_store.py
+import numpy as np
+
+from conftest import insert_activity
+from src.models.stream_store import StreamStore
+from src.models.streams import Streams
+
+
+def add_streams(db_manager, activity_id: int, response: dict) -> None:
+    insert_activity(db_manager, activity_id)
+    db_manager.insert_dataframe_to_db(
+        df=Streams.process_streams(activity_id, response), table_name="streams"
+    )
+
+
+def test_sync_from_db_appends_each_activity_once(db_manager, tmp_path):
+    add_streams(db_manager, 1, {"time": {"data": [0, 1, 2]}, "heartrate": {"data": [120, 121, 122]}})
+    add_streams(db_manager, 2, {})  # A streams row without any stream
+
+    store = StreamStore(str(tmp_path / "store"))
+    try:
+        assert store.sync_from_db(db_manager) == 2
+        assert store.sync_from_db(db_manager) == 0
+
+        np.testing.assert_array_equal(store.get(1, "heartrate"), [120, 121, 122])
+        assert store.get(2, "time") is None
+        assert store.get_activity_ids() == {1}
+    finally:
+        store.close()
+
+    reopened = StreamStore(str(tmp_path / "store"))
+    try:
+        assert reopened.sync_from_db(db_manager) == 0
+    finally:
+        reopened.close()
@@ -0,0 +1,81 @@
+# tests/test_sync_batch.py
+import pandas as pd
+import pytest
+
+import main
+from conftest import insert_activity
+from src.api.rate_limiter import RateLimitExhausted
+
+
+@pytest.fixture
+def sync_db(db_manager, monkeypatch):
+    monkeypatch.setattr(main, "db_manager", db_manager, raising=False)
+    for activity_id in (1, 2):
+        insert_activity(db_manager, activity_id)
+    db_manager.enqueue_sync_jobs([1, 2], ["detail", "streams"])
+    return db_manager
+
+
+def job_states(db_manager) -> dict:
+    rows = db_manager.execute_query("SELECT id, stage, status, attempts FROM sync_jobs;")
+    return {(activity_id, stage): (status, attempts) for activity_id, stage, status, attempts in rows}
+
+
+def test_batch_stores_frames_and_completes_jobs(sync_db):
+    results = [
+        (1, "detail", {"splits": pd.DataFrame([{"id": 1, "splits_metric": "[]", "laps": "[]"}])}),
+        (2, "detail", {"splits": pd.DataFrame([{"id": 2, "splits_metric": "[]", "laps": "[]"}])}),
+    ]
+    failed = [(1, "streams", "No data received")]
+
+    main.write_sync_batch(results, failed)
+
+    assert sync_db.get_row_count("splits") == 2
+    states = job_states(sync_db)
+    assert states[(1, "detail")] == ("done", 0)
+    assert states[(2, "detail")] == ("done", 0)
+    assert states[(1, "streams")] == ("pending", 1)
+    assert results == [] and failed == []
+
+
+def test_failed_insert_fails_its_job_instead_of_completing_it(sync_db):
+    results = [
+        (1, "detail", {"splits": pd.DataFrame([{"id": 1, "splits_metric": "[]", "laps": "[]"}])}),
+        # An unknown column makes this job's insert fail
+        (2, "detail", {"splits": pd.DataFrame([{"id": 2, "no_such_column": 1}])}),
+    ]
+
+    main.write_sync_batch(results, [(2, "streams", "No data received")])
+
+    assert sync_db.execute_query("SELECT id FROM splits;") == [(1,)]
+    states = job_states(sync_db)
+    assert states[(1, "detail")] == ("done", 0)
+    assert states[(2, "detail")] == ("pending", 1)
+    assert states[(2, "streams")] == ("pending", 1)
+    assert "Error storing data" in sync_db.execute_query(
+        "SELECT last_error FROM sync_jobs WHERE id = 2 AND stage = 'detail';"
+    )[0][0]
+
+
+def test_insert_error_outside_a_transaction_returns_zero(db_manager):
+    df = pd.DataFrame([{"id": 1, "no_such_column": 1}])
+    assert db_manager.insert_dataframe_to_db(df=df, table_name="splits") == 0
+
+
+class ExhaustedClient:
+    """A Strava client whose daily budget is already spent."""
+
+    def make_request(self, endpoint, method="GET", params=None):
+        raise RateLimitExhausted(reset_at=0)
+
+    def get_detailed_activity(self, activity_id):
+        return self.make_request(f"activities/{activity_id}")
+
+
+def test_exhausted_budget_leaves_streams_jobs_pending(sync_db, monkeypatch):
+    monkeypatch.setattr(main, "strava_client", ExhaustedClient(), raising=False)
+
+    with pytest.raises(RateLimitExhausted):
+        main.run_sync_jobs(concurrency=2)  # Submits all four jobs at once
+
+    assert set(job_states(sync_db).values()) == {("pending", 0)}
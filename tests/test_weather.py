@@ -0,0 +1,103 @@
+# tests/test_weather.py
+import pytest
+
+from benchmarks.fake_server import FakeApiServer
+from benchmarks.synthetic import SyntheticAthlete
+from conftest import insert_activity
+from src.api.weather_api import WeatherClient
+from src.models.weather import Weather
+
+
+@pytest.fixture
+def weather_server():
+    """A local stand-in for the Open-Meteo forecast and archive endpoints."""
+    with FakeApiServer(SyntheticAthlete(1)) as server:
+        yield server
+
+
+@pytest.fixture
+def weather_client(weather_server):
+    return WeatherClient(forecast_url=weather_server.forecast_url, archive_url=weather_server.archive_url)
+
+
+def weather_requests(server) -> int:
+    return server.request_counts["forecast"] + server.request_counts["archive"]
+
+
+def add_activities(db_manager) -> list:
+    """Four outdoor activities in two cells and date ranges, plus an indoor one."""
+    activities = [
+        (1, "2024-05-01", "07:10", 63.4301, 10.3951),
+        (2, "2024-05-02", "18:40", 63.4312, 10.3968),  # Same cell as 1, the next day
+        (3, "2024-05-02", "12:00", 63.4299, 10.3949),
+        (4, "2024-05-01", "09:00", 59.9139, 10.7522),  # Another cell
+    ]
+    for activity_id, date, start_time, lat, lng in activities:
+        insert_activity(
+            db_manager, activity_id, date=date, start_time=start_time, start_lat=lat, start_lng=lng
+        )
+    insert_activity(db_manager, 5, date="2024-05-01", start_time="08:00", indoor=1)
+    activity_ids = [1, 2, 3, 4, 5]
+    db_manager.enqueue_sync_jobs(activity_ids, ["weather"])
+    return activity_ids
+
+
+def test_one_request_per_cell_and_date_range(db_manager, weather_server, weather_client):
+    add_activities(db_manager)
+
+    assert Weather.process_weather_jobs(db_manager, weather_client) == 4
+
+    assert weather_requests(weather_server) == 2
+    assert db_manager.execute_query("SELECT id, date FROM weather ORDER BY id;") == [
+        (1, "2024-05-01 07:00"),
+        (2, "2024-05-02 19:00"),
+        (3, "2024-05-02 12:00"),
+        (4, "2024-05-01 09:00"),
+    ]
+    assert db_manager.execute_query(
+        "SELECT COUNT(*) FROM sync_jobs WHERE stage = 'weather' AND status = 'done';"
+    ) == [(5,)]
+
+
+def test_rerun_is_answered_from_the_hourly_cache(db_manager, weather_server, weather_client):
+    activity_ids = add_activities(db_manager)
+    Weather.process_weather_jobs(db_manager, weather_client)
+    first = db_manager.execute_query("SELECT * FROM weather ORDER BY id;")
+
+    db_manager.execute_query("DELETE FROM weather;")
+    db_manager.reset_sync_jobs(activity_ids, ["weather"])
+    assert Weather.process_weather_jobs(db_manager, weather_client) == 4
+
+    assert weather_requests(weather_server) == 2
+    assert db_manager.execute_query("SELECT * FROM weather ORDER BY id;") == first
+
+
+def test_hours_the_server_does_not_return_fail_their_jobs(db_manager, weather_client, monkeypatch):
+    add_activities(db_manager)
+    monkeypatch.setattr(weather_client, "get_weather_data", lambda *args: None)
+
+    assert Weather.process_weather_jobs(db_manager, weather_client) == 0
+
+    assert db_manager.execute_query(
+        "SELECT id, attempts FROM sync_jobs WHERE stage = 'weather' AND attempts > 0 ORDER BY id;"
+    ) == [(1, 1), (2, 1), (3, 1), (4, 1)]
+
+
+def test_forecast_hours_are_replaced_once_the_archive_covers_them(
+    db_manager, weather_server, weather_client, monkeypatch
+):
+    add_activities(db_manager)
+    # While the archive cutoff lies before these dates, they come from the forecast endpoint
+    monkeypatch.setattr(weather_client, "archive_cutoff", lambda: "2024-01-01")
+    Weather.process_weather_jobs(db_manager, weather_client)
+    assert weather_server.request_counts["forecast"] == 2
+    assert Weather.process_weather_jobs(db_manager, weather_client) == 0
+
+    monkeypatch.setattr(weather_client, "archive_cutoff", lambda: "2024-06-01")
+    assert Weather.process_weather_jobs(db_manager, weather_client) == 4
+
+    assert weather_server.request_counts["archive"] == 2
+    assert db_manager.execute_query("SELECT DISTINCT source FROM weather;") == [("archive",)]
+    assert db_manager.execute_query("SELECT DISTINCT source FROM weather_hourly;") == [("archive",)]
+    assert Weather.process_weather_jobs(db_manager, weather_client) == 0
+    assert weather_requests(weather_server) == 4